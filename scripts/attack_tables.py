@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+'''
+占位索引攻击表的验证与性能测试脚本。
+
+验证:
+- 车/炮穷举检查：对每个位置，枚举所在行的全部 2^9 种占位和所在列的全部 2^10 种占位
+  (另一条线上的占位随机选取)，比较查表版本 (`get_rook_attacks` / `get_cannon_attacks`)
+  与射线版本 (`get_rook_moves_bb` / `get_cannon_moves_bb`) 的结果。
+- 马/象穷举检查：对每个位置，枚举周围8个相邻位置的全部 2^8 种占位 (其余位置随机选取)，
+  比较查表版本 (`get_horse_attacks` / `get_bishop_attacks` / `get_horse_attackers`)
+  与逐个检查马腿/象眼 (`HORSE_LEGS` / `BISHOP_LEGS`) 的结果。
+- 增量检查：随机走子和撤销，确认 `Bitboard` 增量维护的行/列占位始终与占位位棋盘一致。
+
+性能: 在一组局面上对所有位置分别调用两个版本，比较每次调用的耗时。
+
+用法：
+    python -m scripts.attack_tables
+    python -m scripts.attack_tables --games 200 --repeat 500
+'''
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+
+from src.bitboard import Bitboard
+from src.moves import (get_rook_attacks, get_cannon_attacks, get_rook_moves_bb, get_cannon_moves_bb,
+                       get_horse_attacks, get_bishop_attacks, get_horse_attackers,
+                       HORSE_ATTACKS, HORSE_LEGS, BISHOP_ATTACKS, BISHOP_LEGS, generate_moves)
+from scripts.bench import BENCH_POSITIONS
+
+
+class _Occupancy:
+    '''只包含行/列占位的最小棋盘对象，用于在任意占位下调用查表函数。'''
+
+    def __init__(self, occupied: int):
+        self.occupied_bitboard = occupied
+        self.rank_occ = [(occupied >> (9 * r)) & 0x1FF for r in range(10)]
+        self.file_occ = [sum(((occupied >> (9 * r + c)) & 1) << r for r in range(10)) for c in range(9)]
+
+
+def _rank_bits(r: int, pattern: int) -> int:
+    '''将9位的行占位放到第r行上。'''
+    return pattern << (9 * r)
+
+
+def _file_bits(c: int, pattern: int) -> int:
+    '''将10位的列占位放到第c列上。'''
+    return sum(1 << (9 * r + c) for r in range(10) if pattern & (1 << r))
+
+
+def check_sliders(rng: random.Random) -> int:
+    '''
+    穷举比较车/炮的查表版本和射线版本。
+
+    Returns:
+        int: 不一致的情况数。
+    '''
+    mismatches = 0
+    for sq in range(90):
+        r, c = sq // 9, sq % 9
+        occupancies = [_rank_bits(r, pattern) | _file_bits(c, rng.getrandbits(10)) for pattern in range(512)]
+        occupancies += [_file_bits(c, pattern) | _rank_bits(r, rng.getrandbits(9)) for pattern in range(1024)]
+        for occupied in occupancies:
+            bb = _Occupancy(occupied)
+            if get_rook_attacks(bb, sq) != get_rook_moves_bb(sq, occupied):
+                mismatches += 1
+            if get_cannon_attacks(bb, sq) != get_cannon_moves_bb(sq, occupied):
+                mismatches += 1
+    return mismatches
+
+
+def _legs_attacks(attacks: int, legs: dict, occupied: int) -> int:
+    '''逐个检查马腿/象眼，返回 `attacks` 中没有被阻挡的目标位置。'''
+    result = 0
+    for to_sq, leg_sq in legs.items():
+        if attacks & (1 << to_sq) and not occupied & (1 << leg_sq):
+            result |= 1 << to_sq
+    return result
+
+
+def _horse_attackers(occupied: int, sq: int) -> int:
+    '''逐个检查马腿，返回能攻击到sq的马可能所在的位置。'''
+    return sum(1 << from_sq for from_sq in range(90)
+               if HORSE_LEGS[from_sq].get(sq) is not None and not occupied & (1 << HORSE_LEGS[from_sq][sq]))
+
+
+def check_legs(rng: random.Random) -> int:
+    '''
+    穷举比较马/象的查表版本和逐个检查马腿/象眼的版本。
+
+    Returns:
+        int: 不一致的情况数。
+    '''
+    mismatches = 0
+    for sq in range(90):
+        r, c = sq // 9, sq % 9
+        neighbours = [(r + dr) * 9 + c + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+                      if (dr or dc) and 0 <= r + dr < 10 and 0 <= c + dc < 9]
+        for pattern in range(1 << len(neighbours)):
+            occupied = rng.getrandbits(90)
+            for i, neighbour in enumerate(neighbours):
+                occupied &= ~(1 << neighbour)
+                if pattern & (1 << i):
+                    occupied |= 1 << neighbour
+            if get_horse_attacks(occupied, sq) != _legs_attacks(HORSE_ATTACKS[sq], HORSE_LEGS[sq], occupied):
+                mismatches += 1
+            if get_bishop_attacks(occupied, sq) != _legs_attacks(BISHOP_ATTACKS[sq], BISHOP_LEGS[sq], occupied):
+                mismatches += 1
+            if get_horse_attackers(occupied, sq) != _horse_attackers(occupied, sq):
+                mismatches += 1
+    return mismatches
+
+
+def check_incremental(rng: random.Random, games: int, max_plies: int = 120) -> int:
+    '''
+    随机对局中检查增量维护的行/列占位。
+
+    Returns:
+        int: 行/列占位与占位位棋盘不一致的局面数。
+    '''
+    def consistent(bb: Bitboard) -> bool:
+        expected = _Occupancy(bb.occupied_bitboard)
+        return bb.rank_occ == expected.rank_occ and bb.file_occ == expected.file_occ
+
+    errors = 0
+    for _ in range(games):
+        bb = Bitboard()
+        played = []
+        for _ in range(max_plies):
+            legal_moves = generate_moves(bb)
+            if not legal_moves:
+                break
+            move = rng.choice(legal_moves)
+            played.append((move, bb.move_piece(*move)))
+            errors += not consistent(bb)
+            errors += not consistent(bb.copy())
+        while played:
+            (from_sq, to_sq), captured = played.pop()
+            bb.unmove_piece(from_sq, to_sq, captured)
+            errors += not consistent(bb)
+    return errors
+
+
+def benchmark(repeat: int):
+    '''在基准测试局面上比较查表版本和射线版本的耗时。'''
+    boards = [Bitboard(fen) for _, _, fen in BENCH_POSITIONS]
+    cases = [
+        ('车', lambda bb, sq, occ: get_rook_moves_bb(sq, occ), lambda bb, sq, occ: get_rook_attacks(bb, sq)),
+        ('炮', lambda bb, sq, occ: get_cannon_moves_bb(sq, occ), lambda bb, sq, occ: get_cannon_attacks(bb, sq)),
+        ('马', lambda bb, sq, occ: _legs_attacks(HORSE_ATTACKS[sq], HORSE_LEGS[sq], occ),
+         lambda bb, sq, occ: get_horse_attacks(occ, sq)),
+        ('象', lambda bb, sq, occ: _legs_attacks(BISHOP_ATTACKS[sq], BISHOP_LEGS[sq], occ),
+         lambda bb, sq, occ: get_bishop_attacks(occ, sq)),
+    ]
+    calls = repeat * len(boards) * 90
+    for name, ray_fn, table_fn in cases:
+        timings = []
+        for fn in (ray_fn, table_fn):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for bb in boards:
+                    occupied = bb.occupied_bitboard
+                    for sq in range(90):
+                        fn(bb, sq, occupied)
+            timings.append((time.perf_counter() - start) / calls * 1e9)
+        print(f'{name}: 逐个计算 {timings[0]:.0f} ns/次, 查表 {timings[1]:.0f} ns/次, 加速 {timings[0] / timings[1]:.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='验证并测试占位索引攻击表')
+    parser.add_argument('--games', type=int, default=50, help='增量检查的随机对局数 (默认: 50)')
+    parser.add_argument('--repeat', type=int, default=200, help='性能测试的重复次数 (默认: 200)')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子 (默认: 0)')
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    mismatches = check_sliders(rng)
+    print(f'车/炮穷举检查: {mismatches} 处不一致')
+    leg_mismatches = check_legs(rng)
+    print(f'马/象穷举检查: {leg_mismatches} 处不一致')
+    mismatches += leg_mismatches
+    errors = check_incremental(rng, args.games)
+    print(f'增量检查 ({args.games} 局随机对局): {errors} 处不一致')
+    benchmark(args.repeat)
+
+    if mismatches or errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+'''
+搜索性能基准测试脚本 (Bench)。
+
+对一组固定的开局、中局和残局局面分别进行：
+- 固定深度搜索：记录节点数、耗时、NPS、每一层的完成时间 (time-to-depth)、
+  置换表命中率和最佳走法。
+- 固定节点数搜索：与机器速度无关，相同的代码总是得到相同的结果，
+  用于判断搜索行为是否发生了变化。
+
+指定 --workers N 时，还会用N个进程 (Lazy SMP) 再运行一次固定深度搜索，
+并报告每个局面到达目标深度所用时间相对于单进程的加速比。
+
+指定 --stats 时，打印并记录每个局面完整的搜索统计 (参见 `src.stats`)，即节点的去向：
+静默搜索节点的比例、置换表剪枝、空着裁剪、后期走法裁减的重新搜索、第一个走法剪枝率和有效分支因子。
+
+结果可以写入JSON报告，并可以与之前保存的基准报告进行比较：
+每种搜索模式的总NPS下降超过阈值时视为性能回退 (单个局面耗时太短，NPS波动较大，只作参考)；
+节点数或最佳走法发生变化时给出提示，因为这说明搜索的行为 (而不仅仅是速度) 发生了变化。
+
+用法：
+    python -m scripts.bench                                   # 运行默认测试集
+    python -m scripts.bench --depth 6 --nodes 100000
+    python -m scripts.bench --workers 4                       # 测量并行搜索的加速比
+    python -m scripts.bench --stats                           # 打印每个局面的搜索统计
+    python -m scripts.bench --json bench.json                 # 保存JSON报告
+    python -m scripts.bench --baseline bench.json             # 与基准报告比较
+'''
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import platform
+import time
+from typing import Dict, List, Optional
+
+from src.bitboard import Bitboard
+from src.engine import Engine
+from scripts.perft import move_to_str
+
+# --- 基准测试局面 ---
+# (名称, 类别, FEN)
+BENCH_POSITIONS = [
+    ('初始局面', 'opening', 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1'),
+    ('屏风马对中炮', 'opening', 'r1bakab1r/9/1cn3nc1/p1p1p1p1p/9/9/P1P1P1P1P/1CN3NC1/9/R1BAKAB1R w - - 4 3'),
+    ('炮打中象', 'middlegame', 'rnbakCb1r/9/7c1/p1p1p1p1p/9/9/P1P1P1P1P/1C7/9/RcBAKABNR b - - 0 1'),
+    ('中局对攻', 'middlegame', 'r1ba1a3/4kn3/2n1b4/pNp1p1p1p/4c4/6P2/P1P2R2P/1CcC5/9/2BAKAB2 w - - 0 1'),
+    ('马炮对卒', 'endgame', '2bak4/4a4/4b4/4N4/2p6/6C2/9/4B4/4A4/3AK4 w - - 0 1'),
+    ('兵卒残局', 'endgame', '3ak1b2/4a4/4b4/p3p3p/9/2P6/P3P3P/4B4/4A4/2BAK4 w - - 0 1'),
+    ('车仕对炮', 'endgame', '4k4/9/4c4/9/9/9/9/4R4/4A4/4K4 w - - 0 1'),
+]
+
+
+def _format_move(move) -> Optional[str]:
+    '''将引擎返回的坐标走法 ((r, c), (r, c)) 转换为ICCS记法。'''
+    if move is None:
+        return None
+    (fr, fc), (tr, tc) = move
+    return move_to_str((fr * 9 + fc, tr * 9 + tc))
+
+
+def run_position(engine: Engine, name: str, category: str, fen: str, mode: str, limit: int, workers: int = 1,
+                 stats: bool = False) -> Dict:
+    '''
+    搜索一个局面，并收集统计信息。
+
+    搜索前会清空引擎的置换表和历史表，使结果不依赖于测试顺序。
+
+    Args:
+        engine (Engine): 用于测试的引擎 (不加载开局库，以确保测试的是纯粹的搜索性能)。
+            引擎需要开启搜索统计，置换表命中率来自其中的查询和命中次数。
+        mode (str): 'depth' 表示固定深度搜索，'nodes' 表示固定节点数搜索。
+        limit (int): 搜索深度或节点数限制。
+        workers (int): 并行搜索的进程数，只用于固定深度搜索。
+        stats (bool): 是否把完整的搜索统计写入结果。
+
+    Returns:
+        Dict: 该局面的测试结果。
+    '''
+    engine.new_game()
+    board = Bitboard(fen)
+
+    start = time.perf_counter()
+    if mode == 'depth':
+        score, move = engine.search_by_depth(board, limit, workers=workers)
+    else:
+        score, move = engine.search_by_nodes(board, limit)
+    elapsed = time.perf_counter() - start
+
+    # 并行搜索时，节点数包括所有辅助进程搜索的节点
+    nodes = engine.nodes_searched + engine.helper_nodes
+    result = {
+        'name': name,
+        'category': category,
+        'fen': fen,
+        'mode': mode,
+        'limit': limit,
+        'workers': workers,
+        'nodes': nodes,
+        'time': round(elapsed, 4),
+        'nps': round(nodes / elapsed) if elapsed > 0 else 0,
+        'depth': len(engine.depth_times),
+        'depth_times': [round(t, 4) for t in engine.depth_times],
+        'tt_hit_rate': round(engine.stats.tt_hit_rate, 4),
+        'score': score,
+        'best_move': _format_move(move),
+    }
+    if stats:
+        result['stats'] = engine.stats.as_dict()
+    return result
+
+
+def _summarize(results: List[Dict]) -> Dict:
+    '''汇总一组测试结果的节点数、耗时和NPS。'''
+    nodes = sum(r['nodes'] for r in results)
+    elapsed = sum(r['time'] for r in results)
+    return {'nodes': nodes, 'time': round(elapsed, 4), 'nps': round(nodes / elapsed) if elapsed > 0 else 0}
+
+
+def _mode_key(mode: str, workers: int) -> str:
+    '''汇总结果的键，例如 'depth'、'nodes' 或 'depth-4w' (4个进程的固定深度搜索)。'''
+    return mode if workers == 1 else f'{mode}-{workers}w'
+
+
+def run_bench(depth: int, nodes: int, hash_size_mb: int, workers: int = 1, stats: bool = False) -> Dict:
+    '''
+    运行整个基准测试集。
+
+    Args:
+        depth (int): 固定深度搜索的深度，0表示跳过。
+        nodes (int): 固定节点数搜索的节点数，0表示跳过。
+        hash_size_mb (int): 置换表大小 (MB)。
+        workers (int): 大于1时，额外用这么多个进程运行一次固定深度搜索。
+        stats (bool): 是否打印并记录每个局面完整的搜索统计。
+
+    Returns:
+        Dict: 完整的测试报告。
+    '''
+    modes = []
+    if depth > 0:
+        modes.append(('depth', depth, 1))
+    if nodes > 0:
+        modes.append(('nodes', nodes, 1))
+    if depth > 0 and workers > 1:
+        modes.append(('depth', depth, workers))
+
+    # 总是开启搜索统计，以便报告置换表命中率 (统计的开销很小，对NPS的影响在测量误差之内)
+    engine = Engine(hash_size_mb, threads=max(1, workers), load_book=False, collect_stats=True)
+    results = []
+    try:
+        for mode, limit, mode_workers in modes:
+            title = "深度" if mode == "depth" else "节点数"
+            print(f'--- 固定{title}: {limit}' + (f', {mode_workers} 个进程' if mode_workers > 1 else '') + ' ---')
+            for name, category, fen in BENCH_POSITIONS:
+                result = run_position(engine, name, category, fen, mode, limit, mode_workers, stats)
+                results.append(result)
+                print(f'{name:<8} 深度 {result["depth"]:>2}  {result["nodes"]:>8} 节点  {result["time"]:7.2f}s  '
+                      f'{result["nps"]:>7} nps  TT命中 {result["tt_hit_rate"]:6.1%}  '
+                      f'{result["best_move"]}  ({result["score"]})')
+                if stats:
+                    print('    ' + engine.stats.report().replace('\n', '\n    '))
+    finally:
+        engine.close()
+
+    summary = {_mode_key(mode, w): _summarize([r for r in results if r['mode'] == mode and r['workers'] == w])
+               for mode, _, w in modes}
+    summary['total'] = _summarize(results)
+    for key, item in summary.items():
+        print(f'{key}: {item["nodes"]} 节点, {item["time"]:.2f}s, {item["nps"]} nps')
+
+    smp = _smp_scaling(results, workers) if depth > 0 and workers > 1 else None
+
+    return {
+        'version': 1,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'depth': depth,
+        'nodes': nodes,
+        'hash_size_mb': hash_size_mb,
+        'workers': workers,
+        'results': results,
+        'summary': summary,
+        'smp': smp,
+    }
+
+
+def _smp_scaling(results: List[Dict], workers: int) -> Dict:
+    '''
+    计算并打印并行搜索的加速比：单进程到达目标深度的时间 / 多进程到达目标深度的时间。
+
+    并行搜索的结果不是确定的，个别局面的加速比波动很大，因此同时给出所有局面的总体加速比。
+    '''
+    serial = {r['fen']: r for r in results if r['mode'] == 'depth' and r['workers'] == 1}
+    parallel = [r for r in results if r['mode'] == 'depth' and r['workers'] == workers]
+
+    print(f'--- 到达目标深度的加速比 ({workers} 个进程) ---')
+    positions = {}
+    serial_total, parallel_total = 0.0, 0.0
+    for result in parallel:
+        base = serial[result['fen']]
+        serial_time, parallel_time = base['depth_times'][-1], result['depth_times'][-1]
+        speedup = serial_time / parallel_time if parallel_time > 0 else 0.0
+        positions[result['name']] = round(speedup, 3)
+        serial_total += serial_time
+        parallel_total += parallel_time
+        print(f'{result["name"]:<8} {serial_time:7.2f}s -> {parallel_time:7.2f}s  x{speedup:.2f}')
+
+    total = serial_total / parallel_total if parallel_total > 0 else 0.0
+    print(f'总计: {serial_total:.2f}s -> {parallel_total:.2f}s  x{total:.2f}')
+    return {'workers': workers, 'positions': positions, 'total': round(total, 3)}
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    '''
+    将本次报告与基准报告进行比较。
+
+    Args:
+        report (Dict): 本次的测试报告。
+        baseline (Dict): 之前保存的基准报告。
+        threshold (float): 允许的NPS下降比例，例如0.1表示10%。
+
+    Returns:
+        List[str]: 性能回退的描述列表，为空表示没有回退。
+    '''
+    regressions = []
+    baseline_results = {(r['fen'], r['mode'], r['limit'], r.get('workers', 1)): r for r in baseline.get('results', [])}
+
+    print('--- 与基准比较 ---')
+    for result in report['results']:
+        old = baseline_results.get((result['fen'], result['mode'], result['limit'], result['workers']))
+        if old is None:
+            continue
+        label = f'{result["name"]} ({_mode_key(result["mode"], result["workers"])}={result["limit"]})'
+        change = result['nps'] / old['nps'] - 1 if old['nps'] else 0.0
+        print(f'{label}: NPS {old["nps"]} -> {result["nps"]} ({change:+.1%})')
+
+        # 节点数和最佳走法的变化不一定是回退，但说明搜索行为发生了变化
+        if result['nodes'] != old['nodes'] and result['mode'] == 'depth' and result['workers'] == 1:
+            print(f'  注意: 节点数 {old["nodes"]} -> {result["nodes"]}')
+        if result['best_move'] != old['best_move']:
+            print(f'  注意: 最佳走法 {old["best_move"]} -> {result["best_move"]}')
+
+    # 只有汇总后的NPS才足够稳定，可以用来判断是否回退
+    for key, item in report['summary'].items():
+        old_item = baseline.get('summary', {}).get(key)
+        if not old_item or not old_item['nps']:
+            continue
+        change = item['nps'] / old_item['nps'] - 1
+        print(f'{key}: NPS {old_item["nps"]} -> {item["nps"]} ({change:+.1%})')
+        if change < -threshold:
+            regressions.append(f'{key}: NPS 下降 {-change:.1%}')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='中国象棋引擎搜索基准测试')
+    parser.add_argument('--depth', type=int, default=5, help='固定深度搜索的深度，0表示跳过 (默认: 5)')
+    parser.add_argument('--nodes', type=int, default=30000, help='固定节点数搜索的节点数，0表示跳过 (默认: 30000)')
+    parser.add_argument('--hash', type=int, default=16, help='置换表大小 MB (默认: 16)')
+    parser.add_argument('--workers', type=int, default=1, help='额外用N个进程运行固定深度搜索并报告加速比 (默认: 1)')
+    parser.add_argument('--stats', action='store_true', help='收集并打印每个局面的搜索统计')
+    parser.add_argument('--json', help='将报告写入JSON文件')
+    parser.add_argument('--baseline', help='与之前保存的JSON报告进行比较')
+    parser.add_argument('--threshold', type=float, default=0.1, help='视为回退的NPS下降比例 (默认: 0.1)')
+    args = parser.parse_args()
+
+    report = run_bench(args.depth, args.nodes, args.hash, args.workers, args.stats)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'报告已写入 {args.json}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.threshold)
+        if regressions:
+            print('发现性能回退:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print('没有发现性能回退。')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,18 +6,41 @@
 并构建一个开局库。开局库是一个字典，键是局面的Zobrist哈希值，
 值是该局面下所有出现过的、合法的后继走法列表。
 
-生成的开局库将保存为 JSON 文件，供引擎在开局阶段查询使用。
+构建过程采用 map-reduce 的方式并行进行：
+- map：文件列表被切分成若干批，分发给多个工作进程。每个工作进程逐个读取并解析棋谱，
+  回放每一个变着，产生一个局部的 (哈希值 -> {走法: 出现次数}) 映射。
+- reduce：主进程在结果到达时将这些局部映射合并起来，并报告进度和处理速度。
+
+生成的开局库同时保存为 JSON 文件 (便于查看) 和二进制文件 (参见 `src.book`)，
+引擎在开局阶段查询的是内存映射的二进制文件。已有的 JSON 开局库可以用
+`python -m src.book opening_book.json opening_book.bin` 转换。
+
+每个局面的走法以 {走法: 出现次数} 的字典保存，去重和计数都是常数时间的操作。
+构建的状态 (走法计数和已处理文件的修改时间/大小) 会定期保存到状态文件中，
+以 --incremental 运行时只处理新增或修改过的棋谱，被中断的构建也可以用同样的方式继续。
+注意：修改过的文件会被整体重新计入，它原先贡献的计数不会被扣除；删除的文件也不会从开局库中移除。
+这只影响走法的先后顺序，需要精确计数时请不带 --incremental 完整重建。
+
+用法：
+    python -m scripts.create_opening_book
+    python -m scripts.create_opening_book --incremental
+    python -m scripts.create_opening_book --workers 8 --source <棋谱目录> --output opening_book.json
 """
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import re
+import argparse
 import json
-from typing import Optional, List
+import pickle
+import re
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from src.bitboard import Bitboard
-from src.moves import generate_moves, Move
+from src.book import BOOK_FILE, write_book
+from src.moves import is_legal_move, Move
 from src.constants import *
 
 # --- 配置 ---
@@ -25,6 +48,20 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_SOURCE_DIR = os.path.join(PROJECT_ROOT, 'external/xq_data/data/opening')
 OUTPUT_FILE = 'opening_book.json'  # 生成的开局库文件名
 MAX_PLY = 20  # 开局库记录的最大步数（半回合）
+FILES_PER_TASK = 200  # 每个工作进程任务包含的文件数
+STATE_FILE = 'opening_book.state'  # 增量构建的状态文件 (走法计数和已处理文件的清单)
+STATE_VERSION = 1  # 状态文件的格式版本
+CHECKPOINT_INTERVAL = 30  # 构建过程中保存状态文件的间隔 (秒)
+IGNORED_SUFFIXES = ('.md', '.json', '.png', '.gif')
+
+# 局部开局库：局面哈希值 -> {走法: 出现次数}
+MoveCounts = Dict[int, Dict[Move, int]]
+# 文件签名：(修改时间 (纳秒), 文件大小)
+FileSignature = Tuple[int, int]
+
+# 棋谱中的标签和走法都是ASCII字符，因此直接在字节上匹配，不需要先解码整个文件
+_MAIN_MOVELIST_RE = re.compile(rb'\[DhtmlXQ_movelist\](.*?)\[/DhtmlXQ_movelist\]', re.DOTALL)
+_VARIATION_RE = re.compile(rb'\[DhtmlXQ_move_\d+_\d+_\d+\](.*?)\[/DhtmlXQ_move_\d+_\d+_\d+\]', re.DOTALL)
 
 
 def parse_movelist(content: str) -> list[str]:
@@ -32,21 +69,23 @@ def parse_movelist(content: str) -> list[str]:
     从文件内容中解析出所有走法列表（包括主变着和所有变着）。
     文件格式是DhtmlXQ使用的格式。
     """
-    movelists = []
-    content = content.replace('\r', '').replace('\n', '')
+    data = content.encode('utf-8', errors='ignore') if isinstance(content, str) else content
+    return [movelist.decode('ascii', errors='ignore') for movelist in _iter_movelists(data)]
+
+
+def _iter_movelists(data: bytes) -> Iterator[bytes]:
+    """逐个产生棋谱内容中的走法列表 (先主变着，后所有变着)。"""
+    data = data.replace(b'\r', b'').replace(b'\n', b'')
 
     # 1. 匹配主走法列表
-    main_move_match = re.search(r'\[DhtmlXQ_movelist\](.*?)\[/DhtmlXQ_movelist\]', content, re.DOTALL)
+    main_move_match = _MAIN_MOVELIST_RE.search(data)
     if main_move_match:
-        movelists.append(main_move_match.group(1).strip())
+        yield main_move_match.group(1).strip()
 
     # 2. 匹配所有变着
     # 格式如: [DhtmlXQ_move_0_1_1]...[/DhtmlXQ_move_0_1_1]
-    variation_matches = re.findall(r'\[DhtmlXQ_move_\d+_\d+_\d+\](.*?)\[/DhtmlXQ_move_\d+_\d+_\d+\]', content, re.DOTALL)
-    for var in variation_matches:
-        movelists.append(var.strip())
-
-    return movelists
+    for match in _VARIATION_RE.finditer(data):
+        yield match.group(1).strip()
 
 
 def parse_move_str(move_str: str) -> Optional[Move]:
@@ -57,92 +96,211 @@ def parse_move_str(move_str: str) -> Optional[Move]:
     if len(move_str) != 4 or not move_str.isdigit():
         return None
     c1, r1, c2, r2 = map(int, list(move_str))
+    if c1 > 8 or c2 > 8:
+        return None
     from_sq = r1 * 9 + c1
     to_sq = r2 * 9 + c2
     return (from_sq, to_sq)
 
 
-def build_book():
+def replay_movelist(movelist: bytes, counts: MoveCounts):
     """
-    扫描棋谱文件，构建并保存开局库。
+    从初始局面开始回放一个走法列表，把前 MAX_PLY 步中每个局面下的走法计入 `counts`。
+    遇到无法解析或不合法的走法时停止回放。
     """
-    opening_book = {}
-    file_count = 0
+    board = Bitboard()  # 每个变着都从初始局面开始
+    for i in range(0, min(len(movelist), MAX_PLY * 4), 4):
+        move = parse_move_str(movelist[i:i + 4].decode('ascii', errors='ignore'))
+
+        # 校验解析出的走法是否合法 (只验证这一个走法，不需要生成全部走法)
+        if move is None or not is_legal_move(board, move):
+            break
+
+        position_counts = counts.setdefault(board.hash_key, {})
+        position_counts[move] = position_counts.get(move, 0) + 1
+        board.move_piece(move[0], move[1])
+
 
-    print(f'开始从 {DATA_SOURCE_DIR} 目录扫描棋谱文件...')
+def process_files(file_paths: List[str]) -> tuple[MoveCounts, int, List[str]]:
+    """
+    map 步骤：解析一批棋谱文件并回放其中的所有变着。
 
-    for root, _, files in os.walk(DATA_SOURCE_DIR):
+    Returns:
+        tuple[MoveCounts, int, List[str]]: 这批文件产生的局部开局库、其中有效棋谱文件的数量，以及处理的文件列表。
+    """
+    counts: MoveCounts = {}
+    file_count = 0
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            print(f'无法读取文件 {file_path}: {e}')
+            continue
+
+        has_movelist = False
+        for movelist in _iter_movelists(data):
+            has_movelist = True
+            replay_movelist(movelist, counts)
+        file_count += has_movelist
+    return counts, file_count, file_paths
+
+
+def merge_counts(total: MoveCounts, partial: MoveCounts):
+    """reduce 步骤：将一个局部开局库合并到总的开局库中。"""
+    for zobrist_key, moves in partial.items():
+        position_counts = total.get(zobrist_key)
+        if position_counts is None:
+            total[zobrist_key] = moves
+            continue
+        for move, count in moves.items():
+            position_counts[move] = position_counts.get(move, 0) + count
+
+
+def collect_files(source_dir: str) -> List[str]:
+    """列出目录下所有的棋谱文件，按路径排序，使每次构建的结果相同。"""
+    file_paths = []
+    for root, _, files in os.walk(source_dir):
         for filename in files:
             # 忽略非棋谱文件
-            if filename.endswith(('.md', '.json', '.png', '.gif', 'README.md', 'register.json')):
+            if filename.endswith(IGNORED_SUFFIXES):
                 continue
+            file_paths.append(os.path.join(root, filename))
+    file_paths.sort()
+    return file_paths
 
-            file_path = os.path.join(root, filename)
-
-            try:
-                # 棋谱文件通常使用GBK编码，但有些可能是UTF-8带BOM，所以用utf-8-sig尝试
-                with open(file_path, 'r', encoding='utf-8-sig', errors='ignore') as f:
-                    content = f.read()
-            except Exception as e:
-                try:
-                    with open(file_path, 'r', encoding='gbk', errors='ignore') as f:
-                        content = f.read()
-                except Exception as e2:
-                    print(f'无法读取文件 {file_path}: {e2}')
-                    continue
-
-            movelists = parse_movelist(content)
-            if not movelists:
-                continue
-
-            file_count += 1
-            if file_count % 1000 == 0:
-                print(f'已处理 {file_count} 个文件...')
 
-            # 遍历棋谱中的每一个变着
-            for movelist_str in movelists:
-                board = Bitboard()  # 每个变着都从初始局面开始
+def counts_to_moves(counts: MoveCounts) -> Dict[int, List[Move]]:
+    """将走法计数转换为 (哈希值 -> 走法列表)，每个局面的走法按出现次数从多到少排列。"""
+    return {zobrist_key: [move for move, _ in sorted(moves.items(), key=lambda item: -item[1])]
+            for zobrist_key, moves in counts.items()}
 
-                # 将走法字符串分割成4个字符一组的列表
-                moves_str_list = [movelist_str[i:i+4]
-                                  for i in range(0, len(movelist_str), 4)]
 
-                for i, move_str in enumerate(moves_str_list):
-                    if i >= MAX_PLY:
-                        break
+def counts_to_book(counts: MoveCounts) -> Dict[int, list]:
+    """将走法计数转换为开局库的JSON格式，每个局面的走法按出现次数从多到少排列。"""
+    return {zobrist_key: [[[from_sq // 9, from_sq % 9], [to_sq // 9, to_sq % 9]] for from_sq, to_sq in moves]
+            for zobrist_key, moves in counts_to_moves(counts).items()}
 
-                    zobrist_key = board.hash_key
-                    legal_moves = generate_moves(board)
 
-                    move = parse_move_str(move_str)
+def file_signature(file_path: str) -> FileSignature:
+    """返回文件的 (修改时间, 大小)，用于判断文件自上次构建以来是否发生了变化。"""
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
 
-                    # 校验解析出的走法是否合法
-                    if move is None or move not in legal_moves:
-                        break
 
-                    if zobrist_key not in opening_book:
-                        opening_book[zobrist_key] = []
+def load_state(state_file: str) -> Dict:
+    """
+    读取增量构建的状态文件。
 
-                    # 存储为JSON兼容的列表格式
-                    from_sq, to_sq = move
-                    from_r, from_c = from_sq // 9, from_sq % 9
-                    to_r, to_c = to_sq // 9, to_sq % 9
-                    simple_move = [[from_r, from_c], [to_r, to_c]]
+    Returns:
+        Dict: {'counts': 走法计数, 'files': {相对路径: (修改时间, 大小)}}；文件不存在或版本不符时返回空状态。
+    """
+    try:
+        with open(state_file, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') == STATE_VERSION:
+            return state
+        print(f'状态文件 {state_file} 的版本不符，将重新构建。')
+    except FileNotFoundError:
+        pass
+    except (OSError, pickle.UnpicklingError, EOFError) as e:
+        print(f'无法读取状态文件 {state_file}: {e}，将重新构建。')
+    return {'version': STATE_VERSION, 'counts': {}, 'files': {}}
+
+
+def save_state(state_file: str, state: Dict):
+    """保存增量构建的状态。先写入临时文件再替换，中断时不会留下损坏的状态文件。"""
+    temp_file = state_file + '.tmp'
+    with open(temp_file, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, state_file)
+
+
+def build_book(source_dir: str = DATA_SOURCE_DIR, output_file: str = OUTPUT_FILE, workers: Optional[int] = None,
+               binary_file: Optional[str] = BOOK_FILE, incremental: bool = False, state_file: str = STATE_FILE):
+    """
+    扫描棋谱文件，并行构建并保存开局库。
+
+    构建的进度 (走法计数和已处理文件的清单) 会定期保存到状态文件中。
+    增量模式下，从状态文件继续，只处理新增或修改过的文件，因此既可以在已有的开局库中
+    加入新的棋谱，也可以从中断的构建中恢复。
+
+    Args:
+        source_dir (str): 棋谱文件所在的目录。
+        output_file (str): 输出的JSON文件，为None时不输出。
+        workers (Optional[int]): 工作进程数，默认为CPU核心数。
+        binary_file (Optional[str]): 输出的二进制开局库文件 (引擎加载的格式)，为None时不输出。
+        incremental (bool): 是否在状态文件的基础上增量构建。
+        state_file (str): 状态文件的路径。
+    """
+    state = load_state(state_file) if incremental else {'version': STATE_VERSION, 'counts': {}, 'files': {}}
+    counts: MoveCounts = state['counts']
+    manifest: Dict[str, FileSignature] = state['files']
+
+    print(f'开始从 {source_dir} 目录扫描棋谱文件...')
+    signatures = {}
+    for file_path in collect_files(source_dir):
+        rel_path = os.path.relpath(file_path, source_dir)
+        signature = file_signature(file_path)
+        if manifest.get(rel_path) != signature:
+            signatures[file_path] = (rel_path, signature)
+    file_paths = list(signatures)
+    if incremental:
+        print(f'开局库中已有 {len(manifest)} 个文件，{len(file_paths)} 个文件是新增或修改过的。')
+        if not file_paths:
+            print('开局库已是最新。')
+            return
+
+    tasks = [file_paths[i:i + FILES_PER_TASK] for i in range(0, len(file_paths), FILES_PER_TASK)]
+    print(f'共找到 {len(file_paths)} 个文件，分为 {len(tasks)} 批，使用 {workers or os.cpu_count()} 个进程处理。')
 
-                    if simple_move not in opening_book[zobrist_key]:
-                        opening_book[zobrist_key].append(simple_move)
+    file_count = 0
+    files_done = 0
+    start_time = last_checkpoint = time.time()
+    with Pool(workers) as pool:
+        for partial, partial_files, task_paths in pool.imap_unordered(process_files, tasks):
+            merge_counts(counts, partial)
+            for file_path in task_paths:
+                rel_path, signature = signatures[file_path]
+                manifest[rel_path] = signature
+            file_count += partial_files
+            files_done += len(task_paths)
+            elapsed = time.time() - start_time
+            print(f'已处理 {files_done}/{len(file_paths)} 个文件，'
+                  f'{files_done / max(elapsed, 1e-9):.0f} 文件/秒，{len(counts)} 个局面')
+
+            if time.time() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                save_state(state_file, state)
+                last_checkpoint = time.time()
+
+    save_state(state_file, state)
+    elapsed = time.time() - start_time
+    print(f'处理完成！共处理 {file_count} 个棋谱文件，耗时 {elapsed:.1f} 秒。')
+    print(f'开局库中包含 {len(counts)} 个局面。')
 
-                    board.move_piece(move[0], move[1])
+    # 保存开局库到JSON文件
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(counts_to_book(counts), f, indent=2)
+        print(f'开局库已成功保存到 {output_file}')
 
-    print(f'处理完成！共处理 {file_count} 个棋谱文件。')
-    print(f'开局库中包含 {len(opening_book)} 个局面。')
+    if binary_file:
+        write_book(binary_file, counts_to_moves(counts))
+        print(f'二进制开局库已成功保存到 {binary_file}')
 
-    # 保存开局库到JSON文件
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(opening_book, f, indent=2)
 
-    print(f'开局库已成功保存到 {OUTPUT_FILE}')
+def main():
+    parser = argparse.ArgumentParser(description='从棋谱文件构建开局库')
+    parser.add_argument('--source', default=DATA_SOURCE_DIR, help='棋谱文件所在的目录')
+    parser.add_argument('--output', default=OUTPUT_FILE, help='输出的开局库文件 (传入空字符串则不输出JSON)')
+    parser.add_argument('--binary', default=BOOK_FILE, help='输出的二进制开局库文件 (引擎加载的格式)')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数 (默认: CPU核心数)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='在状态文件的基础上增量构建，只处理新增或修改过的文件 (也用于恢复中断的构建)')
+    parser.add_argument('--state', default=STATE_FILE, help='增量构建的状态文件')
+    args = parser.parse_args()
+    build_book(args.source, args.output, args.workers, args.binary, args.incremental, args.state)
 
 
 if __name__ == '__main__':
-    build_book()
\ No newline at end of file
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+'''
+模块导入时间测量脚本。
+
+在新的解释器进程中反复导入指定的模块，统计导入耗时 (取中位数)：
+- 冷启动：每次导入前删除预计算表的缓存文件 (参见 `src.tablecache`)，所有表都需要重新计算。
+- 热启动：缓存文件已经存在，预计算表直接从缓存读取。
+
+每次导入都使用 `python -X importtime` 运行，除了总耗时以外，还会列出 `src` 包中
+每个模块自身的导入耗时，便于找出启动过程中最慢的部分。
+
+用法：
+    python -m scripts.import_time
+    python -m scripts.import_time --module src.moves --runs 20
+'''
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import glob
+import statistics
+import subprocess
+from typing import Dict, List
+
+from src.tablecache import CACHE_DIR
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def clear_table_cache():
+    '''删除所有预计算表的缓存文件。'''
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.tables')):
+        os.remove(path)
+
+
+def import_once(module: str) -> Dict[str, tuple]:
+    '''
+    在新的解释器进程中导入一次模块。
+
+    Returns:
+        Dict[str, tuple]: 模块名 -> (自身耗时, 累计耗时)，单位为微秒，来自 `-X importtime` 的输出。
+    '''
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        # 格式: "import time:      self |  cumulative | <缩进>模块名"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(module: str, runs: int, cold: bool) -> List[Dict[str, tuple]]:
+    '''导入 `runs` 次模块，冷启动时每次导入前删除缓存。'''
+    if not cold:
+        import_once(module)  # 确保缓存已经生成
+    samples = []
+    for _ in range(runs):
+        if cold:
+            clear_table_cache()
+        samples.append(import_once(module))
+    return samples
+
+
+def report(title: str, module: str, samples: List[Dict[str, tuple]]):
+    '''打印总导入耗时以及 `src` 包中各模块自身耗时的中位数。'''
+    total = statistics.median(sample[module][1] for sample in samples) / 1000
+    print(f'{title}: 导入 {module} 共 {total:.1f} ms (中位数，{len(samples)} 次)')
+    names = [name for name in samples[0] if name.startswith('src.')]
+    for name in sorted(names, key=lambda n: -statistics.median(s[n][0] for s in samples)):
+        self_ms = statistics.median(sample[name][0] for sample in samples) / 1000
+        print(f'  {name:<20} {self_ms:6.2f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量模块的导入时间 (冷启动/热启动)')
+    parser.add_argument('--module', default='src.engine', help='要导入的模块 (默认: src.engine)')
+    parser.add_argument('--runs', type=int, default=10, help='每种情况导入的次数 (默认: 10)')
+    args = parser.parse_args()
+
+    report('冷启动 (无缓存)', args.module, measure(args.module, args.runs, cold=True))
+    report('热启动 (有缓存)', args.module, measure(args.module, args.runs, cold=False))
+
+
+if __name__ == '__main__':
+    main()
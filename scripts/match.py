@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+'''
+引擎对战 (Match) 脚本。
+
+让两个不同配置的引擎在固定的时间 (或深度、节点数) 控制下互相对弈，
+用来判断一项改动 (例如提高速度的优化) 是否真的提高了棋力。
+
+- 开局：从开局库中随机走出若干步得到开局局面，每个开局下两盘棋，双方交换先后手，
+  以抵消开局本身的优劣。找不到开局库时，改为随机走几步合法走法。
+- 并行：多盘棋同时在进程池中进行，每个工作进程为两种配置各保留一个引擎，每盘棋开始前清空置换表。
+- 裁决：没有合法走法时按引擎的规则判定 (被将死判负，逼和判和)；同一局面第三次出现、
+  连续 NO_CAPTURE_LIMIT 步没有吃子、双方都没有能过河的进攻子力、或者达到最大步数时判和；
+  一方连续 MATE_ADJUDICATION_MOVES 次报告杀棋分数时，判该方胜。
+- SPRT：每盘棋结束后计算对数似然比 (LLR)，在 H0 (Elo差为elo0) 和 H1 (Elo差为elo1) 之间
+  做出判断后提前结束对战。
+- 输出：每盘棋结束后立即把棋谱 (类似PGN的走法列表，ICCS记法) 追加到 games.pgn，
+  并把当前的统计结果写入 results.json，对战中途被中断也不会丢失已经完成的对局。
+
+引擎配置用逗号分隔的 key=value 表示：
+    name   名称 (默认: engine1/engine2)
+    time   每步的思考时间（秒，默认: 0.1）
+    depth  每步的搜索深度 (指定时不限时间)
+    nodes  每步的搜索节点数 (指定时不限时间)
+    hash   置换表大小 MB (默认: 16)
+
+用法：
+    python -m scripts.match --engine1 name=new,time=0.2 --engine2 name=old,time=0.1
+    python -m scripts.match --engine1 depth=4 --engine2 depth=3 --games 200 --workers 8 --output match_out
+    python -m scripts.match --elo0 0 --elo1 10 --alpha 0.05 --beta 0.05
+'''
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import math
+import random
+import time
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.bitboard import Bitboard
+from src.book import BOOK_FILE, OpeningBook
+from src.constants import MATE_VALUE, PLAYER_B, PLAYER_R
+from src.engine import Engine, iccs_to_move, move_to_iccs
+from src.moves import generate_moves, is_check, is_legal_move
+
+START_FEN = 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1'
+
+# --- 裁决规则 ---
+MAX_PLIES = 300  # 达到此步数 (半回合) 判和
+NO_CAPTURE_LIMIT = 120  # 连续这么多步 (半回合) 没有吃子判和
+REPETITION_COUNT = 3  # 同一局面出现这么多次判和
+MATE_ADJUDICATION_MOVES = 2  # 一方连续这么多次报告杀棋分数，判该方胜
+ATTACKING_PIECES = (4, 5, 6, 7)  # 马、车、炮、兵：能过河进攻的棋子
+
+# 对局结果 (从红方来看)
+RED_WIN, DRAW, BLACK_WIN = '1-0', '1/2-1/2', '0-1'
+
+
+class EngineConfig(NamedTuple):
+    '''
+    对战中一方引擎的配置。
+
+    Attributes:
+        name (str): 名称。
+        time (float): 每步的思考时间（秒），depth 和 nodes 都为0时使用。
+        depth (int): 每步的搜索深度，0表示不限制。
+        nodes (int): 每步的搜索节点数，0表示不限制。
+        hash (int): 置换表大小 (MB)。
+    '''
+    name: str
+    time: float = 0.1
+    depth: int = 0
+    nodes: int = 0
+    hash: int = 16
+
+
+class GameTask(NamedTuple):
+    '''一盘对局的任务：第几盘、开局局面 (FEN和开局走法)、红方和黑方的配置。'''
+    index: int
+    fen: str
+    opening: List[str]
+    red: EngineConfig
+    black: EngineConfig
+
+
+def parse_engine_config(spec: str, default_name: str) -> EngineConfig:
+    '''
+    解析引擎配置字符串，例如 'name=new,time=0.2,hash=32'。
+
+    Raises:
+        ValueError: 配置中有未知的键或无效的值。
+    '''
+    values = {'name': default_name}
+    for item in filter(None, spec.split(',')):
+        key, _, value = item.partition('=')
+        key = key.strip()
+        if key not in EngineConfig._fields:
+            raise ValueError(f'未知的引擎配置项: {key}')
+        values[key] = value.strip()
+    return EngineConfig(
+        name=values['name'],
+        time=float(values.get('time', 0.1)),
+        depth=int(values.get('depth', 0)),
+        nodes=int(values.get('nodes', 0)),
+        hash=int(values.get('hash', 16)),
+    )
+
+
+# --- 开局 ---
+
+def _random_walk(board: Bitboard, book: Optional[OpeningBook], plies: int, rng: random.Random) -> List[str]:
+    '''从给定局面开始走出最多 `plies` 步，优先使用开局库中的走法，返回ICCS走法列表。'''
+    opening = []
+    for _ in range(plies):
+        if book is not None:
+            candidates = book.probe(board.hash_key)
+        else:
+            candidates = generate_moves(board)
+        if not candidates:
+            break
+        from_sq, to_sq = rng.choice(candidates)
+        board.move_piece(from_sq, to_sq)
+        opening.append(move_to_iccs(((from_sq // 9, from_sq % 9), (to_sq // 9, to_sq % 9))))
+    return opening
+
+
+def generate_openings(count: int, plies: int, book_path: str, seed: int) -> List[List[str]]:
+    '''
+    生成 `count` 个互不相同的开局 (ICCS走法列表)。
+
+    从开局库中随机选择走法；开局库不存在或为空时，改为随机选择合法走法。
+    开局库中的变化不够多时，返回的开局可能少于 `count` 个。
+    '''
+    rng = random.Random(seed)
+    book = OpeningBook(book_path)
+    try:
+        book.open()
+    except (FileNotFoundError, ValueError):
+        print(f'未找到开局库 {book_path}，将使用随机走法作为开局。')
+        book = None
+
+    openings, seen = [], set()
+    for _ in range(count * 20):
+        opening = tuple(_random_walk(Bitboard(START_FEN), book, plies, rng))
+        if opening not in seen:
+            seen.add(opening)
+            openings.append(list(opening))
+            if len(openings) == count:
+                break
+    if book is not None:
+        book.close()
+    return openings
+
+
+def generate_tasks(openings: List[List[str]], engine1: EngineConfig, engine2: EngineConfig,
+                   games: int) -> Iterator[GameTask]:
+    '''每个开局生成两盘棋，双方交换先后手。'''
+    for index in range(games):
+        opening = openings[(index // 2) % len(openings)]
+        red, black = (engine1, engine2) if index % 2 == 0 else (engine2, engine1)
+        yield GameTask(index, START_FEN, opening, red, black)
+
+
+# --- 对局 ---
+
+# 工作进程中为每种配置保留的引擎，在两盘棋之间复用
+_worker_engines: Dict[EngineConfig, Engine] = {}
+
+
+def _init_worker():
+    '''工作进程的初始化函数：屏蔽引擎每步搜索的输出。'''
+    sys.stdout = open(os.devnull, 'w')
+
+
+def _get_engine(config: EngineConfig) -> Engine:
+    '''返回工作进程中配置对应的引擎 (不使用开局库，开局已经由对战脚本给出)。'''
+    engine = _worker_engines.get(config)
+    if engine is None:
+        engine = _worker_engines[config] = Engine(config.hash, load_book=False)
+    return engine
+
+
+def _think(engine: Engine, config: EngineConfig, board: Bitboard) -> Tuple[float, Optional[tuple]]:
+    '''按配置的限制条件让引擎走一步。'''
+    if config.depth > 0:
+        return engine.search_by_depth(board, config.depth, workers=1)
+    if config.nodes > 0:
+        return engine.search_by_nodes(board, config.nodes)
+    return engine.search_by_time(board, config.time, workers=1)
+
+
+def _has_attacking_pieces(board: Bitboard) -> bool:
+    '''棋盘上是否还有能过河进攻的棋子 (车、马、炮、兵)。'''
+    return any(abs(piece) in ATTACKING_PIECES for piece in board.board)
+
+
+def play_game(task: GameTask) -> Dict:
+    '''
+    下完一盘棋。在工作进程中运行。
+
+    Returns:
+        Dict: 对局记录，包括双方的名称、开局、全部走法 (ICCS)、结果和结束原因。
+    '''
+    engines = {PLAYER_R: _get_engine(task.red), PLAYER_B: _get_engine(task.black)}
+    configs = {PLAYER_R: task.red, PLAYER_B: task.black}
+    for engine in engines.values():
+        engine.new_game()
+
+    board = Bitboard(task.fen)
+    moves = []
+    for iccs in task.opening:
+        # 遇到非法的开局走法时停止，之后的开局走法也不再执行
+        (from_r, from_c), (to_r, to_c) = iccs_to_move(iccs)
+        move = (from_r * 9 + from_c, to_r * 9 + to_c)
+        if not is_legal_move(board, move):
+            break
+        board.move_piece(*move)
+        moves.append(iccs)
+    opening_plies = len(moves)
+
+    positions = {board.hash_key: 1}
+    plies_without_capture = 0
+    mate_claims = {PLAYER_R: 0, PLAYER_B: 0}
+    result, reason = DRAW, f'达到最大步数 {MAX_PLIES}'
+    start = time.time()
+
+    while len(moves) < MAX_PLIES:
+        player = board.player_to_move
+        if not generate_moves(board):
+            if is_check(board, player):
+                result, reason = (BLACK_WIN if player == PLAYER_R else RED_WIN), '将死'
+            else:
+                result, reason = DRAW, '逼和'
+            break
+
+        score, move = _think(engines[player], configs[player], board)
+        if move is None:
+            result, reason = (BLACK_WIN if player == PLAYER_R else RED_WIN), '引擎没有给出走法'
+            break
+
+        # 一方连续报告杀棋分数时提前裁决
+        mate_claims[player] = mate_claims[player] + 1 if score > MATE_VALUE - 100 else 0
+        if mate_claims[player] >= MATE_ADJUDICATION_MOVES:
+            result, reason = (RED_WIN if player == PLAYER_R else BLACK_WIN), '裁决: 杀棋'
+            break
+
+        (from_r, from_c), (to_r, to_c) = move
+        captured = board.move_piece(from_r * 9 + from_c, to_r * 9 + to_c)
+        moves.append(move_to_iccs(move))
+
+        plies_without_capture = 0 if captured else plies_without_capture + 1
+        positions[board.hash_key] = positions.get(board.hash_key, 0) + 1
+        if positions[board.hash_key] >= REPETITION_COUNT:
+            result, reason = DRAW, '裁决: 重复局面'
+            break
+        if plies_without_capture >= NO_CAPTURE_LIMIT:
+            result, reason = DRAW, f'裁决: {NO_CAPTURE_LIMIT} 步没有吃子'
+            break
+        if not _has_attacking_pieces(board):
+            result, reason = DRAW, '裁决: 双方都没有进攻子力'
+            break
+
+    return {
+        'index': task.index,
+        'red': task.red.name,
+        'black': task.black.name,
+        'fen': task.fen,
+        'opening_plies': opening_plies,
+        'moves': moves,
+        'result': result,
+        'reason': reason,
+        'time': round(time.time() - start, 2),
+    }
+
+
+# --- 统计 ---
+
+def game_score(record: Dict, name: str) -> float:
+    '''返回名为 `name` 的引擎在这盘棋中的得分 (1、0.5 或 0)。'''
+    if record['result'] == DRAW:
+        return 0.5
+    winner = record['red'] if record['result'] == RED_WIN else record['black']
+    return 1.0 if winner == name else 0.0
+
+
+def elo_to_score(elo: float) -> float:
+    '''将Elo差转换为期望得分率。'''
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score: float) -> float:
+    '''将得分率转换为Elo差。'''
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float) -> float:
+    '''
+    计算 SPRT 的对数似然比 (广义SPRT的正态近似，按三项分布 胜/和/负 估计方差)。
+
+    Returns:
+        float: LLR。大于上界接受 H1 (Elo差为elo1)，小于下界接受 H0 (Elo差为elo0)。
+    '''
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0
+    win_rate, draw_rate = wins / games, draws / games
+    score = win_rate + draw_rate / 2
+    variance = win_rate + draw_rate / 4 - score * score
+    if variance <= 0:
+        return 0.0
+    score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha: float, beta: float) -> Tuple[float, float]:
+    '''返回 SPRT 的 (下界, 上界)。'''
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def summarize(records: List[Dict], name: str, elo0: float, elo1: float, alpha: float, beta: float) -> Dict:
+    '''从 `name` 一方来看，统计胜/和/负、得分率、Elo差 (及95%置信区间) 和 SPRT 状态。'''
+    scores = [game_score(record, name) for record in records]
+    wins, draws, losses = scores.count(1.0), scores.count(0.5), scores.count(0.0)
+    games = len(scores)
+    score = sum(scores) / games if games else 0.5
+    error = 1.96 * math.sqrt(sum((s - score) ** 2 for s in scores) / games / games) if games else 0.0
+
+    llr = sprt_llr(wins, draws, losses, elo0, elo1)
+    lower, upper = sprt_bounds(alpha, beta)
+    if llr >= upper:
+        sprt = 'H1'
+    elif llr <= lower:
+        sprt = 'H0'
+    else:
+        sprt = None
+
+    return {
+        'games': games,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'score': round(score, 4),
+        'elo': round(score_to_elo(score), 1),
+        'elo_low': round(score_to_elo(score - error), 1),
+        'elo_high': round(score_to_elo(score + error), 1),
+        'llr': round(llr, 3),
+        'llr_bounds': [round(lower, 3), round(upper, 3)],
+        'sprt': sprt,
+    }
+
+
+# --- 输出 ---
+
+def format_pgn(record: Dict, event: str) -> str:
+    '''将一盘棋格式化为类似PGN的文本 (走法为ICCS记法，开局走法用注释标出)。'''
+    lines = [
+        f'[Event "{event}"]',
+        f'[Round "{record["index"] + 1}"]',
+        f'[Red "{record["red"]}"]',
+        f'[Black "{record["black"]}"]',
+        f'[Result "{record["result"]}"]',
+        f'[FEN "{record["fen"]}"]',
+        f'[Termination "{record["reason"]}"]',
+        f'[PlyCount "{len(record["moves"])}"]',
+        '',
+    ]
+    tokens = []
+    for ply, move in enumerate(record['moves']):
+        if ply % 2 == 0:
+            tokens.append(f'{ply // 2 + 1}.')
+        tokens.append(move)
+        if ply + 1 == record['opening_plies']:
+            tokens.append('{book}')
+    tokens.append(record['result'])
+
+    # 每行最多80个字符
+    text, line = [], ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            text.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    text.append(line)
+    return '\n'.join(lines + text) + '\n\n'
+
+
+def write_results(path: str, engine1: EngineConfig, engine2: EngineConfig, summary: Dict, records: List[Dict]):
+    '''把配置、统计结果和所有对局记录写入JSON文件 (先写临时文件再替换)。'''
+    data = {
+        'engine1': engine1._asdict(),
+        'engine2': engine2._asdict(),
+        'summary': summary,
+        'games': sorted(records, key=lambda record: record['index']),
+    }
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def run_match(engine1: EngineConfig, engine2: EngineConfig, games: int, workers: int, output_dir: str,
+              opening_plies: int, book_path: str, seed: int,
+              elo0: float, elo1: float, alpha: float, beta: float) -> Dict:
+    '''
+    进行对战，直到下完 `games` 盘棋或者 SPRT 做出判断。
+
+    Returns:
+        Dict: 从 engine1 一方来看的统计结果 (参见 `summarize`)。
+    '''
+    if engine1.name == engine2.name:
+        raise ValueError('两个引擎的名称必须不同')
+
+    openings = generate_openings((games + 1) // 2, opening_plies, book_path, seed)
+    if not openings:
+        raise ValueError('无法生成开局')
+
+    os.makedirs(output_dir, exist_ok=True)
+    pgn_path = os.path.join(output_dir, 'games.pgn')
+    results_path = os.path.join(output_dir, 'results.json')
+    event = f'{engine1.name} vs {engine2.name}'
+    open(pgn_path, 'w', encoding='utf-8').close()
+
+    print(f'{event}: 最多 {games} 盘, {len(openings)} 个开局, {workers} 个进程, '
+          f'SPRT elo0={elo0} elo1={elo1} alpha={alpha} beta={beta}')
+
+    records = []
+    summary = summarize(records, engine1.name, elo0, elo1, alpha, beta)
+    start = time.time()
+    with Pool(workers, initializer=_init_worker) as pool:
+        for record in pool.imap_unordered(play_game, generate_tasks(openings, engine1, engine2, games)):
+            records.append(record)
+            summary = summarize(records, engine1.name, elo0, elo1, alpha, beta)
+
+            with open(pgn_path, 'a', encoding='utf-8') as f:
+                f.write(format_pgn(record, event))
+            write_results(results_path, engine1, engine2, summary, records)
+
+            print(f'[{summary["games"]:4d}] {record["red"]} vs {record["black"]}: {record["result"]:7s} '
+                  f'({record["reason"]}, {len(record["moves"])} 步)  '
+                  f'+{summary["wins"]} ={summary["draws"]} -{summary["losses"]}  '
+                  f'Elo {summary["elo"]:+.1f} [{summary["elo_low"]:+.1f}, {summary["elo_high"]:+.1f}]  '
+                  f'LLR {summary["llr"]:+.2f} {summary["llr_bounds"]}')
+
+            if summary['sprt'] is not None:
+                # 已经做出判断，放弃还没有下完的对局
+                pool.terminate()
+                break
+
+    elapsed = time.time() - start
+    print(f'\n共 {summary["games"]} 盘, 用时 {elapsed:.0f}s。{engine1.name} 对 {engine2.name}: '
+          f'+{summary["wins"]} ={summary["draws"]} -{summary["losses"]}, '
+          f'得分率 {summary["score"]:.1%}, Elo {summary["elo"]:+.1f} '
+          f'[{summary["elo_low"]:+.1f}, {summary["elo_high"]:+.1f}]')
+    if summary['sprt'] == 'H1':
+        print(f'SPRT: 接受 H1，{engine1.name} 至少强 {elo1} Elo 的可能性更大。')
+    elif summary['sprt'] == 'H0':
+        print(f'SPRT: 接受 H0，{engine1.name} 没有强于 {elo0} Elo。')
+    else:
+        print('SPRT: 尚未做出判断。')
+    print(f'结果已写入 {results_path} 和 {pgn_path}')
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='两个引擎配置之间的对战 (SPRT)')
+    parser.add_argument('--engine1', default='', help='被测试的引擎配置，例如 name=new,time=0.2 (默认: time=0.1)')
+    parser.add_argument('--engine2', default='', help='作为基准的引擎配置 (默认: time=0.1)')
+    parser.add_argument('--games', type=int, default=1000, help='最多对局数 (默认: 1000)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行对局的进程数 (默认: CPU核心数)')
+    parser.add_argument('--output', default='match_output', help='结果和棋谱的输出目录 (默认: match_output)')
+    parser.add_argument('--book', default=BOOK_FILE, help='用于生成开局的开局库文件')
+    parser.add_argument('--opening-plies', type=int, default=8, help='开局的步数 (半回合，默认: 8)')
+    parser.add_argument('--seed', type=int, default=0, help='生成开局的随机种子 (默认: 0)')
+    parser.add_argument('--elo0', type=float, default=0.0, help='SPRT 的 H0 Elo差 (默认: 0)')
+    parser.add_argument('--elo1', type=float, default=10.0, help='SPRT 的 H1 Elo差 (默认: 10)')
+    parser.add_argument('--alpha', type=float, default=0.05, help='SPRT 的第一类错误率 (默认: 0.05)')
+    parser.add_argument('--beta', type=float, default=0.05, help='SPRT 的第二类错误率 (默认: 0.05)')
+    args = parser.parse_args()
+
+    try:
+        engine1 = parse_engine_config(args.engine1, 'engine1')
+        engine2 = parse_engine_config(args.engine2, 'engine2')
+        run_match(engine1, engine2, args.games, max(1, args.workers), args.output, args.opening_plies,
+                  args.book, args.seed, args.elo0, args.elo1, args.alpha, args.beta)
+    except ValueError as e:
+        print(f'错误: {e}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+'''
+走法生成的正确性与速度测试脚本 (Perft)。
+
+Perft (performance test) 会枚举从某个局面出发、指定深度内的所有合法走法序列，
+并统计叶子节点的数量。把统计结果与已知的参考值对比，就可以验证
+`generate_moves`、`move_piece` 和 `unmove_piece` 三者是否一致；
+同时它也是衡量原始走法生成速度的标准方法。
+
+功能：
+- 批量计数：在最后一层只统计合法走法的数量，而不逐个执行走法。
+- 可选的子树计数哈希表：以Zobrist哈希值和剩余深度为键，缓存子树的节点数，
+  通过转置 (不同走法顺序到达同一局面) 来减少重复计算。
+- divide 模式：分别列出根局面每个走法下的子树节点数，便于定位出错的走法。
+- verify 模式：在整棵树的每个节点上，把 `generate_moves` 的结果与一个独立实现的
+  参考生成器 (走棋后检查对方是否能直接吃掉己方将/帅) 逐一比对。
+
+用法：
+    python -m scripts.perft                                  # 运行参考局面测试集
+    python -m scripts.perft --depth 4 --hash                 # 使用子树计数哈希表
+    python -m scripts.perft --fen "<FEN>" --depth 3 --divide
+    python -m scripts.perft --fen "<FEN>" --depth 3 --verify
+'''
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.bitboard import Bitboard, PIECE_TO_BB_INDEX
+from src.moves import generate_moves, generate_all_moves, Move
+from src.constants import *
+
+# --- 参考局面 ---
+# (名称, FEN, [深度1, 深度2, ...] 的节点数)
+# 初始局面的节点数是公认的参考值；其余局面覆盖了牵制、炮架、将帅对脸和兵的将军等情况，
+# 其节点数已经与 --verify 模式下的独立参考生成器交叉验证过。
+REFERENCE_POSITIONS = [
+    ('初始局面', 'rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w - - 0 1',
+     [44, 1920, 79666, 3290240]),
+    ('炮打中象', 'rnbakCb1r/9/7c1/p1p1p1p1p/9/9/P1P1P1P1P/1C7/9/RcBAKABNR b - - 0 1',
+     [37, 1502, 54980, 2191415]),
+    ('马炮残局', '4kabn1/3Pa4/2c1b4/2c5p/p3CN3/9/9/9/3K5/9 w - - 0 1',
+     [22, 470, 11373, 291033]),
+    ('中局对攻', 'r1ba1a3/4kn3/2n1b4/pNp1p1p1p/4c4/6P2/P1P2R2P/1CcC5/9/2BAKAB2 w - - 0 1',
+     [38, 1128, 43929, 1339047]),
+    ('兵卒将军', '3k5/4P4/4P4/9/9/9/9/9/4p4/3K5 b - - 0 1',
+     [1, 1, 3, 11]),
+    ('将帅对脸', '4k4/9/4c4/9/9/9/9/4R4/4A4/4K4 w - - 0 1',
+     [7, 38, 414, 3665]),
+]
+
+
+def perft(bb: Bitboard, depth: int, tt: Optional[Dict[Tuple[int, int], int]] = None) -> int:
+    '''
+    统计从当前局面出发、深度为 `depth` 的合法走法序列数 (叶子节点数)。
+
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+        depth (int): 搜索深度。
+        tt (Optional[Dict]): 子树计数哈希表，键为 (Zobrist哈希值, 深度)。为None时不使用。
+
+    Returns:
+        int: 叶子节点数。
+    '''
+    if depth <= 0:
+        return 1
+
+    if tt is not None:
+        key = (bb.hash_key, depth)
+        cached = tt.get(key)
+        if cached is not None:
+            return cached
+
+    legal_moves = generate_moves(bb)
+
+    # 批量计数：最后一层不需要执行走法
+    if depth == 1:
+        nodes = len(legal_moves)
+    else:
+        nodes = 0
+        for from_sq, to_sq in legal_moves:
+            captured = bb.move_piece(from_sq, to_sq)
+            nodes += perft(bb, depth - 1, tt)
+            bb.unmove_piece(from_sq, to_sq, captured)
+
+    if tt is not None:
+        tt[key] = nodes
+    return nodes
+
+
+def divide(bb: Bitboard, depth: int, tt: Optional[Dict[Tuple[int, int], int]] = None) -> List[Tuple[Move, int]]:
+    '''
+    分别统计根局面每个合法走法下的子树节点数。
+
+    Returns:
+        List[Tuple[Move, int]]: (走法, 该走法下深度为 depth-1 的叶子节点数) 的列表。
+    '''
+    results = []
+    for from_sq, to_sq in generate_moves(bb):
+        captured = bb.move_piece(from_sq, to_sq)
+        results.append(((from_sq, to_sq), perft(bb, depth - 1, tt)))
+        bb.unmove_piece(from_sq, to_sq, captured)
+    return results
+
+
+def move_to_str(move: Move) -> str:
+    '''将走法转换为ICCS坐标记法，例如 h2e2 (列 a-i 从左到右，行 0-9 从红方底线开始)。'''
+    from_sq, to_sq = move
+    return (f'{chr(ord("a") + from_sq % 9)}{9 - from_sq // 9}'
+            f'{chr(ord("a") + to_sq % 9)}{9 - to_sq // 9}')
+
+
+# --- 独立的参考走法生成器 (仅用于 verify 模式) ---
+
+def _king_can_be_captured(bb: Bitboard, player: int) -> bool:
+    '''
+    判断对方在当前局面下能否直接吃掉 `player` 方的将/帅，或者双方将帅对脸。
+
+    与 `is_check` 不同，这里不使用任何攻击表，而是直接生成对方的全部伪合法走法，
+    看其中是否有走法落在己方将/帅上。
+    '''
+    king_bb = bb.piece_bitboards[PIECE_TO_BB_INDEX[R_KING * player]]
+    if not king_bb:
+        return True
+    king_sq = (king_bb & -king_bb).bit_length() - 1
+
+    for _, to_sq in generate_all_moves(bb, -player):
+        if to_sq == king_sq:
+            return True
+
+    # 将帅对脸：沿着将/帅所在的列逐格查找，第一个遇到的棋子是对方的将/帅
+    step = -9 if player == PLAYER_R else 9
+    sq = king_sq + step
+    while 0 <= sq < 90:
+        piece = bb.board[sq]
+        if piece != EMPTY:
+            return piece == R_KING * -player
+        sq += step
+    return False
+
+
+def reference_legal_moves(bb: Bitboard) -> List[Move]:
+    '''用最直接的方式生成合法走法：试走每一个伪合法走法，看对方能否吃掉己方将/帅。'''
+    player = bb.player_to_move
+    legal_moves = []
+    for from_sq, to_sq in generate_all_moves(bb, player):
+        captured = bb.move_piece(from_sq, to_sq)
+        if not _king_can_be_captured(bb, player):
+            legal_moves.append((from_sq, to_sq))
+        bb.unmove_piece(from_sq, to_sq, captured)
+    return legal_moves
+
+
+def verify(bb: Bitboard, depth: int) -> Optional[str]:
+    '''
+    在深度为 `depth` 的整棵树上，逐节点比对 `generate_moves` 与参考生成器的结果。
+
+    Returns:
+        Optional[str]: 第一个不一致节点的描述；全部一致时返回None。
+    '''
+    actual = set(generate_moves(bb))
+    expected = set(reference_legal_moves(bb))
+    if actual != expected:
+        extra = ' '.join(move_to_str(m) for m in sorted(actual - expected))
+        missing = ' '.join(move_to_str(m) for m in sorted(expected - actual))
+        return f'{bb.to_fen()}  多余: [{extra}]  缺少: [{missing}]'
+
+    if depth > 1:
+        for from_sq, to_sq in sorted(actual):
+            captured = bb.move_piece(from_sq, to_sq)
+            error = verify(bb, depth - 1)
+            bb.unmove_piece(from_sq, to_sq, captured)
+            if error:
+                return error
+    return None
+
+
+def run_suite(max_depth: int, use_hash: bool) -> bool:
+    '''
+    运行参考局面测试集，打印每个局面每个深度的节点数、耗时和NPS。
+
+    Returns:
+        bool: 所有结果都与参考值一致时返回True。
+    '''
+    all_passed = True
+    total_nodes, total_time = 0, 0.0
+    for name, fen, expected_counts in REFERENCE_POSITIONS:
+        print(f'{name}: {fen}')
+        for depth, expected in enumerate(expected_counts[:max_depth], start=1):
+            bb = Bitboard(fen)
+            tt = {} if use_hash else None
+            start = time.perf_counter()
+            nodes = perft(bb, depth, tt)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+
+            status = 'OK' if nodes == expected else f'FAIL (期望 {expected})'
+            all_passed &= nodes == expected
+            nps = nodes / elapsed if elapsed > 0 else 0
+            print(f'  深度 {depth}: {nodes:>10} 节点  {elapsed:7.2f}s  {nps:>10.0f} nps  {status}')
+
+    print(f'总计: {total_nodes} 节点, {total_time:.2f}s, {total_nodes / max(total_time, 1e-9):.0f} nps')
+    print('全部通过。' if all_passed else '存在不一致的结果！')
+    return all_passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='中国象棋走法生成 Perft 测试')
+    parser.add_argument('--fen', help='要测试的局面 (FEN)。不指定时运行参考局面测试集。')
+    parser.add_argument('--depth', type=int, default=3, help='测试深度 (默认: 3)')
+    parser.add_argument('--divide', action='store_true', help='分别列出根局面每个走法的节点数')
+    parser.add_argument('--hash', action='store_true', help='使用子树计数哈希表')
+    parser.add_argument('--verify', action='store_true', help='与独立的参考走法生成器逐节点比对')
+    args = parser.parse_args()
+
+    if args.verify:
+        fens = [args.fen] if args.fen else [fen for _, fen, _ in REFERENCE_POSITIONS]
+        ok = True
+        for fen in fens:
+            error = verify(Bitboard(fen), args.depth)
+            print(f'{fen}: {"OK" if error is None else "FAIL"}')
+            if error:
+                print(f'  {error}')
+                ok = False
+        sys.exit(0 if ok else 1)
+
+    if not args.fen:
+        sys.exit(0 if run_suite(args.depth, args.hash) else 1)
+
+    bb = Bitboard(args.fen)
+    tt = {} if args.hash else None
+    start = time.perf_counter()
+    if args.divide:
+        results = divide(bb, args.depth, tt)
+        for move, nodes in results:
+            print(f'{move_to_str(move)}: {nodes}')
+        nodes = sum(n for _, n in results)
+        print(f'走法数: {len(results)}')
+    else:
+        nodes = perft(bb, args.depth, tt)
+    elapsed = time.perf_counter() - start
+    print(f'节点数: {nodes}, 耗时: {elapsed:.2f}s, NPS: {nodes / max(elapsed, 1e-9):.0f}')
+
+
+if __name__ == '__main__':
+    main()
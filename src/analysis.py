@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+'''
+基于 asyncio 的异步分析接口。
+
+`Engine` 的搜索是同步的、CPU密集的操作，直接在事件循环中调用会让界面在引擎思考时失去响应。
+`Analysis` 把一次搜索放到后台线程中运行，并把迭代加深每完成一层时的搜索信息
+(深度、分数、主要变例、节点数) 通过异步迭代器交给事件循环：
+
+    analysis = await engine.analyse(board, SearchLimits(time=3.0))
+    async for info in analysis:
+        print(info.depth, info.score, info.pv)
+    score, move = await analysis.wait()
+
+调用 `analysis.stop()` 会让搜索在下一次时间检查时结束，并返回最后一层完成的迭代的结果。
+
+搜索线程在运行Python代码时持有GIL，解释器每隔几毫秒切换一次线程，
+因此事件循环 (例如界面的绘制和输入处理) 在搜索期间仍然可以运行，只是会略微降低搜索速度。
+'''
+
+import asyncio
+from typing import Optional, Tuple
+
+from src.bitboard import Bitboard
+from src.engine import Engine, Move, SearchInfo, SearchLimits
+
+
+class Analysis:
+    '''
+    一次在后台线程中进行的搜索。
+
+    通过 `Engine.analyse()` 创建。可以用 `async for` 逐个获得每一层迭代的 `SearchInfo`，
+    迭代在搜索结束时结束；用 `await wait()` 获得最终结果。
+
+    Attributes:
+        info (Optional[SearchInfo]): 最近一次收到的搜索信息。
+        book_move (Optional[Move]): 命中开局库时的开局库走法，此时不进行搜索。
+    '''
+
+    def __init__(self, engine: Engine, bb: Bitboard, limits: SearchLimits, workers: int,
+                 book_move: Optional[Move] = None):
+        '''
+        开始搜索。必须在事件循环中创建 (由 `Engine.analyse()` 调用)。
+
+        Args:
+            engine (Engine): 进行搜索的引擎。
+            bb (Bitboard): 要搜索的局面 (搜索线程独占使用)。
+            limits (SearchLimits): 搜索的限制条件。
+            workers (int): 并行搜索的进程数。
+            book_move (Optional[Move]): 开局库走法。不为None时不进行搜索。
+        '''
+        self._engine = engine
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.info: Optional[SearchInfo] = None
+        self.book_move = book_move
+
+        if book_move is not None:
+            self._future = self._loop.create_future()
+            self._future.set_result((0, book_move))
+            self._queue.put_nowait(None)
+        else:
+            self._future = self._loop.run_in_executor(None, self._run, bb, limits, workers)
+
+    def _run(self, bb: Bitboard, limits: SearchLimits, workers: int) -> Tuple[float, Optional[Move]]:
+        '''在后台线程中执行搜索，每完成一层迭代就把搜索信息交给事件循环。'''
+        try:
+            score, move, _ = self._engine._search(bb, limits.depth, limits.time, limits.nodes, workers,
+                                                  on_iteration=self._on_iteration)
+            return score, move
+        finally:
+            # None 表示搜索已经结束
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+
+    def _on_iteration(self, info: SearchInfo):
+        '''搜索线程中的回调：把搜索信息转交给事件循环。'''
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, info)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> SearchInfo:
+        info = await self._queue.get()
+        if info is None:
+            # 让之后的迭代也立即结束
+            self._queue.put_nowait(None)
+            raise StopAsyncIteration
+        self.info = info
+        return info
+
+    def stop(self):
+        '''请求搜索尽快结束 (不等待)。'''
+        if not self._future.done():
+            self._engine.stop()
+
+    def done(self) -> bool:
+        '''搜索是否已经结束。'''
+        return self._future.done()
+
+    async def wait(self) -> Tuple[float, Optional[Move]]:
+        '''
+        等待搜索结束。
+
+        Returns:
+            Tuple[float, Optional[Move]]: 最后一层完成的迭代的分数和最佳走法 (或开局库走法)。
+        '''
+        return await self._future
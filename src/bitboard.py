@@ -8,12 +8,15 @@
 吃子和攻击检测等操作可以通过高效的位运算来完成。
 
 该实现还包含了Zobrist哈希，用于快速地为每个棋盘局面生成一个唯一的哈希值，
-这对于置换表的实现至关重要。
+这对于置换表的实现至关重要。同样地，子力价值与位置分也在走子时增量维护，
+使评估函数可以在常数时间内完成。
 '''
 
+from array import array
 from typing import Optional
 from src.constants import *
 from src.zobrist import zobrist_keys, zobrist_player
+from src.pst import PHASE_VALUES, PST_MG_SQ, PST_EG_SQ
 
 # --- 预计算的掩码和映射表 ---
 
@@ -48,7 +51,18 @@ class Bitboard:
         color_bitboards (list[int]): 2个位棋盘，一个用于红方所有棋子，一个用于黑方所有棋子。
         player_to_move (int): 当前走棋方 (PLAYER_R 或 PLAYER_B)。
         hash_key (int): 当前局面的Zobrist哈希值。
-        history (list[int]): 记录历史Zobrist哈希值的列表，用于检测重复局面。
+        history (list[int]): 记录历史Zobrist哈希值的列表。
+        repetition_counts (dict[int, int]): 自上一个不可逆走法 (吃子或空着) 以来，
+            每个局面哈希值出现的次数，用于在常数时间内检测重复局面。
+        last_irreversible_ply (int): 上一个不可逆走法之后的局面在 `history` 中的索引。
+            在此之前的局面不可能再次出现，因此重复检测只需要考虑此后的局面。
+        material (int): 双方子力价值之和 (红正黑负)。
+        phase_material (int): 双方参与阶段计算的子力价值之和，用于渐进式评估。
+        pst_mg (int): 双方中局位置分之和 (红正黑负)。
+        pst_eg (int): 双方残局位置分之和 (红正黑负)。
+        rank_occ (list[int]): 每一行的占位 (10个9位整数)，第c位为1表示该行第c列有棋子。
+        file_occ (list[int]): 每一列的占位 (9个10位整数)，第r位为1表示该列第r行有棋子。
+            这两组占位随走子增量维护，车和炮的攻击可以直接用它们查表得到 (参见 `src.moves`)。
     '''
     @staticmethod
     def get_player(piece: int) -> int:
@@ -76,6 +90,12 @@ class Bitboard:
         self.hash_key = 0
         self.history = []
         self.board = [EMPTY] * 90
+        self.material = 0
+        self.phase_material = 0
+        self.pst_mg = 0
+        self.pst_eg = 0
+        self.rank_occ = [0] * 10
+        self.file_occ = [0] * 9
 
         if fen:
             self.parse_fen(fen)
@@ -84,6 +104,10 @@ class Bitboard:
 
         # 将初始局面的哈希值存入历史记录
         self.history.append(self.hash_key)
+        self.repetition_counts = {self.hash_key: 1}
+        self.last_irreversible_ply = 0
+        # 每个不可逆走法之前的 (repetition_counts, last_irreversible_ply)，撤销时恢复
+        self._irreversible_stack = []
 
     @staticmethod
     def get_player_bb_idx(player: int) -> int:
@@ -102,6 +126,12 @@ class Bitboard:
         self.color_bitboards = [0] * 2
         self.hash_key = 0
         self.board = [EMPTY] * 90
+        self.material = 0
+        self.phase_material = 0
+        self.pst_mg = 0
+        self.pst_eg = 0
+        self.rank_occ = [0] * 10
+        self.file_occ = [0] * 9
 
         # 根据FEN字符串设置棋子
         for r, row_str in enumerate(fen_board.split('/')):
@@ -127,7 +157,7 @@ class Bitboard:
 
     def _set_piece(self, piece_type: int, sq: int):
         '''
-        在指定位置放置一个棋子，并更新所有相关的位棋盘和Zobrist哈希值。
+        在指定位置放置一个棋子，并更新所有相关的位棋盘、Zobrist哈希值和增量评估值。
         这是一个内部辅助函数，主要用于初始化。
         '''
         mask = SQUARE_MASKS[sq]
@@ -140,15 +170,23 @@ class Bitboard:
         self.piece_bitboards[PIECE_TO_BB_INDEX[piece_type]] |= mask
         # 更新颜色位棋盘
         self.color_bitboards[Bitboard.get_player_bb_idx(player)] |= mask
+        # 更新行/列占位
+        self.rank_occ[r] |= 1 << c
+        self.file_occ[c] |= 1 << r
         # 更新Zobrist哈希
         self.hash_key ^= zobrist_keys[Bitboard.piece_to_zobrist_idx(piece_type)][r][c]
+        # 更新增量评估值
+        self.material += PIECE_VALUES[piece_type]
+        self.phase_material += PHASE_VALUES[piece_type]
+        self.pst_mg += PST_MG_SQ[piece_type][sq]
+        self.pst_eg += PST_EG_SQ[piece_type][sq]
 
     def move_piece(self, from_sq: int, to_sq: int) -> int:
         '''
         在棋盘上执行一步走法。
 
-        这会更新所有位棋盘和Zobrist哈希值。这是一个增量更新，比重新计算整个
-        哈希值要快得多。
+        这会更新所有位棋盘、Zobrist哈希值和增量评估值。这是一个增量更新，
+        比重新计算整个哈希值和评估值要快得多。
 
         Args:
             from_sq (int): 起始位置。
@@ -180,8 +218,18 @@ class Bitboard:
         move_mask = SQUARE_MASKS[from_sq] | SQUARE_MASKS[to_sq]
         self.piece_bitboards[PIECE_TO_BB_INDEX[moving_piece]] ^= move_mask
         self.color_bitboards[Bitboard.get_player_bb_idx(self.player_to_move)] ^= move_mask
-
-        # 4. 如果有吃子，处理被吃掉的棋子
+        # 起始位置变空，目标位置被占据 (吃子时目标位置原本就被占据)
+        self.rank_occ[r_from] ^= 1 << c_from
+        self.rank_occ[r_to] |= 1 << c_to
+        self.file_occ[c_from] ^= 1 << r_from
+        self.file_occ[c_to] |= 1 << r_to
+
+        # 4. 更新移动棋子的位置分
+        mg_table, eg_table = PST_MG_SQ[moving_piece], PST_EG_SQ[moving_piece]
+        self.pst_mg += mg_table[to_sq] - mg_table[from_sq]
+        self.pst_eg += eg_table[to_sq] - eg_table[from_sq]
+
+        # 5. 如果有吃子，处理被吃掉的棋子
         if captured_piece != EMPTY:
             # 从哈希中移除被吃掉的棋子
             captured_z_idx = Bitboard.piece_to_zobrist_idx(captured_piece)
@@ -190,12 +238,23 @@ class Bitboard:
             capture_mask = CLEAR_MASKS[to_sq]
             self.piece_bitboards[PIECE_TO_BB_INDEX[captured_piece]] &= capture_mask
             self.color_bitboards[Bitboard.get_player_bb_idx(Bitboard.get_player(captured_piece))] &= capture_mask
+            # 从增量评估值中移除被吃掉的棋子
+            self.material -= PIECE_VALUES[captured_piece]
+            self.phase_material -= PHASE_VALUES[captured_piece]
+            self.pst_mg -= PST_MG_SQ[captured_piece][to_sq]
+            self.pst_eg -= PST_EG_SQ[captured_piece][to_sq]
 
-        # 5. 切换走棋方并更新哈希
+        # 6. 切换走棋方并更新哈希
         self.player_to_move *= -1
         self.hash_key ^= zobrist_player
         self.history.append(self.hash_key)
 
+        # 7. 更新重复局面计数。吃子是不可逆的，之前的局面不可能再出现，因此开始一个新的计数窗口。
+        if captured_piece != EMPTY:
+            self._start_irreversible_window()
+        else:
+            self.repetition_counts[self.hash_key] = self.repetition_counts.get(self.hash_key, 0) + 1
+
         return captured_piece
 
     def unmove_piece(self, from_sq: int, to_sq: int, captured_piece: int):
@@ -205,6 +264,15 @@ class Bitboard:
         这是 `move_piece` 的逆操作，用于在搜索中恢复棋盘状态。
         撤销的顺序与执行走法的顺序严格相反。
         '''
+        # 恢复重复局面计数
+        if captured_piece != EMPTY:
+            self._end_irreversible_window()
+        else:
+            count = self.repetition_counts[self.hash_key] - 1
+            if count:
+                self.repetition_counts[self.hash_key] = count
+            else:
+                del self.repetition_counts[self.hash_key]
         self.history.pop()
         moving_piece = self.board[to_sq]  # 使用邮箱快速查找
         r_from, c_from = from_sq // 9, from_sq % 9
@@ -222,10 +290,20 @@ class Bitboard:
         move_mask = SQUARE_MASKS[from_sq] | SQUARE_MASKS[to_sq]
         self.piece_bitboards[PIECE_TO_BB_INDEX[moving_piece]] ^= move_mask
         self.color_bitboards[Bitboard.get_player_bb_idx(self.player_to_move)] ^= move_mask
+        # 起始位置重新被占据；没有吃子时目标位置变空
+        self.rank_occ[r_from] |= 1 << c_from
+        self.file_occ[c_from] |= 1 << r_from
+        if captured_piece == EMPTY:
+            self.rank_occ[r_to] ^= 1 << c_to
+            self.file_occ[c_to] ^= 1 << r_to
         # 恢复Zobrist哈希
         moving_z_idx = Bitboard.piece_to_zobrist_idx(moving_piece)
         self.hash_key ^= zobrist_keys[moving_z_idx][r_from][c_from]
         self.hash_key ^= zobrist_keys[moving_z_idx][r_to][c_to]
+        # 恢复移动棋子的位置分
+        mg_table, eg_table = PST_MG_SQ[moving_piece], PST_EG_SQ[moving_piece]
+        self.pst_mg += mg_table[from_sq] - mg_table[to_sq]
+        self.pst_eg += eg_table[from_sq] - eg_table[to_sq]
 
         # 4. 如果有吃子，将被吃的棋子放回 to_sq
         if captured_piece != EMPTY:
@@ -236,6 +314,47 @@ class Bitboard:
             # 恢复被吃棋子的Zobrist哈希
             captured_z_idx = Bitboard.piece_to_zobrist_idx(captured_piece)
             self.hash_key ^= zobrist_keys[captured_z_idx][r_to][c_to]
+            # 恢复被吃棋子的增量评估值
+            self.material += PIECE_VALUES[captured_piece]
+            self.phase_material += PHASE_VALUES[captured_piece]
+            self.pst_mg += PST_MG_SQ[captured_piece][to_sq]
+            self.pst_eg += PST_EG_SQ[captured_piece][to_sq]
+
+    def make_null_move(self):
+        '''
+        执行一步空着 (只交换走棋方，不移动任何棋子)，用于空着裁剪。
+
+        空着被视为不可逆走法：空着之后的局面不会与之前的局面构成重复。
+        '''
+        self.player_to_move *= -1
+        self.hash_key ^= zobrist_player
+        self.history.append(self.hash_key)
+        self._start_irreversible_window()
+
+    def unmake_null_move(self):
+        '''撤销一步空着。'''
+        self._end_irreversible_window()
+        self.history.pop()
+        self.player_to_move *= -1
+        self.hash_key ^= zobrist_player
+
+    def _start_irreversible_window(self):
+        '''在不可逆走法之后，保存旧的重复计数并从当前局面开始一个新的计数窗口。'''
+        self._irreversible_stack.append((self.repetition_counts, self.last_irreversible_ply))
+        self.repetition_counts = {self.hash_key: 1}
+        self.last_irreversible_ply = len(self.history) - 1
+
+    def _end_irreversible_window(self):
+        '''撤销不可逆走法时，恢复之前的重复计数窗口。'''
+        self.repetition_counts, self.last_irreversible_ply = self._irreversible_stack.pop()
+
+    def repetition_count(self) -> int:
+        '''
+        返回当前局面自上一个不可逆走法以来出现的次数 (包括当前这一次)。
+
+        这是一个常数时间的操作，与对局进行了多少步无关。
+        '''
+        return self.repetition_counts.get(self.hash_key, 0)
 
     def get_piece_on_square(self, sq: int) -> int:
         '''获取指定位置上的棋子。'''
@@ -279,12 +398,66 @@ class Bitboard:
         return f'{board_fen} {player_fen} - - 0 1'
 
     def copy(self):
-        '''创建一个当前Bitboard对象的深拷贝。'''
-        new_bb = Bitboard()
+        '''
+        创建一个当前Bitboard对象的深拷贝。
+
+        为了减少开销，历史记录只复制上一个不可逆走法之后的部分，这已足够用于重复检测。
+        因此拷贝得到的棋盘不能撤销到拷贝之前的走法。
+        '''
+        new_bb = Bitboard.__new__(Bitboard)
         new_bb.piece_bitboards = self.piece_bitboards[:]
         new_bb.color_bitboards = self.color_bitboards[:]
         new_bb.player_to_move = self.player_to_move
         new_bb.hash_key = self.hash_key
-        new_bb.history = self.history[:]
+        new_bb.history = self.history[self.last_irreversible_ply:]
+        new_bb.repetition_counts = dict(self.repetition_counts)
+        new_bb.last_irreversible_ply = 0
+        new_bb._irreversible_stack = []
         new_bb.board = self.board[:]
+        new_bb.material = self.material
+        new_bb.phase_material = self.phase_material
+        new_bb.pst_mg = self.pst_mg
+        new_bb.pst_eg = self.pst_eg
+        new_bb.rank_occ = self.rank_occ[:]
+        new_bb.file_occ = self.file_occ[:]
         return new_bb
+
+    def __getstate__(self) -> tuple:
+        '''
+        返回用于序列化 (pickle) 的紧凑状态，使棋盘可以低成本地发送给其他进程。
+
+        只保存棋盘数组、走棋方和上一个不可逆走法之后的哈希历史 (用于重复检测)，
+        位棋盘、哈希值和增量评估值都可以由它们重新计算出来。
+        与 `copy()` 一样，恢复后的棋盘不能撤销到序列化之前的走法。
+        '''
+        board = bytes(piece + 7 for piece in self.board)
+        history = array('Q', self.history[self.last_irreversible_ply:]).tobytes()
+        return board, self.player_to_move, history
+
+    def __setstate__(self, state: tuple):
+        '''从 `__getstate__` 返回的紧凑状态恢复棋盘。'''
+        board, player_to_move, history = state
+        self.piece_bitboards = [0] * 14
+        self.color_bitboards = [0] * 2
+        self.hash_key = 0
+        self.board = [EMPTY] * 90
+        self.material = 0
+        self.phase_material = 0
+        self.pst_mg = 0
+        self.pst_eg = 0
+        self.rank_occ = [0] * 10
+        self.file_occ = [0] * 9
+        for sq, value in enumerate(board):
+            if value != 7:
+                self._set_piece(value - 7, sq)
+
+        self.player_to_move = player_to_move
+        if player_to_move == PLAYER_B:
+            self.hash_key ^= zobrist_player
+
+        self.history = array('Q', history).tolist()
+        self.repetition_counts = {}
+        for hash_key in self.history:
+            self.repetition_counts[hash_key] = self.repetition_counts.get(hash_key, 0) + 1
+        self.last_irreversible_ply = 0
+        self._irreversible_stack = []
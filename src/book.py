@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+'''
+二进制开局库的读写模块。
+
+开局库文件的格式 (所有整数均为小端序):
+    头部   24 字节: 魔数 b'XQBOOK\0\0'、版本号 (uint32)、局面数 N (uint32)、走法总数 M (uint32)、保留 (4字节)
+    键     N 个 uint64: 按升序排列的局面Zobrist哈希值
+    偏移   N+1 个 uint32: 第i个局面的走法位于走法数组的 [offsets[i], offsets[i+1])
+    走法   M 个 uint16: 每个走法打包为 from_sq << 7 | to_sq
+
+读取时整个文件通过 `mmap` 映射到内存，键数组被当作一个有序序列进行二分查找，
+不需要在启动时解析或转换任何数据，因此打开开局库的时间与开局库的大小无关。
+映射是只读的，同一台机器上的多个进程 (例如并行搜索的工作进程) 共享同一份物理内存。
+
+同一个进程中的所有引擎通过 `get_opening_book()` 共享同一个读取器，文件在第一次查询时才被打开。
+'''
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Tuple
+
+BOOK_FILE = 'opening_book.bin'  # 默认的开局库文件名
+
+_MAGIC = b'XQBOOK\0\0'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIII4x')
+
+# 走法 (from_sq, to_sq)
+SqMove = Tuple[int, int]
+
+
+class OpeningBook:
+    '''
+    内存映射的只读开局库。
+
+    创建对象时不会访问文件，第一次查询时才打开并映射文件，
+    因此引擎的启动时间与开局库的大小无关。文件不存在或无效时，开局库视为空。
+
+    Attributes:
+        path (str): 开局库文件的路径。
+        keys (Sequence[int]): 按升序排列的局面哈希值。
+        offsets (Sequence[int]): 每个局面的走法在走法数组中的起止位置。
+        moves (Sequence[int]): 打包后的走法数组。
+    '''
+
+    def __init__(self, path: str = BOOK_FILE):
+        self.path = path
+        self.keys = self.offsets = self.moves = None
+        self._mmap = None
+
+    def open(self):
+        '''
+        打开并映射开局库文件。
+
+        Raises:
+            FileNotFoundError: 文件不存在。
+            ValueError: 文件不是有效的开局库。
+        '''
+        with open(self.path, 'rb') as f:
+            book_mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_keys, num_moves = _HEADER.unpack_from(book_mmap, 0)
+        keys_start = _HEADER.size
+        offsets_start = keys_start + 8 * num_keys
+        moves_start = offsets_start + 4 * (num_keys + 1)
+        moves_end = moves_start + 2 * num_moves
+        if magic != _MAGIC or version != _VERSION or len(book_mmap) < moves_end:
+            book_mmap.close()
+            raise ValueError(f'{self.path} 不是有效的开局库文件')
+
+        if sys.byteorder == 'little':
+            view = memoryview(book_mmap)
+            self.keys = view[keys_start:offsets_start].cast('Q')
+            self.offsets = view[offsets_start:moves_start].cast('I')
+            self.moves = view[moves_start:moves_end].cast('H')
+        else:
+            # 大端序机器上无法直接映射，只能读出并转换字节序
+            self.keys = _load_array('Q', book_mmap[keys_start:offsets_start])
+            self.offsets = _load_array('I', book_mmap[offsets_start:moves_start])
+            self.moves = _load_array('H', book_mmap[moves_start:moves_end])
+        self._mmap = book_mmap
+
+    def _ensure_open(self):
+        '''第一次查询时打开文件；打开失败时退化为空的开局库。'''
+        if self.keys is not None:
+            return
+        try:
+            self.open()
+            print('开局库加载成功。')
+        except (FileNotFoundError, ValueError) as e:
+            self.keys, self.offsets, self.moves = (), (0,), ()
+            if isinstance(e, FileNotFoundError):
+                print('未找到开局库文件, 将不使用开局库。')
+            else:
+                print(f'{e}, 将不使用开局库。')
+
+    def __len__(self) -> int:
+        '''返回开局库中的局面数。'''
+        self._ensure_open()
+        return len(self.keys)
+
+    def __contains__(self, hash_key: int) -> bool:
+        return self._find(hash_key) >= 0
+
+    def _find(self, hash_key: int) -> int:
+        '''二分查找局面在键数组中的索引，找不到时返回-1。'''
+        self._ensure_open()
+        keys = self.keys
+        index = bisect.bisect_left(keys, hash_key)
+        if index < len(keys) and keys[index] == hash_key:
+            return index
+        return -1
+
+    def probe(self, hash_key: int) -> List[SqMove]:
+        '''
+        查询一个局面在开局库中的所有走法。
+
+        Args:
+            hash_key (int): 局面的Zobrist哈希值。
+
+        Returns:
+            List[SqMove]: 走法 (from_sq, to_sq) 的列表，按出现次数从多到少排列；
+                局面不在开局库中时为空列表。
+        '''
+        index = self._find(hash_key)
+        if index < 0:
+            return []
+        packed = self.moves[self.offsets[index]:self.offsets[index + 1]]
+        return [(move >> 7, move & 0x7F) for move in packed]
+
+    def close(self):
+        '''关闭内存映射。之后再次查询会重新打开文件。'''
+        if self._mmap is None:
+            return
+        for view in (self.keys, self.offsets, self.moves):
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+        self._mmap = None
+        self.keys = self.offsets = self.moves = None
+
+
+def _load_array(typecode: str, data: bytes) -> array:
+    '''从小端序字节数据创建数组 (用于大端序机器)。'''
+    values = array(typecode, data)
+    values.byteswap()
+    return values
+
+
+def write_book(path: str, book: Dict[int, List[SqMove]]):
+    '''
+    将开局库写入二进制文件。
+
+    先写入临时文件再替换，避免其他进程映射到一个写了一半的文件。
+
+    Args:
+        path (str): 输出文件的路径。
+        book (Dict[int, List[SqMove]]): 局面哈希值 -> 走法 (from_sq, to_sq) 列表。
+    '''
+    keys = array('Q', sorted(book))
+    offsets = array('I', [0])
+    moves = array('H')
+    for hash_key in keys:
+        moves.extend((from_sq << 7) | to_sq for from_sq, to_sq in book[hash_key])
+        offsets.append(len(moves))
+
+    if sys.byteorder != 'little':
+        for values in (keys, offsets, moves):
+            values.byteswap()
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(keys), len(moves)))
+        keys.tofile(f)
+        offsets.tofile(f)
+        moves.tofile(f)
+    os.replace(temp_path, path)
+
+
+def convert_json_book(json_path: str, bin_path: str) -> int:
+    '''
+    将JSON格式的开局库 (哈希值字符串 -> [[[r, c], [r, c]], ...]) 转换为二进制格式。
+
+    Returns:
+        int: 转换的局面数。
+    '''
+    import json
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        json_book = json.load(f)
+
+    book = {}
+    for key, moves in json_book.items():
+        book[int(key)] = [(fr * 9 + fc, tr * 9 + tc) for (fr, fc), (tr, tc) in moves]
+    write_book(bin_path, book)
+    return len(book)
+
+
+# --- 进程内共享的开局库读取器 ---
+_shared_books: Dict[str, OpeningBook] = {}
+
+
+def get_opening_book(path: str = BOOK_FILE) -> OpeningBook:
+    '''
+    返回进程内共享的开局库读取器。
+
+    同一路径的所有调用者得到同一个对象，文件在第一次查询时才被打开。
+
+    Args:
+        path (str): 开局库文件的路径。
+
+    Returns:
+        OpeningBook: 共享的开局库读取器。
+    '''
+    path = os.path.abspath(path)
+    book = _shared_books.get(path)
+    if book is None:
+        book = _shared_books[path] = OpeningBook(path)
+    return book
+
+
+if __name__ == '__main__':
+    # 用法: python -m src.book [opening_book.json] [opening_book.bin]
+    source = sys.argv[1] if len(sys.argv) > 1 else 'opening_book.json'
+    target = sys.argv[2] if len(sys.argv) > 2 else BOOK_FILE
+    count = convert_json_book(source, target)
+    print(f'已将 {count} 个局面从 {source} 转换到 {target}')
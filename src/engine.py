@@ -10,19 +10,24 @@
 - 后期走法裁减 (Late Move Reductions)
 - 历史启发 (History Heuristic)
 - 开局库 (Opening Book)
+- 多进程并行搜索 (Lazy SMP / 根节点分裂)
 '''
 
 import math
+import queue
+import threading
 import time
-import json
 import random
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
 # --- New Bitboard Imports ---
 from src.bitboard import Bitboard, PIECE_TO_BB_INDEX
+from src.book import OpeningBook, get_opening_book
 from src.evaluate import evaluate
 import src.moves as moves
-from src.zobrist import zobrist_player
+from src.movepick import MovePicker
+from src.stats import SearchStats
+from src.transposition import TranspositionTable, TT_EXACT, TT_LOWER, TT_UPPER
 
 
 from src.constants import *
@@ -30,10 +35,83 @@ from src.constants import *
 # --- Type Hint for Move ---
 Move = tuple[tuple[int, int], tuple[int, int]]
 
-# 置换表条目的标志 (Flags for Transposition Table entries)
-TT_EXACT = 0  # 精确值 (Exact score)
-TT_LOWER = 1  # 下界值 (Lower bound, alpha)
-TT_UPPER = 2  # 上界值 (Upper bound, beta)
+# 根节点分裂搜索时，低于此深度的迭代仍然串行进行 (太浅的迭代不值得分发给进程池)
+ROOT_SPLIT_MIN_DEPTH = 3
+
+# 期望窗口 (Aspiration Windows)：从这一层迭代开始，以上一层的分数为中心、
+# 半宽为 ASPIRATION_WINDOW 的窗口进行搜索，失败时窗口半宽加倍
+ASPIRATION_MIN_DEPTH = 4
+ASPIRATION_WINDOW = 50
+
+# 停止辅助进程时，等待结果期间检查辅助进程是否意外退出的间隔（秒）
+HELPER_POLL_INTERVAL = 0.1
+
+# 杀手走法表的层数 (搜索深度最多63层，常规搜索中的层数不会超过它)
+MAX_PLY = 64
+
+
+def sq_to_coord(sq: int) -> tuple[int, int]:
+    '''将棋盘位置索引 (0-89) 转换为行列坐标。'''
+    return sq // 9, sq % 9
+
+
+def move_to_iccs(move: Move) -> str:
+    '''将坐标形式的走法 ((r, c), (r, c)) 转换为ICCS记法 (例如 'h2e2')。'''
+    (from_r, from_c), (to_r, to_c) = move
+    return f'{chr(ord("a") + from_c)}{9 - from_r}{chr(ord("a") + to_c)}{9 - to_r}'
+
+
+def iccs_to_move(iccs: str) -> Move:
+    '''
+    将ICCS记法的走法 (例如 'h2e2') 转换为坐标形式 ((r, c), (r, c))。
+
+    Raises:
+        ValueError: 不是有效的ICCS走法。
+    '''
+    iccs = iccs.strip().lower()
+    if len(iccs) != 4 or not ('a' <= iccs[0] <= 'i' and 'a' <= iccs[2] <= 'i'
+                              and iccs[1].isdigit() and iccs[3].isdigit()):
+        raise ValueError(f'无效的ICCS走法: {iccs}')
+    return ((9 - int(iccs[1]), ord(iccs[0]) - ord('a')), (9 - int(iccs[3]), ord(iccs[2]) - ord('a')))
+
+
+class SearchLimits(NamedTuple):
+    '''
+    搜索的限制条件。所有条件都为默认值时，搜索一直进行到最大深度，或者被 `Engine.stop()` 停止。
+
+    Attributes:
+        depth (int): 最大搜索深度。
+        time (float): 时间限制（秒），0表示不限制。
+        nodes (int): 节点数限制，0表示不限制。
+    '''
+    depth: int = 63
+    time: float = 0
+    nodes: int = 0
+
+
+class SearchInfo(NamedTuple):
+    '''
+    迭代加深中每完成一层迭代时报告的搜索信息。
+
+    Attributes:
+        depth (int): 完成的深度。
+        score (float): 从根局面走棋方来看的分数。
+        pv (List[Move]): 主要变例 (从置换表中提取)，第一个走法就是当前的最佳走法。
+        nodes (int): 本次搜索到目前为止的节点数。
+        time (float): 本次搜索到目前为止的用时（秒）。
+        stats (Optional[SearchStats]): 搜索统计的快照，引擎没有开启统计时为None。
+    '''
+    depth: int
+    score: float
+    pv: List[Move]
+    nodes: int
+    time: float
+    stats: Optional[SearchStats] = None
+
+    @property
+    def nps(self) -> int:
+        '''每秒搜索的节点数。'''
+        return int(self.nodes / self.time) if self.time > 0 else 0
 
 
 class StopSearchException(Exception):
@@ -41,43 +119,374 @@ class StopSearchException(Exception):
     pass
 
 
+def _lazy_smp_helper(helper_id: int, hash_size_mb: int, shm_name: str,
+                     task_queue, result_queue, stop_event):
+    '''
+    Lazy SMP 辅助进程的主循环。
+
+    辅助进程连接到主引擎的共享置换表，对主引擎发来的同一个根局面进行迭代加深搜索，
+    直到主引擎设置停止事件。辅助进程的搜索结果本身不会被使用，它们唯一的作用是
+    把搜索结果写入共享置换表，让主引擎 (和其他辅助进程) 能够命中更多、更深的条目。
+
+    为了让各个进程搜索的树尽量不同，奇数号的辅助进程从深度2开始迭代，
+    这样它们总是比主引擎领先一层。
+
+    Args:
+        helper_id (int): 辅助进程的编号，从1开始。
+        hash_size_mb (int): 共享置换表的大小 (MB)。
+        shm_name (str): 共享置换表的共享内存名称。
+        task_queue: 接收搜索任务 (bb, generation, time_limit) 的队列，收到None时退出。
+        result_queue: 每完成一个任务，发送 (helper_id, nodes_searched, completed_depth)。
+        stop_event: 主引擎搜索结束时设置的停止事件。
+    '''
+    engine = Engine(hash_size_mb, load_book=False, shm_name=shm_name)
+    engine.stop_event = stop_event
+    start_depth = 1 + helper_id % 2
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        bb, generation, time_limit = task
+        completed_depth = 0
+        try:
+            engine.transposition_table.generation = generation
+            engine._age_history_table()
+            engine._clear_killer_moves()
+            _, _, completed_depth = engine._iterative_deepening(bb, 63, time_limit=time_limit, start_depth=start_depth)
+        finally:
+            result_queue.put((helper_id, engine.nodes_searched, completed_depth))
+
+    engine.transposition_table.close()
+
+
+# 根节点分裂搜索的工作进程中使用的引擎，由 `_init_root_worker` 创建
+_root_worker_engine = None
+
+
+def _init_root_worker(hash_size_mb: int):
+    '''进程池工作进程的初始化函数：创建一个拥有独立置换表的引擎，供之后的所有任务复用。'''
+    global _root_worker_engine
+    _root_worker_engine = Engine(hash_size_mb, load_book=False)
+
+
+def _search_root_move(bb: Bitboard, move: Tuple[int, int], depth: int, alpha: float, beta: float,
+                      reduction: int, generation: int) -> Tuple[float, int]:
+    '''
+    在工作进程中搜索一个根节点走法，与 `_negamax` 在根节点对该走法所做的完全一致。
+
+    Args:
+        bb (Bitboard): 根局面 (反序列化得到的独立副本)。
+        move (Tuple[int, int]): 要搜索的根走法 (from_sq, to_sq)。
+        depth (int): 根节点的搜索深度。
+        alpha (float): 根节点的alpha值 (由主进程串行搜索的第一个走法确定)。
+        beta (float): 根节点的beta值。
+        reduction (int): 后期走法裁减的深度。
+        generation (int): 主引擎置换表当前的代。代发生变化时，说明开始了新的一次搜索。
+
+    Returns:
+        Tuple[float, int]: 从根节点走棋方来看的分数，以及搜索的节点数。
+    '''
+    engine = _root_worker_engine
+    if engine.transposition_table.generation != generation:
+        engine.transposition_table.generation = generation
+        engine._age_history_table()
+        engine._clear_killer_moves()
+    engine.nodes_searched = 0
+    engine.time_limit = 0
+    engine.node_limit = 0
+
+    from_sq, to_sq = move
+    bb.move_piece(from_sq, to_sq)
+    child_value, _ = engine._negamax(bb, depth - 1 - reduction, -alpha - 1, -alpha, True, 1, move)
+    if reduction > 0 and -child_value > alpha:
+        child_value, _ = engine._negamax(bb, depth - 1, -alpha - 1, -alpha, True, 1, move)
+    if alpha < -child_value < beta:
+        child_value, _ = engine._negamax(bb, depth - 1, -beta, -alpha, True, 1, move)
+    return -child_value, engine.nodes_searched
+
+
 class Engine:
     '''
     象棋AI引擎类。
 
     Attributes:
-        transposition_table (Dict): 置换表，用于缓存已计算过的局面的评估值和最佳走法。
+        transposition_table (TranspositionTable): 固定大小的置换表，用于缓存已计算过的局面的评估值和最佳走法。
         nodes_searched (int): 当前搜索访问的节点总数。
         start_time (float): 搜索开始的时间戳。
         time_limit (float): 单次搜索的时间限制（秒）。
-        opening_book (Dict): 开局库，存储从JSON文件中加载的开局走法。
+        node_limit (int): 单次搜索的节点数限制，0表示不限制。
+        depth_times (list): 本次搜索中每完成一层迭代时已用的时间（秒）。
+        opening_book (Optional[OpeningBook]): 内存映射的开局库，不使用开局库时为None。
         history_table (list): 历史启发表，用于走法排序，优先考虑在其他分支中表现好的走法。
+        killer_moves (list): 杀手走法表，每一层 (ply) 记录两个最近产生beta剪枝的安静走法，每次搜索开始时清空。
+        counter_moves (list): 反击走法表，按对手上一步走法 (棋子, 目标位置) 索引，记录对它产生过beta剪枝的安静走法。
+        threads (int): 默认的并行搜索进程数 (包括主引擎自己)。
+        helper_nodes (int): 上一次并行搜索中所有辅助进程搜索的节点总数。
+        stop_event: 停止事件，设置后搜索会尽快结束 (参见 `stop()`)。辅助进程中是一个进程间的事件。
+        pondering (bool): 是否正在后台思考 (参见 `start_pondering()`)。后台思考时不检查时间限制。
+        collect_stats (bool): 是否收集搜索统计。
+        stats (Optional[SearchStats]): 当前 (或上一次) 搜索的统计，没有开启统计时为None。
     '''
 
-    def __init__(self):
-        '''初始化引擎。'''
-        self.transposition_table: Dict = {}
+    def __init__(self, hash_size_mb: int = 16, threads: int = 1, load_book: bool = True,
+                 shm_name: Optional[str] = None, collect_stats: bool = False):
+        '''
+        初始化引擎。
+
+        Args:
+            hash_size_mb (int): 置换表占用的内存大小 (MB)。
+            threads (int): 并行搜索的进程数。大于1时，置换表创建在共享内存中，
+                搜索时会启动 threads-1 个 Lazy SMP 辅助进程。
+            load_book (bool): 是否加载开局库。
+            shm_name (Optional[str]): 连接到已存在的共享置换表 (供辅助进程使用)。
+            collect_stats (bool): 是否收集搜索统计 (参见 `src.stats`)。关闭时几乎没有额外开销。
+        '''
+        self.threads = max(1, threads)
+        self.transposition_table = TranspositionTable(hash_size_mb, shared=self.threads > 1, shm_name=shm_name)
         self.nodes_searched = 0
         self.start_time = 0
         self.time_limit = 0
+        self.node_limit = 0
+        self.depth_times = []
         self.opening_book = None
         self.book_random = random.Random()
         self.history_table = [[0] * 90 for _ in range(14)]
-        self._load_opening_book()
+        self.killer_moves = [[None, None] for _ in range(MAX_PLY)]
+        self.counter_moves = [[None] * 90 for _ in range(14)]
+        self.helper_nodes = 0
+        self.stop_event = threading.Event()
+        self.pondering = False
+        self.collect_stats = collect_stats
+        self.stats = None
+        self._ponder_thread = None
+        self._ponder_hash = None
+        self._ponder_result = None
+        self._helpers = []
+        self._helper_results = None
+        self._helper_stop = None
+        self._root_pool = None
+        self._root_pool_workers = 0
+        if load_book:
+            self._load_opening_book()
+
+    # --- Lazy SMP 辅助进程 ---
+
+    def _start_helpers(self, count: int):
+        '''
+        确保至少有 `count` 个辅助进程在运行。
+
+        辅助进程在第一次并行搜索时才创建，之后一直保留，直到调用 `close()`。
+        如果置换表还不在共享内存中，会先将其替换为同样大小的共享置换表。
+        '''
+        if len(self._helpers) >= count:
+            return
+
+        if not self.transposition_table.shared:
+            size_mb = self.transposition_table.size_mb
+            self.transposition_table.close()
+            self.transposition_table = TranspositionTable(size_mb, shared=True)
+
+        import multiprocessing
+
+        if self._helper_results is None:
+            context = multiprocessing.get_context()
+            self._helper_results = context.Queue()
+            self._helper_stop = context.Event()
+
+        for helper_id in range(len(self._helpers) + 1, count + 1):
+            self._helpers.append(self._spawn_helper(helper_id))
+
+    def _spawn_helper(self, helper_id: int) -> tuple:
+        '''启动编号为 `helper_id` 的辅助进程，返回 (进程, 任务队列)。'''
+        import multiprocessing
+
+        context = multiprocessing.get_context()
+        task_queue = context.Queue()
+        process = context.Process(
+            target=_lazy_smp_helper,
+            args=(helper_id, self.transposition_table.size_mb, self.transposition_table.shm_name,
+                  task_queue, self._helper_results, self._helper_stop),
+            daemon=True,
+        )
+        process.start()
+        return process, task_queue
+
+    def _dispatch_helpers(self, bb: Bitboard, count: int, time_limit: float):
+        '''让前 `count` 个辅助进程开始搜索同一个根局面。'''
+        self._helper_stop.clear()
+        for _, task_queue in self._helpers[:count]:
+            # 队列在后台线程中序列化任务，而主引擎马上就会开始修改 bb，因此每个任务都发送一份副本
+            task_queue.put((bb.copy(), self.transposition_table.generation, time_limit))
+
+    def _stop_helpers(self, count: int):
+        '''
+        通知辅助进程停止搜索，并等待它们全部结束，以免与下一次搜索重叠。
+
+        等待时定期检查辅助进程是否还活着：意外退出的辅助进程 (例如内存不足被杀死)
+        不会再发送结果，不再等待它，而是重新启动一个同样编号的辅助进程供下一次搜索使用。
+        '''
+        self._helper_stop.set()
+        self.helper_nodes = 0
+        pending = set(range(1, count + 1))
+        while pending:
+            try:
+                helper_id, nodes, _ = self._helper_results.get(timeout=HELPER_POLL_INTERVAL)
+            except queue.Empty:
+                for helper_id in sorted(pending):
+                    process, _ = self._helpers[helper_id - 1]
+                    if not process.is_alive():
+                        pending.discard(helper_id)
+                        self._helpers[helper_id - 1] = self._spawn_helper(helper_id)
+                continue
+            if helper_id in pending:
+                pending.discard(helper_id)
+                self.helper_nodes += nodes
+
+    # --- 根节点分裂搜索的进程池 ---
+
+    def _get_root_pool(self, workers: int):
+        '''返回根节点分裂搜索使用的进程池 (ProcessPoolExecutor)，在第一次使用时 (或进程数改变时) 创建。'''
+        from concurrent.futures import ProcessPoolExecutor
+
+        if self._root_pool is None or self._root_pool_workers != workers:
+            if self._root_pool is not None:
+                self._root_pool.shutdown()
+            self._root_pool = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_root_worker, initargs=(self.transposition_table.size_mb,))
+            self._root_pool_workers = workers
+        return self._root_pool
+
+    def _search_root_split(self, bb: Bitboard, depth: int, alpha: float = -MATE_VALUE,
+                           beta: float = MATE_VALUE) -> Tuple[float, Optional[Move]]:
+        '''
+        根节点分裂搜索的一次迭代。
+
+        先在本进程中串行搜索排在第一位的根走法 (通常是上一次迭代的最佳走法，来自置换表)，
+        得到的分数作为alpha；然后把其余根走法连同这个alpha一起分发给进程池并行搜索。
+
+        合并结果时按根走法的原始顺序进行，只有分数严格更高的走法才会取代当前最佳走法，
+        这与串行搜索的规则一致：在串行搜索中不如alpha的走法，在这里同样不如alpha；
+        超过alpha的走法在这里得到的是精确值。因此在相同的子树搜索结果下，两者返回同样的
+        (score, move)。由于各工作进程拥有独立的置换表和历史表，子树的搜索顺序可能不同。
+
+        与 `_negamax` 一样，其余走法在工作进程中先用零窗口搜索，只有失败高的走法才以完整窗口重新搜索。
+
+        Args:
+            bb (Bitboard): 根局面。
+            depth (int): 本次迭代的深度。
+            alpha (float): 根节点的搜索窗口下界 (期望窗口)。
+            beta (float): 根节点的搜索窗口上界 (期望窗口)。
+
+        Returns:
+            Tuple[float, Optional[Move]]: 根局面的分数和最佳走法。
+        '''
+        tt_entry = self.transposition_table.probe(bb.hash_key)
+        root_moves = list(MovePicker(bb, tt_entry[3] if tt_entry else None, self.history_table, self.killer_moves[0]))
+        if len(root_moves) < 2:
+            return self._negamax(bb, depth, alpha, beta, allow_null=False)
+
+        self.nodes_searched += 1
+        is_in_check = moves.is_check(bb, bb.player_to_move)
+        original_alpha = alpha
+
+        # 1. 串行搜索第一个走法，确定alpha
+        from_sq, to_sq = root_moves[0]
+        captured_piece = bb.move_piece(from_sq, to_sq)
+        child_value, _ = self._negamax(bb, depth - 1, -beta, -alpha, True, 1, root_moves[0])
+        bb.unmove_piece(from_sq, to_sq, captured_piece)
+        best_value = -child_value
+        best_sq_move = root_moves[0]
+        alpha = max(alpha, best_value)
+
+        # 第一个走法已经失败高 (超出了期望窗口)，与 _negamax 一样直接剪枝，不再分发其余走法
+        if alpha >= beta:
+            self.transposition_table.store(bb.hash_key, depth, best_value, TT_LOWER, best_sq_move)
+            return best_value, (sq_to_coord(best_sq_move[0]), sq_to_coord(best_sq_move[1]))
+
+        # 2. 其余走法以相同的alpha并行搜索 (后期走法裁减的条件与 _negamax 相同)
+        # 进程池在后台线程中序列化任务参数，因此发送一份不会再被修改的副本
+        root = bb.copy()
+        generation = self.transposition_table.generation
+        futures = []
+        for move_index, move in enumerate(root_moves[1:], start=2):
+            is_quiet = bb.board[move[1]] == EMPTY
+            reduction = 1 if depth >= 3 and move_index > 4 and is_quiet and not is_in_check else 0
+            futures.append(self._root_pool.submit(_search_root_move, root, move, depth, alpha, beta, reduction, generation))
+
+        # 3. 按根走法的顺序合并结果
+        for move, future in zip(root_moves[1:], futures):
+            score, nodes = future.result()
+            self.helper_nodes += nodes
+            if score > best_value:
+                best_value = score
+                best_sq_move = move
+
+        flag = TT_EXACT
+        if best_value <= original_alpha:
+            flag = TT_UPPER
+        elif best_value >= beta:
+            flag = TT_LOWER
+        self.transposition_table.store(bb.hash_key, depth, best_value, flag, best_sq_move)
+        return best_value, (sq_to_coord(best_sq_move[0]), sq_to_coord(best_sq_move[1]))
+
+    def close(self):
+        '''结束所有辅助进程和进程池，并释放共享置换表。引擎在此之后不应再被使用。'''
+        self.finish_pondering()
+        if self._root_pool is not None:
+            self._root_pool.shutdown()
+            self._root_pool = None
+        for _, task_queue in self._helpers:
+            task_queue.put(None)
+        for process, _ in self._helpers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._helpers = []
+        self.transposition_table.close()
 
     def _clear_history_table(self):
-        '''清空历史启发表。'''
+        '''清空历史启发表和反击走法表。'''
         self.history_table = [[0] * 90 for _ in range(14)]
+        self.counter_moves = [[None] * 90 for _ in range(14)]
+
+    def _clear_killer_moves(self):
+        '''清空杀手走法表。杀手走法只在同一次搜索的同一层之间有意义，每次搜索开始时都要清空。'''
+        self.killer_moves = [[None, None] for _ in range(MAX_PLY)]
+
+    def _age_history_table(self):
+        '''
+        衰减历史启发表。
+
+        在同一盘棋的两次搜索之间，将所有历史分数减半而不是清零。
+        这样上一次搜索积累的排序信息仍然有效，而过时的信息会逐渐淡出。
+        '''
+        self.history_table = [[score >> 1 for score in row] for row in self.history_table]
+
+    def new_game(self):
+        '''
+        开始一盘新棋。
+
+        完全清空置换表、历史启发表和反击走法表。同一盘棋中的多次搜索之间，
+        这些表会被保留 (置换表和历史启发表会逐渐老化)，只有开始新的一盘棋时才需要调用此方法。
+        '''
+        self.transposition_table.clear()
+        self._clear_history_table()
+
+    def _prepare_search(self):
+        '''为新的一次搜索做准备：置换表进入新的一代，历史启发表衰减，杀手走法表清空。'''
+        self.transposition_table.new_search()
+        self._age_history_table()
+        self._clear_killer_moves()
 
     def _load_opening_book(self):
-        '''从 opening_book.json 文件加载开局库。'''
-        try:
-            with open('''opening_book.json''', 'r') as f:
-                book_str_keys = json.load(f)
-                self.opening_book = {int(k): [tuple(map(tuple, move)) for move in v] for k, v in book_str_keys.items()}
-            print('开局库加载成功。')
-        except FileNotFoundError:
-            print('未找到开局库文件, 将不使用开局库。')
+        '''
+        加载开局库。
+
+        开局库是内存映射的二进制文件 (参见 `src.book`)，同一进程中的所有引擎共享同一个读取器，
+        文件在第一次查询时才被打开，创建多个引擎也不会重复加载。
+        '''
+        self.opening_book = get_opening_book()
 
     def query_opening_book(self, bb: Bitboard) -> Optional[Move]:
         '''
@@ -89,11 +498,13 @@ class Engine:
         Returns:
             Optional[Move]: 如果当前局面在开局库中，则返回一个推荐走法；否则返回None。
         '''
-        if not self.opening_book:
+        if self.opening_book is None:
             return None
 
-        if bb.hash_key in self.opening_book:
-            return self.book_random.choice(self.opening_book[bb.hash_key])
+        book_moves = self.opening_book.probe(bb.hash_key)
+        if book_moves:
+            from_sq, to_sq = self.book_random.choice(book_moves)
+            return (sq_to_coord(from_sq), sq_to_coord(to_sq))
 
         return None
 
@@ -114,6 +525,8 @@ class Engine:
         '''
         self.nodes_searched += 1
         self._check_time()
+        if self.stats is not None:
+            self.stats.qnodes += 1
 
         score = evaluate(bb)
 
@@ -123,13 +536,7 @@ class Engine:
             alpha = score
 
         # 只生成并搜索吃子走法
-        all_legal_moves = moves.generate_moves(bb)
-        capture_moves = []
-        opponent_idx = 1 - Bitboard.get_player_bb_idx(bb.player_to_move)
-        opponent_pieces_bb = bb.color_bitboards[opponent_idx]
-        for from_sq, to_sq in all_legal_moves:
-            if (opponent_pieces_bb >> to_sq) & 1:
-                capture_moves.append((from_sq, to_sq))
+        capture_moves = moves.generate_captures(bb)
 
         for from_sq, to_sq in capture_moves:
             captured_piece = bb.move_piece(from_sq, to_sq)
@@ -145,14 +552,19 @@ class Engine:
 
     def _check_time(self):
         '''
-        检查搜索是否超时。
+        检查搜索是否超时或超出节点数限制。
         每搜索2048个节点检查一次，以减少时间检查的开销。
         '''
         if (self.nodes_searched & 2047) == 0:
-            if self.time_limit > 0 and time.time() - self.start_time >= self.time_limit:
+            if self.time_limit > 0 and not self.pondering and time.time() - self.start_time >= self.time_limit:
+                raise StopSearchException()
+            if self.node_limit > 0 and self.nodes_searched >= self.node_limit:
+                raise StopSearchException()
+            if self.stop_event is not None and self.stop_event.is_set():
                 raise StopSearchException()
 
-    def _negamax(self, bb: Bitboard, depth: int, alpha: float, beta: float, allow_null: bool = True) -> Tuple[float, Optional[Move]]:
+    def _negamax(self, bb: Bitboard, depth: int, alpha: float, beta: float, allow_null: bool = True,
+                 ply: int = 0, prev_move: Optional[Tuple[int, int]] = None) -> Tuple[float, Optional[Move]]:
         '''
         核心搜索函数，实现了带有多种优化的负极大值算法。
 
@@ -162,32 +574,46 @@ class Engine:
             alpha (float): 当前搜索窗口的下界。
             beta (float): 当前搜索窗口的上界。
             allow_null (bool): 是否允许在此节点进行空着裁剪。
+            ply (int): 当前节点距离根节点的层数，用于索引杀手走法表。
+            prev_move (Optional[Tuple[int, int]]): 到达当前局面的上一步 (对手的) 走法 (from_sq, to_sq)，
+                用于查询反击走法表。根节点和空着之后为None。
 
         Returns:
             Tuple[float, Optional[Move]]: 返回评估分数和最佳走法。
         '''
         self.nodes_searched += 1
         self._check_time()
+        stats = self.stats
 
         # --- 重复局面检测 ---
-        # 如果当前局面在历史中重复出现，认为是和棋。
-        if depth > 0 and bb.history.count(bb.hash_key) > 2:
+        # 如果当前局面在历史中重复出现，认为是和棋。重复计数由 Bitboard 增量维护，是常数时间的操作。
+        if depth > 0 and bb.repetition_count() > 2:
             return 0, None
 
         # --- 置换表查询 ---
         # 尝试从置换表中获取当前局面的缓存信息，如果缓存的深度足够，则可以直接使用。
         original_alpha = alpha
-        tt_entry = self.transposition_table.get(bb.hash_key)
-
-        if tt_entry and tt_entry['depth'] >= depth:
-            score, flag, best_move = tt_entry['score'], tt_entry['flag'], tt_entry.get('best_move')
+        tt_entry = self.transposition_table.probe(bb.hash_key)
+        tt_move = tt_entry[3] if tt_entry else None
+        if stats is not None:
+            stats.tt_probes += 1
+            if tt_entry:
+                stats.tt_hits += 1
+
+        if tt_entry and tt_entry[0] >= depth:
+            _, score, flag, _ = tt_entry
+            best_move = (sq_to_coord(tt_move[0]), sq_to_coord(tt_move[1])) if tt_move else None
             if flag == TT_EXACT:
+                if stats is not None:
+                    stats.tt_cutoffs += 1
                 return score, best_move
             elif flag == TT_LOWER:
                 alpha = max(alpha, score)
             elif flag == TT_UPPER:
                 beta = min(beta, score)
             if alpha >= beta:
+                if stats is not None:
+                    stats.tt_cutoffs += 1
                 return score, best_move
 
         # --- 到达搜索深度叶子节点 ---
@@ -214,52 +640,36 @@ class Engine:
         is_in_check = moves.is_check(bb, bb.player_to_move)
 
         if allow_null and not is_in_check and depth >= 3 and major_pieces_count > 1:
-            bb.player_to_move *= -1
-            bb.hash_key ^= zobrist_player
-            null_move_score, _ = self._negamax(bb, depth - 1 - R, -beta, -beta + 1, allow_null=False)
+            if stats is not None:
+                stats.null_tries += 1
+            bb.make_null_move()
+            null_move_score, _ = self._negamax(bb, depth - 1 - R, -beta, -beta + 1, False, ply + 1)
             null_move_score = -null_move_score
-            bb.player_to_move *= -1
-            bb.hash_key ^= zobrist_player
+            bb.unmake_null_move()
             if null_move_score >= beta:
-                self.transposition_table[bb.hash_key] = {'depth': depth, 'score': beta, 'flag': TT_LOWER, 'best_move': None}
+                if stats is not None:
+                    stats.null_cutoffs += 1
+                self.transposition_table.store(bb.hash_key, depth, beta, TT_LOWER, None)
                 return beta, None
 
         best_value = -math.inf
         best_move = None
-
-        def sq_to_coord(sq: int) -> tuple[int, int]:
-            return sq // 9, sq % 9
+        best_sq_move = None
 
         # --- 走法生成与排序 ---
-        legal_moves = moves.generate_moves(bb)
-
-        if not legal_moves:
-            if is_in_check:
-                # 被将死，返回一个与深度相关的负无穷大值，倾向于选择能更快将死对方的路径。
-                return -MATE_VALUE + depth, None
-            # 逼和
-            return DRAW_VALUE, None
-
-        # 走法排序：优先搜索吃子走法（按MVV-LVA思想估分），然后是历史表启发的好走法。
-        move_scores = []
-        for from_sq, to_sq in legal_moves:
-            score = 0
-            captured_piece = bb.get_piece_on_square(to_sq)
-            if captured_piece != EMPTY:
-                moving_piece = bb.get_piece_on_square(from_sq)
-                score = 1000 + abs(PIECE_VALUES.get(captured_piece, 0)) - abs(PIECE_VALUES.get(moving_piece, 0))
-            else:
-                moving_piece = bb.get_piece_on_square(from_sq)
-                if moving_piece != EMPTY:
-                    piece_idx = Bitboard.piece_to_zobrist_idx(moving_piece)
-                    score = self.history_table[piece_idx][to_sq]
-            move_scores.append(((from_sq, to_sq), score))
-
-        sorted_moves = sorted(move_scores, key=lambda x: x[1], reverse=True)
+        # 走法排序器按阶段惰性地产生走法：置换表走法、吃子走法 (MVV-LVA)、杀手走法和反击走法、
+        # 历史表启发的安静走法。发生剪枝时，后面的阶段根本不会被生成。
+        killers = self.killer_moves[ply]
+        counter_index = None
+        counter_move = None
+        if prev_move is not None:
+            counter_index = (Bitboard.piece_to_zobrist_idx(bb.board[prev_move[1]]), prev_move[1])
+            counter_move = self.counter_moves[counter_index[0]][counter_index[1]]
+        move_picker = MovePicker(bb, tt_move, self.history_table, killers, counter_move)
 
         # --- 遍历走法进行搜索 ---
         move_index = 0
-        for move, _ in sorted_moves:
+        for move in move_picker:
             move_index += 1
             from_sq, to_sq = move
 
@@ -272,16 +682,33 @@ class Engine:
             reduction = 0
             if depth >= 3 and move_index > 4 and is_quiet and not is_in_check:
                 reduction = 1
+                if stats is not None:
+                    stats.lmr_reductions += 1
 
             captured_piece = bb.move_piece(from_sq, to_sq)
 
-            # 使用缩减后的深度进行搜索
-            child_value, _ = self._negamax(bb, depth - 1 - reduction, -beta, -alpha, allow_null=True)
-
-            # 如果缩减深度的搜索结果意外地好（突破了alpha），
-            # 那说明这个走法可能是个“漏网之鱼”，需要用完整深度重新搜索一次。
-            if reduction > 0 and -child_value > alpha:
-                child_value, _ = self._negamax(bb, depth - 1, -beta, -alpha, allow_null=True)
+            if move_index == 1:
+                # 第一个走法 (通常是置换表走法，即预期的主要变例) 使用完整窗口搜索
+                child_value, _ = self._negamax(bb, depth - 1, -beta, -alpha, True, ply + 1, move)
+            else:
+                # --- 主要变例搜索 (Principal Variation Search - PVS) ---
+                # 其余走法只需要证明它们不比当前的最佳走法好，因此用零窗口 (alpha, alpha+1)
+                # 和缩减后的深度进行搜索，这比完整窗口的搜索便宜得多。
+                child_value, _ = self._negamax(bb, depth - 1 - reduction, -alpha - 1, -alpha, True, ply + 1, move)
+
+                # 如果缩减深度的搜索结果意外地好（突破了alpha），
+                # 那说明这个走法可能是个“漏网之鱼”，需要用完整深度重新搜索一次。
+                if reduction > 0 and -child_value > alpha:
+                    if stats is not None:
+                        stats.lmr_researches += 1
+                    child_value, _ = self._negamax(bb, depth - 1, -alpha - 1, -alpha, True, ply + 1, move)
+
+                # 零窗口搜索失败高 (fail high)，而且分数可能落在窗口之内时，
+                # 以完整窗口重新搜索，得到这个走法的精确分数。
+                if alpha < -child_value < beta:
+                    if stats is not None:
+                        stats.pvs_researches += 1
+                    child_value, _ = self._negamax(bb, depth - 1, -beta, -alpha, True, ply + 1, move)
 
             bb.unmove_piece(from_sq, to_sq, captured_piece)
 
@@ -293,20 +720,38 @@ class Engine:
             if current_score > best_value:
                 best_value = current_score
                 best_move = (sq_to_coord(from_sq), sq_to_coord(to_sq))
+                best_sq_move = move
 
             alpha = max(alpha, best_value)
 
             # --- Alpha-Beta 剪枝 ---
             if alpha >= beta:
+                if stats is not None:
+                    stats.beta_cutoffs += 1
+                    if move_index == 1:
+                        stats.first_move_cutoffs += 1
                 # 如果一个安静走法（非吃子）导致了beta剪枝，
-                # 那么它是一个“好”走法，我们增加它在历史表中的权重。
+                # 那么它是一个“好”走法，我们增加它在历史表中的权重，
+                # 并把它记为这一层的杀手走法和对手上一步走法的反击走法。
                 if is_quiet:
                     moving_piece = bb.get_piece_on_square(from_sq)
                     if moving_piece != EMPTY:
                         piece_idx = Bitboard.piece_to_zobrist_idx(moving_piece)
                         self.history_table[piece_idx][to_sq] += depth * depth
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    if counter_index is not None:
+                        self.counter_moves[counter_index[0]][counter_index[1]] = move
                 break
 
+        if move_index == 0:
+            if is_in_check:
+                # 被将死，返回一个与深度相关的负无穷大值，倾向于选择能更快将死对方的路径。
+                return -MATE_VALUE + depth, None
+            # 逼和
+            return DRAW_VALUE, None
+
         # --- 置换表存储 ---
         # 将当前节点的搜索结果存入置换表，以便后续使用。
         flag = TT_EXACT
@@ -315,44 +760,94 @@ class Engine:
         elif best_value >= beta:
             flag = TT_LOWER
 
-        self.transposition_table[bb.hash_key] = {
-            'depth': depth, 'score': best_value, 'flag': flag, 'best_move': best_move,
-        }
+        self.transposition_table.store(bb.hash_key, depth, best_value, flag, best_sq_move)
 
         return best_value, best_move
 
-    def search_by_time(self, bb: Bitboard, time_limit_seconds: float) -> Tuple[float, Optional[Move]]:
+    def _extract_pv(self, bb: Bitboard, max_length: int = 32) -> List[Move]:
         '''
-        在给定的时间内进行搜索。
+        沿着置换表中的最佳走法提取主要变例。
 
-        采用迭代加深（Iterative Deepening）的方式，从深度1开始，
-        逐步增加深度进行搜索，直到时间耗尽。
+        每一步都验证走法的合法性，遇到重复局面 (或置换表中没有走法) 时停止。
 
         Args:
-            bb (Bitboard): 初始棋盘局面。
-            time_limit_seconds (float): 搜索时间限制（秒）。
+            bb (Bitboard): 根局面 (会被临时修改，返回前还原)。
+            max_length (int): 主要变例的最大长度。
 
         Returns:
-            Tuple[float, Optional[Move]]: 返回最终评估分数和找到的最佳走法。
+            List[Move]: 坐标形式的走法列表。
         '''
-        board_copy = bb.copy()
-        book_move = self.query_opening_book(board_copy)
-        if book_move:
-            return 0, book_move
+        pv = []
+        played = []
+        seen = {bb.hash_key}
+        while len(pv) < max_length:
+            entry = self.transposition_table.probe(bb.hash_key)
+            if entry is None or entry[3] is None or not moves.is_legal_move(bb, entry[3]):
+                break
+            from_sq, to_sq = entry[3]
+            played.append((from_sq, to_sq, bb.move_piece(from_sq, to_sq)))
+            pv.append((sq_to_coord(from_sq), sq_to_coord(to_sq)))
+            if bb.hash_key in seen:
+                break
+            seen.add(bb.hash_key)
+        for from_sq, to_sq, captured in reversed(played):
+            bb.unmove_piece(from_sq, to_sq, captured)
+        return pv
+
+    def _iterative_deepening(self, bb: Bitboard, max_depth: int, time_limit: float = 0, node_limit: int = 0,
+                             start_depth: int = 1, split_root: bool = False,
+                             on_iteration: Optional[Callable[[SearchInfo], None]] = None
+                             ) -> Tuple[float, Optional[Move], int]:
+        '''
+        迭代加深搜索的公共部分。
 
-        self.transposition_table.clear()
-        self._clear_history_table()
+        从深度 `start_depth` 开始逐层加深，直到达到 `max_depth`、找到杀棋，或者超出时间/节点数限制。
+        被中断的那一层迭代的结果会被丢弃。
+
+        Args:
+            bb (Bitboard): 要搜索的棋盘局面 (会在搜索中被修改和还原)。
+            max_depth (int): 最大搜索深度。
+            time_limit (float): 时间限制（秒），0表示不限制。
+            node_limit (int): 节点数限制，0表示不限制。按2048个节点的粒度检查。
+            start_depth (int): 第一层迭代的深度。
+            split_root (bool): 是否使用根节点分裂搜索 (需要先创建进程池)。
+            on_iteration (Optional[Callable[[SearchInfo], None]]): 每完成一层迭代时调用，参数为这一层的搜索信息。
+
+        Returns:
+            Tuple[float, Optional[Move], int]: 最后一层完成的迭代的分数、最佳走法，以及完成的深度。
+        '''
         self.start_time = time.time()
-        self.time_limit = time_limit_seconds
+        self.time_limit = time_limit
+        self.node_limit = node_limit
         self.nodes_searched = 0
-        last_completed_move = None
+        self.depth_times = []
+        self.stats = SearchStats() if self.collect_stats else None
 
+        score, best_move, completed_depth = 0, None, 0
         try:
-            # 迭代加深搜索
-            for i in range(1, 64):
-                score, move = self._negamax(board_copy, i, -MATE_VALUE, MATE_VALUE, allow_null=True)
+            for depth in range(start_depth, max_depth + 1):
+                use_split = split_root and depth >= ROOT_SPLIT_MIN_DEPTH
+                if depth >= ASPIRATION_MIN_DEPTH and completed_depth > 0 and abs(score) < MATE_VALUE - 100:
+                    iteration_score, move = self._aspiration_search(bb, depth, score, use_split)
+                else:
+                    iteration_score, move = self._search_root(bb, depth, -MATE_VALUE, MATE_VALUE, use_split)
+                score = iteration_score
+                completed_depth = depth
+                self.depth_times.append(time.time() - self.start_time)
                 if move is not None:
-                    last_completed_move = move
+                    best_move = move
+                if self.stats is not None:
+                    self._update_stats()
+                    self.stats.depth_nodes.append(self.nodes_searched)
+                    self.stats.depth_times.append(self.depth_times[-1])
+                if on_iteration is not None:
+                    # 置换表中的根条目可能已被覆盖，确保主要变例以这一层的最佳走法开头
+                    pv = self._extract_pv(bb)
+                    if best_move is not None and pv[:1] != [best_move]:
+                        pv = [best_move]
+                    stats = self.stats.copy() if self.stats is not None else None
+                    on_iteration(SearchInfo(depth, score, pv, self.nodes_searched + self.helper_nodes,
+                                            self.depth_times[-1], stats))
 
                 # 如果找到杀棋，提前终止搜索
                 if abs(score) > (MATE_VALUE - 100):
@@ -360,14 +855,130 @@ class Engine:
         except StopSearchException:
             pass
 
-        end_time = time.time()
-        time_taken = end_time - self.start_time
+        if self.stats is not None:
+            # 包括被中断的那一层迭代
+            self._update_stats()
+        return score, best_move, completed_depth
+
+    def _search_root(self, bb: Bitboard, depth: int, alpha: float, beta: float,
+                     split_root: bool) -> Tuple[float, Optional[Move]]:
+        '''
+        以给定的窗口搜索根节点一次。
+
+        根节点不进行空着裁剪：在期望窗口下，空着裁剪可能在根节点直接剪枝，从而得不到最佳走法。
+        '''
+        if split_root:
+            return self._search_root_split(bb, depth, alpha, beta)
+        return self._negamax(bb, depth, alpha, beta, allow_null=False)
+
+    def _aspiration_search(self, bb: Bitboard, depth: int, previous_score: float,
+                           split_root: bool) -> Tuple[float, Optional[Move]]:
+        '''
+        期望窗口搜索 (Aspiration Windows)。
+
+        相邻两层迭代的分数通常相差不大，因此以上一层的分数为中心、用较窄的窗口搜索，可以剪掉更多的分支。
+        如果结果落在窗口之外 (失败低或失败高)，就把窗口在失败的一侧加宽一倍后重新搜索，
+        直到结果落在窗口之内 (窗口最终会扩大到 [-MATE_VALUE, MATE_VALUE])。
+
+        Args:
+            bb (Bitboard): 根局面。
+            depth (int): 本次迭代的深度。
+            previous_score (float): 上一层迭代的分数。
+            split_root (bool): 是否使用根节点分裂搜索。
+
+        Returns:
+            Tuple[float, Optional[Move]]: 窗口之内的精确分数和最佳走法。
+        '''
+        delta = ASPIRATION_WINDOW
+        alpha = max(previous_score - delta, -MATE_VALUE)
+        beta = min(previous_score + delta, MATE_VALUE)
+        while True:
+            score, move = self._search_root(bb, depth, alpha, beta, split_root)
+            if score <= alpha and alpha > -MATE_VALUE:
+                alpha = max(score - delta, -MATE_VALUE)
+            elif score >= beta and beta < MATE_VALUE:
+                beta = min(score + delta, MATE_VALUE)
+            else:
+                return score, move
+
+            if self.stats is not None:
+                self.stats.aspiration_researches += 1
+            delta *= 2
+
+    def _update_stats(self):
+        '''把节点数同步到搜索统计中。'''
+        self.stats.nodes = self.nodes_searched
+
+    def _search(self, bb: Bitboard, max_depth: int, time_limit: float = 0, node_limit: int = 0,
+                workers: int = 1, split_root: bool = False,
+                on_iteration: Optional[Callable[[SearchInfo], None]] = None) -> Tuple[float, Optional[Move], int]:
+        '''
+        执行一次完整的搜索：准备置换表和历史表，必要时启动 Lazy SMP 辅助进程，然后进行迭代加深。
+
+        并行搜索时，主引擎的迭代加深结果就是最终结果；辅助进程只通过共享置换表提供帮助，
+        并在主引擎结束后被停止。
+
+        Args:
+            workers (int): 参与搜索的进程数 (包括主引擎自己)。
+            split_root (bool): 使用根节点分裂 (而不是 Lazy SMP) 进行并行搜索。
+            on_iteration (Optional[Callable[[SearchInfo], None]]): 每完成一层迭代时调用。
+
+        Returns:
+            Tuple[float, Optional[Move], int]: 分数、最佳走法和完成的深度。
+        '''
+        self._prepare_search()
+        self.helper_nodes = 0
+        helpers = max(0, workers - 1)
+        if helpers == 0:
+            return self._iterative_deepening(bb, max_depth, time_limit, node_limit, on_iteration=on_iteration)
+
+        if split_root:
+            self._get_root_pool(workers)
+            return self._iterative_deepening(bb, max_depth, time_limit, node_limit, split_root=True,
+                                             on_iteration=on_iteration)
+
+        self._start_helpers(helpers)
+        # 后台思考时辅助进程不限时间，由主引擎结束时停止
+        self._dispatch_helpers(bb, helpers, 0 if self.pondering else time_limit)
+        try:
+            return self._iterative_deepening(bb, max_depth, time_limit, node_limit, on_iteration=on_iteration)
+        finally:
+            self._stop_helpers(helpers)
+
+    def search_by_time(self, bb: Bitboard, time_limit_seconds: float, workers: Optional[int] = None,
+                       on_iteration: Optional[Callable[[SearchInfo], None]] = None) -> Tuple[float, Optional[Move]]:
+        '''
+        在给定的时间内进行搜索。
 
-        print(f'Score: {score}, depth: {i}, time: {time_taken:.2f}, nodes: {self.nodes_searched}')
+        采用迭代加深（Iterative Deepening）的方式，从深度1开始，
+        逐步增加深度进行搜索，直到时间耗尽。
 
-        return 0, last_completed_move
+        Args:
+            bb (Bitboard): 初始棋盘局面。
+            time_limit_seconds (float): 搜索时间限制（秒）。
+            workers (Optional[int]): 并行搜索的进程数，默认使用创建引擎时指定的 threads。
+            on_iteration (Optional[Callable[[SearchInfo], None]]): 每完成一层迭代时调用，参数为这一层的搜索信息。
 
-    def search_by_depth(self, bb: Bitboard, depth: int) -> Tuple[float, Optional[Move]]:
+        Returns:
+            Tuple[float, Optional[Move]]: 返回最后完成的迭代的评估分数和最佳走法 (命中开局库时分数为0)。
+        '''
+        self.stop_event.clear()
+        board_copy = bb.copy()
+        book_move = self.query_opening_book(board_copy)
+        if book_move:
+            return 0, book_move
+
+        workers = self.threads if workers is None else workers
+        score, last_completed_move, depth = self._search(board_copy, 63, time_limit=time_limit_seconds,
+                                                         workers=workers, on_iteration=on_iteration)
+        time_taken = time.time() - self.start_time
+
+        print(f'Score: {score}, depth: {depth}, time: {time_taken:.2f}, nodes: {self.nodes_searched + self.helper_nodes}')
+
+        return score, last_completed_move
+
+    def search_by_depth(self, bb: Bitboard, depth: int, workers: Optional[int] = None, split_root: bool = False,
+                        on_iteration: Optional[Callable[[SearchInfo], None]] = None) -> Tuple[float, Optional[Move]]:
         '''
         搜索指定的深度。
 
@@ -376,24 +987,162 @@ class Engine:
         Args:
             bb (Bitboard): 初始棋盘局面。
             depth (int): 目标搜索深度。
+            workers (Optional[int]): 并行搜索的进程数，默认使用创建引擎时指定的 threads。
+            split_root (bool): 并行搜索时使用根节点分裂：每次迭代中，根走法被分发到
+                一个进程池中并行搜索，各进程使用独立的置换表。适合批量分析中较深的固定深度搜索。
+            on_iteration (Optional[Callable[[SearchInfo], None]]): 每完成一层迭代时调用。
 
         Returns:
             Tuple[float, Optional[Move]]: 返回最终评估分数和找到的最佳走法。
         '''
+        self.stop_event.clear()
         board_copy = bb.copy()
         book_move = self.query_opening_book(board_copy)
         if book_move:
             return 0, book_move
 
-        self.transposition_table.clear()
-        self._clear_history_table()
-        score, move = -math.inf, None
-        last_good_move = None
-        for i in range(1, depth + 1):
-            score, move = self._negamax(board_copy, i, -MATE_VALUE, MATE_VALUE, allow_null=True)
-            if move is not None:
-                last_good_move = move
-            if abs(score) > (MATE_VALUE - 100):  # Stop if a mate is found
-                break
+        workers = self.threads if workers is None else workers
+        score, move, _ = self._search(board_copy, depth, workers=workers, split_root=split_root,
+                                      on_iteration=on_iteration)
+        return score, move
+
+    def search_by_nodes(self, bb: Bitboard, node_limit: int, max_depth: int = 63,
+                        on_iteration: Optional[Callable[[SearchInfo], None]] = None) -> Tuple[float, Optional[Move]]:
+        '''
+        在给定的节点数内进行迭代加深搜索。
+
+        与按时间搜索不同，节点数限制与机器速度无关，相同的代码总是得到相同的结果，
+        适合用于基准测试和回归比较。
+
+        Args:
+            bb (Bitboard): 初始棋盘局面。
+            node_limit (int): 节点数限制。
+            max_depth (int): 最大搜索深度。
+            on_iteration (Optional[Callable[[SearchInfo], None]]): 每完成一层迭代时调用。
+
+        Returns:
+            Tuple[float, Optional[Move]]: 返回最后完成的迭代的评估分数和最佳走法。
+        '''
+        self.stop_event.clear()
+        board_copy = bb.copy()
+        book_move = self.query_opening_book(board_copy)
+        if book_move:
+            return 0, book_move
+
+        score, move, _ = self._search(board_copy, max_depth, node_limit=node_limit, on_iteration=on_iteration)
+        return score, move
+
+    def stop(self):
+        '''
+        请求正在进行的搜索尽快结束 (可以从其他线程调用)。
 
-        return score, last_good_move
+        搜索会在下一次检查时 (最多2048个节点之后) 停止，并返回最后一层完成的迭代的结果。
+        '''
+        self.stop_event.set()
+
+    async def analyse(self, bb: Bitboard, limits: SearchLimits = SearchLimits(), workers: Optional[int] = None,
+                      use_book: bool = True):
+        '''
+        在后台线程中开始搜索，立即返回一个可以异步迭代的分析对象。
+
+        用法:
+            analysis = await engine.analyse(board, SearchLimits(time=3.0))
+            async for info in analysis:   # 每完成一层迭代得到一个 SearchInfo
+                ...
+            score, move = await analysis.wait()
+
+        在搜索过程中，可以随时调用 `analysis.stop()` (或 `engine.stop()`) 让搜索提前结束。
+        同一个引擎同时只能进行一次搜索。
+
+        Args:
+            bb (Bitboard): 要分析的局面 (搜索使用它的副本，调用者可以继续修改它)。
+            limits (SearchLimits): 搜索的限制条件。
+            workers (Optional[int]): 并行搜索的进程数，默认使用创建引擎时指定的 threads。
+            use_book (bool): 是否先查询开局库。命中时不进行搜索，直接以开局库走法作为结果。
+
+        Returns:
+            Analysis: 分析对象，参见 `src.analysis.Analysis`。
+        '''
+        from src.analysis import Analysis
+
+        self.stop_event.clear()
+        board_copy = bb.copy()
+        book_move = self.query_opening_book(board_copy) if use_book else None
+        workers = self.threads if workers is None else workers
+        return Analysis(self, board_copy, limits, workers, book_move)
+
+    # --- 后台思考 (Pondering) ---
+
+    def start_pondering(self, bb: Bitboard, time_limit_seconds: float, workers: Optional[int] = None) -> Optional[Move]:
+        '''
+        在对手思考期间，在后台线程中提前搜索。
+
+        引擎走棋之后调用 (`bb` 是轮到对手走棋的局面)。从置换表中取出主要变例里预测的对手应着，
+        搜索走了这步棋之后的局面；搜索不受时间限制，直到 `finish_pondering()` 被调用。
+        如果置换表中没有预测的应着，则直接搜索对手走棋的局面，这样对手的所有应着都会在共享的置换表中留下结果。
+
+        Args:
+            bb (Bitboard): 轮到对手走棋的局面。
+            time_limit_seconds (float): 预测命中之后本步的时间限制（秒），后台思考已经用掉的时间计算在内。
+            workers (Optional[int]): 并行搜索的进程数，默认使用创建引擎时指定的 threads。
+
+        Returns:
+            Optional[Move]: 预测的对手应着。为None时搜索的是对手走棋的局面 (或者预测的局面在开局库中，不进行后台思考)。
+        '''
+        self.finish_pondering()
+
+        board_copy = bb.copy()
+        pv = self._extract_pv(board_copy, max_length=1)
+        ponder_move = pv[0] if pv else None
+        if ponder_move is not None:
+            (from_r, from_c), (to_r, to_c) = ponder_move
+            board_copy.move_piece(from_r * 9 + from_c, to_r * 9 + to_c)
+            if self.opening_book is not None and self.opening_book.probe(board_copy.hash_key):
+                # 命中时直接使用开局库走法，不需要提前搜索
+                return None
+
+        self._ponder_hash = board_copy.hash_key if ponder_move is not None else None
+        self._ponder_result = None
+        self.pondering = True
+        self.stop_event.clear()
+        workers = self.threads if workers is None else workers
+        self._ponder_thread = threading.Thread(target=self._ponder, args=(board_copy, time_limit_seconds, workers),
+                                               daemon=True)
+        self._ponder_thread.start()
+        return ponder_move
+
+    def _ponder(self, bb: Bitboard, time_limit: float, workers: int):
+        '''后台思考线程的主函数。'''
+        # 结果只通过 `finish_pondering()` 返回，不输出任何内容 (UCCI 前端的标准输出是协议通道)
+        score, move, _ = self._search(bb, 63, time_limit=time_limit, workers=workers)
+        self._ponder_result = (score, move)
+
+    def finish_pondering(self, bb: Optional[Bitboard] = None) -> Optional[Tuple[float, Optional[Move]]]:
+        '''
+        结束后台思考。在对手走棋之后调用，没有在后台思考时直接返回None。
+
+        - 预测命中 (`bb` 就是后台思考的局面)：搜索从此开始受时间限制，后台思考已经用掉的时间计算在内。
+          等待搜索结束并返回它的结果；如果已经超时，搜索会在下一次检查时立即结束。
+        - 预测落空 (或 `bb` 为None)：立即停止搜索并返回None。置换表中的结果仍然保留，
+          接下来对实际局面的搜索可以利用它们。
+
+        Args:
+            bb (Optional[Bitboard]): 对手走棋之后的局面。
+
+        Returns:
+            Optional[Tuple[float, Optional[Move]]]: 预测命中时返回分数和最佳走法，否则返回None。
+        '''
+        thread = self._ponder_thread
+        if thread is None:
+            return None
+
+        hit = bb is not None and self._ponder_hash is not None and bb.hash_key == self._ponder_hash
+        if not hit:
+            self.stop_event.set()
+        self.pondering = False
+        thread.join()
+        self._ponder_thread = None
+
+        if not hit or self._ponder_result is None or self._ponder_result[1] is None:
+            return None
+        return self._ponder_result
@@ -3,122 +3,12 @@
 '''
 中国象棋评估函数 - 位棋盘版本
 '''
-import copy
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 
 from src.bitboard import Bitboard, PIECE_TO_BB_INDEX, BB_INDEX_TO_PIECE
 from src.constants import *
-from src.moves import get_rook_moves_bb, get_cannon_moves_bb, HORSE_ATTACKS, HORSE_LEGS, SQUARE_MASKS
-
-# --- Midgame Piece-Square Tables (PST_MG) ---
-# fmt: off
-KING_PST_MG = [
-    [  0,   0,   0,   8,   8,   8,   0,   0,   0],
-    [  0,   0,   0,   8,   8,   8,   0,   0,   0],
-    [  0,   0,   0,   6,   6,   6,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   6,   6,   6,   0,   0,   0],
-    [  0,   0,   0,   8,   8,   8,   0,   0,   0],
-    [  0,   0,   0,   8,   8,   8,   0,   0,   0],
-]
-GUARD_PST_MG = [
-    [  0,   0,   0,  20,   0,  20,   0,   0,   0],
-    [  0,   0,   0,   0,  23,   0,   0,   0,   0],
-    [  0,   0,   0,  20,   0,  20,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,  20,   0,  20,   0,   0,   0],
-    [  0,   0,   0,   0,  23,   0,   0,   0,   0],
-    [  0,   0,   0,  20,   0,  20,   0,   0,   0],
-]
-BISHOP_PST_MG = [
-    [  0,   0,  20,   0,   0,   0,  20,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,  23,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,  20,   0,   0,   0,  20,   0,   0],
-    [  0,   0,  20,   0,   0,   0,  20,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,  23,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,  20,   0,   0,   0,  20,   0,   0],
-]
-HORSE_PST_MG = [
-    [ 90,  90,  90,  96,  90,  96,  90,  90,  90],
-    [ 90,  96, 103,  97,  94,  97, 103,  96,  90],
-    [ 92,  98,  99, 103,  99, 103,  99,  98,  92],
-    [ 93, 108, 100, 107, 100, 107, 100, 108,  93],
-    [ 90, 100,  99, 103, 104, 103,  99, 100,  90],
-    [ 90,  98, 101, 102, 103, 102, 101,  98,  90],
-    [ 92,  94,  98,  95,  98,  95,  98,  94,  92],
-    [ 93,  92,  94,  95,  92,  95,  94,  92,  93],
-    [ 85,  90,  92,  93,  78,  93,  92,  90,  85],
-    [ 88,  85,  90,  88,  90,  88,  90,  85,  88],
-]
-ROOK_PST_MG = [
-    [206, 208, 207, 213, 214, 213, 207, 208, 206],
-    [206, 212, 209, 216, 233, 216, 209, 212, 206],
-    [206, 208, 207, 214, 216, 214, 207, 208, 206],
-    [206, 213, 213, 216, 216, 216, 213, 213, 206],
-    [208, 211, 211, 214, 215, 214, 211, 211, 208],
-    [208, 212, 212, 214, 215, 214, 212, 212, 208],
-    [204, 209, 204, 212, 214, 212, 204, 209, 204],
-    [198, 208, 204, 212, 212, 212, 204, 208, 198],
-    [200, 208, 206, 212, 200, 212, 206, 208, 200],
-    [194, 206, 204, 212, 200, 212, 204, 206, 194],
-]
-CANNON_PST_MG = [
-    [100, 100,  96,  91,  90,  91,  96, 100, 100],
-    [ 98,  98,  96,  92,  89,  92,  96,  98,  98],
-    [ 97,  97,  96,  91,  92,  91,  96,  97,  97],
-    [ 96,  99,  99,  98, 100,  98,  99,  99,  96],
-    [ 96,  96,  96,  96, 100,  96,  96,  96,  96],
-    [ 95,  96,  99,  96, 100,  96,  99,  96,  95],
-    [ 96,  96,  96,  96,  96,  96,  96,  96,  96],
-    [ 97,  96, 100,  99, 101,  99, 100,  96,  97],
-    [ 96,  97,  98,  98,  98,  98,  98,  97,  96],
-    [ 96,  96,  97,  99,  99,  99,  97,  96,  96],
-]
-PAWN_PST_MG = [
-    [  9,   9,   9,  11,  13,  11,   9,   9,   9],
-    [ 19,  24,  34,  42,  44,  42,  34,  24,  19],
-    [ 19,  24,  32,  37,  37,  37,  32,  24,  19],
-    [ 19,  23,  27,  29,  30,  29,  27,  23,  19],
-    [ 14,  18,  20,  27,  29,  27,  20,  18,  14],
-    [  7,   0,  13,   0,  16,   0,  13,   0,   7],
-    [  7,   0,   7,   0,  15,   0,   7,   0,   7],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-]
-PAWN_PST_EG = [
-    [ 20,  20,  20,  25,  30,  25,  20,  20,  20],
-    [ 40,  50,  60,  70,  75,  70,  60,  50,  40],
-    [ 40,  50,  60,  65,  70,  65,  60,  50,  40],
-    [ 40,  50,  55,  60,  60,  60,  55,  50,  40],
-    [ 30,  40,  45,  50,  50,  50,  45,  40,  30],
-    [ 15,  20,  25,  30,  30,  30,  25,  20,  15],
-    [ 10,  15,  20,  20,  20,  20,  20,  15,  10],
-    [  5,   5,   5,   5,   5,   5,   5,   5,   5],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
-]
-# fmt: on
-
-PST_MG = {
-    B_KING: KING_PST_MG, B_GUARD: GUARD_PST_MG, B_BISHOP: BISHOP_PST_MG, B_HORSE: HORSE_PST_MG,
-    B_ROOK: ROOK_PST_MG, B_CANNON: CANNON_PST_MG, B_PAWN: PAWN_PST_MG,
-    R_KING: KING_PST_MG, R_GUARD: GUARD_PST_MG, R_BISHOP: BISHOP_PST_MG, R_HORSE: HORSE_PST_MG,
-    R_ROOK: ROOK_PST_MG, R_CANNON: CANNON_PST_MG, R_PAWN: PAWN_PST_MG,
-}
-PST_EG = copy.deepcopy(PST_MG)
-PST_EG[R_PAWN] = PAWN_PST_EG
-PST_EG[B_PAWN] = PAWN_PST_EG
+from src.moves import get_rook_attacks, get_cannon_attacks, get_horse_attacks
+from src.pst import PST_MG, PST_EG, PHASE_VALUES, PST_MG_SQ, PST_EG_SQ
 
 OPENING_PHASE_MATERIAL = (90 + 40 + 45) * 2
 MOBILITY_BONUS = {R_ROOK: 1, R_HORSE: 3, R_CANNON: 1, }
@@ -127,6 +17,11 @@ KING_SAFETY_PENALTY = 15
 PATTERN_BONUS = {'BOTTOM_CANNON': 80, 'PALACE_HEART_HORSE': 70, 'CONNECTED_HORSES': 30, 'ROOK_ON_RIB_FILE': 20, }
 DYNAMIC_BONUS = {'ATTACK_PER_MISSING_DEFENDER': 15, }
 
+# 按占位数组评估时每次处理的局面数，用于限制中间数组占用的内存
+BATCH_CHUNK_SIZE = 4096
+# 按占位数组评估的权重矩阵 (14*90, 4)，在第一次调用 evaluate_occupancy 时创建
+_batch_weights = None
+
 
 def popcount(bb: int) -> int:
     return bb.bit_count()
@@ -146,7 +41,7 @@ def calculate_mobility_score(bb: Bitboard) -> int:
         temp_rooks = rooks_bb
         while temp_rooks:
             sq = (temp_rooks & -temp_rooks).bit_length() - 1
-            moves_bb = get_rook_moves_bb(sq, occupied) & ~own_pieces_bb
+            moves_bb = get_rook_attacks(bb, sq) & ~own_pieces_bb
             mobility_score += popcount(moves_bb) * MOBILITY_BONUS[R_ROOK] * player
             temp_rooks &= temp_rooks - 1
 
@@ -156,14 +51,8 @@ def calculate_mobility_score(bb: Bitboard) -> int:
         temp_horses = horses_bb
         while temp_horses:
             sq = (temp_horses & -temp_horses).bit_length() - 1
-            potential_moves = HORSE_ATTACKS[sq] & ~own_pieces_bb
-            temp_moves = potential_moves
-            while temp_moves:
-                to_sq = (temp_moves & -temp_moves).bit_length() - 1
-                leg_sq = HORSE_LEGS[sq][to_sq]
-                if not (occupied & SQUARE_MASKS[leg_sq]):
-                    mobility_score += MOBILITY_BONUS[R_HORSE] * player
-                temp_moves &= temp_moves - 1
+            moves_bb = get_horse_attacks(occupied, sq) & ~own_pieces_bb
+            mobility_score += popcount(moves_bb) * MOBILITY_BONUS[R_HORSE] * player
             temp_horses &= temp_horses - 1
 
         # Cannon mobility
@@ -172,7 +61,7 @@ def calculate_mobility_score(bb: Bitboard) -> int:
         temp_cannons = cannons_bb
         while temp_cannons:
             sq = (temp_cannons & -temp_cannons).bit_length() - 1
-            moves_bb = get_cannon_moves_bb(sq, occupied) & ~own_pieces_bb
+            moves_bb = get_cannon_attacks(bb, sq) & ~own_pieces_bb
             mobility_score += popcount(moves_bb) * MOBILITY_BONUS[R_CANNON] * player
             temp_cannons &= temp_cannons - 1
 
@@ -180,54 +69,140 @@ def calculate_mobility_score(bb: Bitboard) -> int:
 
 
 def evaluate(bb: Bitboard) -> int:
-    material_score = 0
-    pst_score = 0
-
-    # 1. Calculate material score efficiently using popcount
-    for piece_type, value in PIECE_VALUES.items():
-        if piece_type == EMPTY:
-            continue
-        count = popcount(bb.piece_bitboards[PIECE_TO_BB_INDEX[piece_type]])
-        material_score += count * value
-
-    # 2. Determine game phase for tapered evaluation
-    current_phase_material = 0
-    major_pieces = {R_ROOK, R_HORSE, R_CANNON, R_GUARD, R_BISHOP}
-    for piece_type in major_pieces:
-        # Consider both sides for phase calculation
-        current_phase_material += popcount(bb.piece_bitboards[PIECE_TO_BB_INDEX[piece_type]]) * abs(PIECE_VALUES[piece_type])
-        current_phase_material += popcount(bb.piece_bitboards[PIECE_TO_BB_INDEX[-piece_type]]) * abs(PIECE_VALUES[piece_type])
-    phase_weight = min(1.0, current_phase_material / OPENING_PHASE_MATERIAL)
-
-    # 3. Calculate PST score
-    for piece_bb_idx, piece_bb in enumerate(bb.piece_bitboards):
-        temp_bb = piece_bb
-        piece_type = BB_INDEX_TO_PIECE[piece_bb_idx]
-        player = Bitboard.get_player(piece_type)
-
-        while temp_bb:
-            sq = (temp_bb & -temp_bb).bit_length() - 1
-            r, c = sq // 9, sq % 9
-
-            # Always lookup from Red's perspective
-            pst_r, pst_c = (9 - r, 8 - c) if player == PLAYER_R else (r, c)
-
-            mg_pst = PST_MG[piece_type][pst_r][pst_c]
-            eg_pst = PST_EG[piece_type][pst_r][pst_c]
-
-            pst = mg_pst * phase_weight + eg_pst * (1 - phase_weight)
-
-            if player == PLAYER_R:
-                pst_score += pst
-            else:
-                pst_score -= pst
-
-            temp_bb &= temp_bb - 1
+    '''
+    评估当前局面。
+
+    子力价值、阶段子力以及中局/残局位置分由 `Bitboard` 在走子时增量维护，
+    这里只需要根据对局阶段把它们混合起来，是一个常数时间的操作。
+
+    Returns:
+        int: 从当前走棋方视角出发的评估分数。
+    '''
+    # 1. Determine game phase for tapered evaluation
+    phase_weight = min(1.0, bb.phase_material / OPENING_PHASE_MATERIAL)
+
+    # 2. Blend midgame and endgame PST scores
+    pst_score = bb.pst_mg * phase_weight + bb.pst_eg * (1 - phase_weight)
 
     # --- Final Score ---
     # mobility_score = calculate_mobility_score(bb)
     # The score is from Red's perspective. We adjust it for the current player.
-    final_score = material_score + pst_score  # + mobility_score
+    final_score = bb.material + pst_score  # + mobility_score
 
     # Return score from the perspective of the current player to move
     return int(final_score * bb.player_to_move)
+
+
+def _get_batch_weights():
+    '''
+    创建按占位数组评估时使用的权重矩阵。
+
+    矩阵的每一行对应一个 (位棋盘索引, 位置)，四列分别是该位置上的棋子对
+    子力价值、阶段子力、中局位置分和残局位置分的贡献，与 `Bitboard` 增量维护的四个值一一对应。
+    '''
+    global _batch_weights
+    if _batch_weights is None:
+        import numpy as np
+
+        weights = np.zeros((14, 90, 4), dtype=np.float64)
+        for index in range(14):
+            piece = BB_INDEX_TO_PIECE[index]
+            weights[index, :, 0] = PIECE_VALUES[piece]
+            weights[index, :, 1] = PHASE_VALUES[piece]
+            weights[index, :, 2] = PST_MG_SQ[piece]
+            weights[index, :, 3] = PST_EG_SQ[piece]
+        _batch_weights = weights.reshape(14 * 90, 4)
+    return _batch_weights
+
+
+def _blend_scores(material, phase_material, pst_mg, pst_eg, player):
+    '''
+    对一批局面进行渐进式混合，与 `evaluate` 使用相同顺序的浮点运算，并同样向零取整。
+
+    所有参数都是形状为 (N,) 的数组。
+    '''
+    import numpy as np
+
+    phase_weight = np.minimum(1.0, phase_material / OPENING_PHASE_MATERIAL)
+    pst_score = pst_mg * phase_weight + pst_eg * (1 - phase_weight)
+    final_score = material + pst_score
+    return np.trunc(final_score * player).astype(np.int64)
+
+
+def positions_to_occupancy(positions: Sequence[Bitboard]):
+    '''
+    将一批局面转换为稠密的棋子占位数组。
+
+    每个90位的位棋盘以12字节小端序展开成比特，截取前90位。
+
+    Args:
+        positions (Sequence[Bitboard]): 要转换的局面。
+
+    Returns:
+        numpy.ndarray: 形状为 (N, 14, 90) 的uint8数组，[i, k, sq] 为1表示第i个局面中
+            位棋盘索引为k的棋子位于sq。
+    '''
+    import numpy as np
+
+    positions = list(positions)
+    raw = b''.join(piece_bb.to_bytes(12, 'little') for bb in positions for piece_bb in bb.piece_bitboards)
+    packed = np.frombuffer(raw, dtype=np.uint8).reshape(len(positions), 14, 12)
+    return np.unpackbits(packed, axis=2, bitorder='little')[:, :, :90]
+
+
+def evaluate_occupancy(occupancy, player_to_move):
+    '''
+    根据棋子占位数组评估一批局面，结果与对每个局面调用 `evaluate` 相同。
+
+    适用于已经以数组形式保存的数据集，无需为每个局面创建 `Bitboard` 对象。
+    子力价值、阶段子力、中局/残局位置分通过矩阵乘法得到 (所有权重都是整数，float64求和是精确的)。
+    为了限制内存占用，按 `BATCH_CHUNK_SIZE` 分块处理。
+
+    Args:
+        occupancy (numpy.ndarray): 形状为 (N, 14, 90) 的占位数组，参见 `positions_to_occupancy`。
+        player_to_move (numpy.ndarray): 形状为 (N,) 的走棋方数组 (PLAYER_R 或 PLAYER_B)。
+
+    Returns:
+        numpy.ndarray: 形状为 (N,) 的int64数组，从走棋方视角出发的评估分数。
+    '''
+    import numpy as np
+
+    weights = _get_batch_weights()
+    n = len(occupancy)
+    flat = occupancy.reshape(n, 14 * 90)
+    player = np.asarray(player_to_move, dtype=np.float64)
+    scores = np.empty(n, dtype=np.int64)
+    for start in range(0, n, BATCH_CHUNK_SIZE):
+        end = start + BATCH_CHUNK_SIZE
+        features = flat[start:end].astype(np.float64) @ weights
+        scores[start:end] = _blend_scores(*features.T, player[start:end])
+    return scores
+
+
+def evaluate_batch(positions: Sequence[Bitboard]):
+    '''
+    向量化地评估一批局面，结果与对每个局面调用 `evaluate` 完全相同。
+
+    `Bitboard` 已经增量维护了子力价值、阶段子力和中局/残局位置分，
+    因此这里只需把这四个值收集成数组，再一次性完成渐进式混合，
+    避免了逐个调用 `evaluate` 的函数调用开销。
+    如果局面已经以占位数组的形式保存，请使用 `evaluate_occupancy`。
+
+    需要安装 numpy。
+
+    Args:
+        positions (Sequence[Bitboard]): 要评估的局面。
+
+    Returns:
+        numpy.ndarray: 形状为 (N,) 的int64数组，每个值是对应局面从走棋方视角出发的评估分数。
+    '''
+    import numpy as np
+
+    positions = positions if isinstance(positions, (list, tuple)) else list(positions)
+    n = len(positions)
+    material = np.fromiter((bb.material for bb in positions), dtype=np.float64, count=n)
+    phase_material = np.fromiter((bb.phase_material for bb in positions), dtype=np.float64, count=n)
+    pst_mg = np.fromiter((bb.pst_mg for bb in positions), dtype=np.float64, count=n)
+    pst_eg = np.fromiter((bb.pst_eg for bb in positions), dtype=np.float64, count=n)
+    player = np.fromiter((bb.player_to_move for bb in positions), dtype=np.float64, count=n)
+    return _blend_scores(material, phase_material, pst_mg, pst_eg, player)
@@ -6,13 +6,15 @@
 驱动游戏主循环。它负责：
 - 绘制棋盘和棋子。
 - 接收并处理用户的鼠标点击和键盘事件（如悔棋、重开）。
-- 调用引擎进行思考并执行引擎的走法。
+- 调用引擎进行思考并执行引擎的走法。引擎在后台线程中思考，界面在此期间保持响应。
+- 在玩家思考时让引擎在后台思考 (Pondering)，预测命中时引擎可以更快、更深地应着。
 - 判断游戏是否结束（将死或和棋）。
 '''
 
 import pygame
 import sys
 import os
+import threading
 from src.bitboard import Bitboard as Board
 from src.engine import Engine
 from src.moves import generate_moves, is_check
@@ -25,6 +27,11 @@ SCREEN_HEIGHT = 600
 BOARD_COLOR = (240, 217, 181)  # 棋盘米色
 LINE_COLOR = (0, 0, 0)
 PIECE_RADIUS = 25
+FPS = 30  # 界面刷新率，限制重绘的频率，把CPU留给后台思考的引擎
+
+# --- 引擎设置 ---
+ENGINE_TIME = 3.0  # 引擎每步的思考时间（秒）
+PONDER = True  # 是否在玩家思考时让引擎在后台思考
 
 # --- Pygame 初始化 ---
 pygame.init()
@@ -42,6 +49,9 @@ last_move = None  # 上一步走法，用于高亮显示
 move_history = []  # 记录走法历史，用于悔棋
 game_over = False  # 游戏是否结束的标志
 game_result_message = ''  # 游戏结束时显示的信息
+engine_thread = None  # 正在为引擎计算走法的后台线程
+engine_result = None  # 后台线程计算出的 (分数, 走法)
+quitting = False  # 正在退出，后台线程不应再开始新的搜索
 
 
 def draw_board():
@@ -104,6 +114,63 @@ def draw_last_move():
         pygame.gfxdraw.filled_circle(screen, to_c * 60 + 30, to_r * 60 + 30, 5, (0, 128, 0, 200))
 
 
+def draw_message(message):
+    '''在棋盘中央显示一条提示信息。'''
+    overlay = pygame.Surface((SCREEN_WIDTH, 100), pygame.SRCALPHA)
+    overlay.fill((255, 255, 255, 220))
+    screen.blit(overlay, (0, SCREEN_HEIGHT / 2 - 100 / 2))
+    text = font.render(message, True, (0, 0, 0))
+    text_rect = text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
+    screen.blit(text, text_rect)
+
+
+def think(position):
+    '''
+    引擎思考线程的主函数。
+
+    如果引擎在后台思考时预测对了玩家的走法，直接沿用后台思考的搜索 (已经用掉的时间计算在内)；
+    否则后台思考被取消，重新搜索当前局面 (置换表中后台思考的结果仍然可以利用)。
+    '''
+    global engine_result
+    result = engine.finish_pondering(position)
+    if result is None and not quitting:
+        result = engine.search_by_time(position, ENGINE_TIME)
+    engine_result = result
+
+
+def start_engine_move():
+    '''在后台线程中开始计算引擎的走法。'''
+    global engine_thread, engine_result
+    engine_result = None
+    engine_thread = threading.Thread(target=think, args=(board.copy(),), daemon=True)
+    engine_thread.start()
+
+
+def apply_engine_move():
+    '''执行后台线程计算出的引擎走法，然后开始在玩家思考时后台思考。'''
+    global engine_thread, last_move, game_over, game_result_message
+    engine_thread = None
+    _, engine_move = engine_result
+    if not engine_move:
+        return
+
+    print('Board FEN:', board.to_fen())
+    from_r, from_c = engine_move[0]
+    to_r, to_c = engine_move[1]
+    from_sq, to_sq = from_r * 9 + from_c, to_r * 9 + to_c
+    captured_piece = board.move_piece(from_sq, to_sq)
+    move_history.append((engine_move, captured_piece))
+    last_move = engine_move
+
+    # 检查游戏是否结束
+    result_message = is_game_over(board)
+    if result_message:
+        game_over = True
+        game_result_message = result_message
+    elif PONDER:
+        engine.start_pondering(board, ENGINE_TIME)
+
+
 def is_game_over(board):
     '''
     检查游戏是否结束。
@@ -126,19 +193,28 @@ def is_game_over(board):
 
 def main():
     '''游戏主循环。'''
-    global selected_piece_pos, board, last_move, move_history, game_over, game_result_message
+    global selected_piece_pos, board, last_move, move_history, game_over, game_result_message, quitting
+    clock = pygame.time.Clock()
     running = True
     while running:
+        # --- 引擎在后台线程中算出走法之后执行它 ---
+        if engine_thread is not None and not engine_thread.is_alive():
+            apply_engine_move()
+
         # --- 事件处理循环 ---
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-            # --- 键盘事件处理 ---
-            if event.type == pygame.KEYDOWN:
+            # --- 键盘事件处理 (引擎思考时忽略) ---
+            if event.type == pygame.KEYDOWN and engine_thread is None:
+                if event.key in (pygame.K_t, pygame.K_r, pygame.K_u):
+                    # 改变局面之前先结束后台思考
+                    engine.finish_pondering()
                 if event.key == pygame.K_t:  # T键: 加载测试FEN局面
                     board = Board('4kabn1/3Pa4/2c1b4/2c5p/p3CN3/9/9/9/3K5/9 w - - 0 1')
                     # board = Board('rnbakCb1r/9/7c1/p1p1p1p1p/9/9/P1P1P1P1P/1C7/9/RcBAKABNR b - - 0 1')
+                    engine.new_game()
                     selected_piece_pos = None
                     last_move = None
                     move_history = []
@@ -146,6 +222,7 @@ def main():
                     game_result_message = ''
                 if event.key == pygame.K_r:  # R键: 重新开始
                     board = Board()
+                    engine.new_game()
                     selected_piece_pos = None
                     last_move = None
                     move_history = []
@@ -167,7 +244,7 @@ def main():
                         selected_piece_pos = None
 
             # --- 鼠标点击事件处理 ---
-            if event.type == pygame.MOUSEBUTTONDOWN and not game_over:
+            if event.type == pygame.MOUSEBUTTONDOWN and not game_over and engine_thread is None:
                 c = (event.pos[0] - 30 + 30) // 60
                 r = (event.pos[1] - 30 + 30) // 60
 
@@ -199,37 +276,13 @@ def main():
                         # 检查游戏是否结束
                         result_message = is_game_over(board)
                         if result_message:
+                            # 对局结束，停止后台思考 (后台思考不受时间限制，否则会一直搜索下去)
+                            engine.finish_pondering()
                             game_over = True
                             game_result_message = result_message
                         else:
-                            # --- 轮到引擎走棋 ---
-                            pygame.time.wait(300)  # 短暂延迟，改善体验
-
-                            # 显示“引擎思考中”的提示
-                            overlay = pygame.Surface((SCREEN_WIDTH, 100), pygame.SRCALPHA)
-                            overlay.fill((255, 255, 255, 220))
-                            screen.blit(overlay, (0, SCREEN_HEIGHT / 2 - 100 / 2))
-                            think_text = font.render('Engine is thinking...', True, (0, 0, 0))
-                            text_rect = think_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
-                            screen.blit(think_text, text_rect)
-                            pygame.display.flip()
-
-                            # 调用引擎进行搜索
-                            _, engine_move = engine.search_by_time(board, 3.0)
-                            if engine_move:
-                                print('Board FEN:', board.to_fen())
-                                from_r, from_c = engine_move[0]
-                                to_r, to_c = engine_move[1]
-                                from_sq, to_sq = from_r * 9 + from_c, to_r * 9 + to_c
-                                captured_piece = board.move_piece(from_sq, to_sq)
-                                move_history.append((engine_move, captured_piece))
-                                last_move = engine_move
-
-                                # 检查游戏是否结束
-                                result_message = is_game_over(board)
-                                if result_message:
-                                    game_over = True
-                                    game_result_message = result_message
+                            # --- 轮到引擎走棋 (在后台线程中思考) ---
+                            start_engine_move()
                     else:
                         # 走法不合法，取消选择
                         selected_piece_pos = None
@@ -245,17 +298,22 @@ def main():
         draw_pieces()
         draw_last_move()
 
-        # 如果游戏结束，显示结果
+        # 如果游戏结束，显示结果；引擎思考时显示提示
         if game_over:
-            overlay = pygame.Surface((SCREEN_WIDTH, 100), pygame.SRCALPHA)
-            overlay.fill((255, 255, 255, 220))
-            screen.blit(overlay, (0, SCREEN_HEIGHT / 2 - 100 / 2))
-            result_text = font.render(game_result_message, True, (0, 0, 0))
-            text_rect = result_text.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2))
-            screen.blit(result_text, text_rect)
+            draw_message(game_result_message)
+        elif engine_thread is not None:
+            draw_message('Engine is thinking...')
 
         pygame.display.flip()
-
+        clock.tick(FPS)
+
+    # 停止引擎的思考，等待后台线程结束之后再释放引擎。
+    # 搜索开始时会清除停止事件，如果停止请求恰好落在两次搜索之间就会丢失，因此在线程结束之前反复请求停止。
+    quitting = True
+    while engine_thread is not None and engine_thread.is_alive():
+        engine.stop()
+        engine_thread.join(timeout=0.1)
+    engine.close()
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+'''
+分阶段的走法排序器 (Move Picker)。
+
+在Alpha-Beta搜索中，很多节点在搜索第一个或前几个走法后就会发生beta剪枝。
+如果每个节点都先生成全部走法、再对整个列表排序，大部分工作都被浪费了。
+
+`MovePicker` 按阶段惰性地产生走法，只有当搜索真正进行到某个阶段时，
+才会生成并排序该阶段的走法：
+1. 置换表走法 (TT move)：只验证其合法性，不需要生成任何其他走法。
+2. 吃子走法：按 MVV-LVA (最有价值的受害者 - 最低价值的攻击者) 排序。
+3. 杀手走法和反击走法：在同一层 (ply) 的其他节点上产生过beta剪枝的两个安静走法，
+   以及对手上一步走法的“反击走法” (以前对同一走法产生过剪枝的应着)。
+   它们只需要验证合法性，不需要生成其他安静走法。
+4. 安静走法：按历史启发表的分数排序。
+
+每个阶段内部只做“部分排序”：先用选择法逐个取出分数最高的前几个走法，
+如果搜索还在继续，再对剩下的走法一次性排序。
+'''
+
+from typing import Iterator, List, Optional, Sequence
+
+from src.bitboard import Bitboard
+from src.constants import *
+import src.moves as moves
+from src.moves import Move
+
+# --- 走法排序的阶段 ---
+STAGE_TT_MOVE = 0
+STAGE_CAPTURES = 1
+STAGE_KILLERS = 2
+STAGE_QUIETS = 3
+STAGE_DONE = 4
+
+# 每个阶段用选择法逐个取出的走法数量，超过后对剩余走法整体排序
+SELECTION_PICKS = 3
+
+
+def _ordered(move_list: List[Move], scores: List[int]) -> Iterator[Move]:
+    '''
+    按分数从高到低依次产生走法 (分数相同时保持生成顺序)。
+
+    前 `SELECTION_PICKS` 个走法用选择法取出，这样在很快就发生剪枝的节点上
+    不必排序整个列表；之后再对剩余走法做一次稳定排序。
+    '''
+    count = len(move_list)
+    picks = min(SELECTION_PICKS, count)
+    for i in range(picks):
+        best = i
+        best_score = scores[i]
+        for j in range(i + 1, count):
+            if scores[j] > best_score:
+                best, best_score = j, scores[j]
+        if best != i:
+            # 将最佳走法移到位置i，并保持其余走法的相对顺序
+            move_list.insert(i, move_list.pop(best))
+            scores.insert(i, scores.pop(best))
+        yield move_list[i]
+
+    if picks < count:
+        rest = sorted(range(picks, count), key=scores.__getitem__, reverse=True)
+        for i in rest:
+            yield move_list[i]
+
+
+class MovePicker:
+    '''
+    分阶段、惰性地为 `_negamax` 产生走法。
+
+    Attributes:
+        bb (Bitboard): 当前棋盘局面。
+        tt_move (Optional[Move]): 置换表中记录的最佳走法 (from_sq, to_sq)。
+        history_table (list): 历史启发表。
+        killers (Sequence[Optional[Move]]): 当前层的杀手走法 (两个槽位)。
+        counter_move (Optional[Move]): 对手上一步走法的反击走法。
+        stage (int): 当前所处的阶段。
+    '''
+
+    def __init__(self, bb: Bitboard, tt_move: Optional[Move], history_table: list,
+                 killers: Sequence[Optional[Move]] = (), counter_move: Optional[Move] = None):
+        self.bb = bb
+        self.tt_move = tt_move
+        self.history_table = history_table
+        self.killers = killers
+        self.counter_move = counter_move
+        self.stage = STAGE_TT_MOVE
+
+    def __iter__(self) -> Iterator[Move]:
+        bb = self.bb
+        tt_move = self.tt_move
+
+        # --- 阶段1: 置换表走法 ---
+        if tt_move is not None and moves.is_legal_move(bb, tt_move):
+            yield tt_move
+        else:
+            tt_move = None
+
+        # --- 阶段2: 吃子走法 (MVV-LVA) ---
+        self.stage = STAGE_CAPTURES
+        board = bb.board
+        captures = moves.generate_captures(bb)
+        if tt_move in captures:
+            captures.remove(tt_move)
+        if captures:
+            scores = [abs(PIECE_VALUES[board[to_sq]]) - abs(PIECE_VALUES[board[from_sq]]) for from_sq, to_sq in captures]
+            yield from _ordered(captures, scores)
+
+        # --- 阶段3: 杀手走法和反击走法 ---
+        # 它们来自其他节点，必须是当前局面下合法的安静走法，并且不与之前产生的走法重复
+        self.stage = STAGE_KILLERS
+        special = []
+        for move in (*self.killers, self.counter_move):
+            if move is not None and move != tt_move and move not in special \
+                    and board[move[1]] == EMPTY and moves.is_legal_move(bb, move):
+                special.append(move)
+                yield move
+
+        # --- 阶段4: 安静走法 (历史启发) ---
+        self.stage = STAGE_QUIETS
+        quiets = moves.generate_quiets(bb)
+        if tt_move in quiets:
+            quiets.remove(tt_move)
+        for move in special:
+            quiets.remove(move)
+        if quiets:
+            history_table = self.history_table
+            scores = [history_table[Bitboard.piece_to_zobrist_idx(board[from_sq])][to_sq] for from_sq, to_sq in quiets]
+            yield from _ordered(quiets, scores)
+
+        self.stage = STAGE_DONE
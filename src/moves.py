@@ -7,14 +7,16 @@
 - 为所有棋子类型生成伪合法走法 (Pseudo-legal moves)。
 - 检测特定棋盘位置是否被某一方攻击。
 - 判断某一方是否被将军。
-- 生成当前局面的所有合法走法。
+- 生成当前局面的所有合法走法，以及供静默搜索使用的合法吃子走法。
 
-为了提升性能，模块在启动时会预先计算并缓存所有棋子的基本攻击模式。
+为了提升性能，模块在启动时会预先计算所有棋子的基本攻击模式。计算结果保存在
+缓存文件中 (参见 `src.tablecache`)，之后的导入直接读取缓存。
 '''
 
-from typing import List
+from typing import Dict, List, Tuple
 from src.bitboard import Bitboard, SQUARE_MASKS, PIECE_TO_BB_INDEX, BB_INDEX_TO_PIECE
 from src.constants import *
+from src.tablecache import load_tables
 
 Move = tuple[int, int]  # 使用整数表示棋盘位置，而非坐标元组
 
@@ -24,7 +26,7 @@ RED_SIDE_MASK = 0x000000000001FFFFFFFFFFF  # 红方兵、象的移动区域 (黑
 BLACK_SIDE_MASK = 0x3FFFFFFFFFFE00000000000  # 黑方兵、象的移动区域 (红方半盘)
 
 # --- 预计算攻击表 (Pre-calculated Attack Tables) ---
-# 这些表在模块加载时一次性计算，之后在走法生成中可以快速查询。
+# 这些表在模块加载时一次性计算 (或从缓存读取)，之后在走法生成中可以快速查询。
 KING_ATTACKS = [0] * 90   # 帅/将 的攻击范围
 GUARD_ATTACKS = [0] * 90  # 仕/士 的攻击范围
 BISHOP_ATTACKS = [0] * 90  # 象/相 的攻击范围 (不考虑塞象眼)
@@ -32,6 +34,7 @@ BISHOP_LEGS = {}          # 记录象/相的象眼位置
 HORSE_ATTACKS = [0] * 90  # 马 的攻击范围 (不考虑蹩马腿)
 HORSE_LEGS = {}           # 记录马的马腿位置
 PAWN_ATTACKS = [[0] * 90, [0] * 90]  # 兵/卒 的攻击范围 [player_idx][square]
+PAWN_ATTACKERS = [[0] * 90, [0] * 90]  # 能攻击到某个位置的兵/卒所在的位置 [player_idx][square]
 
 
 def _sq(r, c):
@@ -139,11 +142,15 @@ def _precompute_pawn_attacks():
                 if _is_valid(r, c + 1):
                     PAWN_ATTACKS[1][sq] |= SQUARE_MASKS[_sq(r, c + 1)]  # 向右
 
+    # 反向表：兵的走法不对称，不能直接用 PAWN_ATTACKS[idx][sq] 查找攻击sq的兵
+    for idx in range(2):
+        for sq in range(90):
+            attacks = PAWN_ATTACKS[idx][sq]
+            while attacks:
+                to_sq = (attacks & -attacks).bit_length() - 1
+                PAWN_ATTACKERS[idx][to_sq] |= SQUARE_MASKS[sq]
+                attacks &= attacks - 1
 
-# --- 模块加载时执行预计算 ---
-_precompute_king_guard_attacks()
-_precompute_bishop_horse_attacks()
-_precompute_pawn_attacks()
 
 
 # --- Ray-Attack Pre-calculation for Sliding Pieces ---
@@ -170,12 +177,221 @@ def _precompute_rays():
             RAYS[3][sq] |= SQUARE_MASKS[_sq(r, i)]
 
 
-_precompute_rays()
+# BETWEEN[a][b]: 位置a和b之间 (不含两端) 所有格子的位棋盘，两者不在同一行或同一列时为0。
+BETWEEN = [[0] * 90 for _ in range(90)]
+# LINE[a][b]: 经过位置a和b的整行或整列的位棋盘，两者不在同一行或同一列时为0。
+LINE = [[0] * 90 for _ in range(90)]
+
+
+def _precompute_between_and_line():
+    '''预计算任意两个位置之间的连线掩码以及经过它们的整条直线掩码。'''
+    for a in range(90):
+        for direction in range(4):
+            ray = RAYS[direction][a]
+            # 与该方向相反的射线，两者合起来就是经过a的整条直线 (不含a本身)
+            full_line = ray | RAYS[(direction + 2) % 4][a] | SQUARE_MASKS[a]
+            temp_ray = ray
+            while temp_ray:
+                b = (temp_ray & -temp_ray).bit_length() - 1
+                # a到b之间的格子 = a方向上的射线 去掉 b方向上(同向)的射线 再去掉b本身
+                BETWEEN[a][b] = ray & ~RAYS[direction][b] & ~SQUARE_MASKS[b]
+                LINE[a][b] = full_line
+                temp_ray &= temp_ray - 1
+
+
+# --- 车/炮的行/列占位攻击表 ---
+# 车和炮在一行 (列) 上的攻击范围只取决于它在这一行 (列) 中的位置和这一行 (列) 的占位。
+# `Bitboard` 增量维护每一行的9位占位 `rank_occ` 和每一列的10位占位 `file_occ`，
+# 因此车/炮的攻击只需要查两次表，再把结果移到所在的行和列上。
+# 表按棋子在行 (列) 中的位置而不是按棋盘位置索引，体积只有后者的十分之一左右。
+
+# ROOK_RANK_ATTACKS[c][rank_occ]: 位于第0行第c列的车在该行上的攻击位棋盘，左移 9*r 位即为第r行
+ROOK_RANK_ATTACKS = [[0] * 512 for _ in range(9)]
+# ROOK_FILE_ATTACKS[r][file_occ]: 位于第r行第0列的车在该列上的攻击位棋盘，左移 c 位即为第c列
+ROOK_FILE_ATTACKS = [[0] * 1024 for _ in range(10)]
+# 炮的对应表 (包括不吃子的走法和隔一个棋子的吃子走法)
+CANNON_RANK_ATTACKS = [[0] * 512 for _ in range(9)]
+CANNON_FILE_ATTACKS = [[0] * 1024 for _ in range(10)]
+
+# 每个位置所在的行和列
+SQ_RANK = [sq // 9 for sq in range(90)]
+SQ_FILE = [sq % 9 for sq in range(90)]
+
+
+def _line_attacks(pos: int, occ: int, length: int) -> Tuple[int, int]:
+    '''
+    计算一条直线上位于 `pos` 的车和炮的攻击范围。
+
+    Args:
+        pos (int): 棋子在直线上的位置。
+        occ (int): 直线的占位，第i位为1表示第i个位置有棋子。
+        length (int): 直线的长度 (行为9，列为10)。
+
+    Returns:
+        Tuple[int, int]: (车的攻击, 炮的攻击)，同样以直线上的位置为位表示。
+    '''
+    rook = cannon = 0
+    for step in (-1, 1):
+        i = pos + step
+        # 车: 直到 (并包括) 第一个棋子；炮: 第一个棋子之前的空位，以及炮架之后的第一个棋子
+        while 0 <= i < length:
+            rook |= 1 << i
+            if occ & (1 << i):
+                break
+            cannon |= 1 << i
+            i += step
+        i += step
+        while 0 <= i < length:
+            if occ & (1 << i):
+                cannon |= 1 << i
+                break
+            i += step
+    return rook, cannon
+
+
+def _precompute_line_attacks():
+    '''预计算车/炮的行/列占位攻击表。'''
+    for c in range(9):
+        for occ in range(512):
+            ROOK_RANK_ATTACKS[c][occ], CANNON_RANK_ATTACKS[c][occ] = _line_attacks(c, occ, 9)
+
+    # 列上的第r个位置对应位棋盘的第 9*r 位
+    file_masks = [0] * 1024
+    for pattern in range(1024):
+        for r in range(10):
+            if pattern & (1 << r):
+                file_masks[pattern] |= SQUARE_MASKS[_sq(r, 0)]
+
+    for r in range(10):
+        for occ in range(1024):
+            rook, cannon = _line_attacks(r, occ, 10)
+            ROOK_FILE_ATTACKS[r][occ] = file_masks[rook]
+            CANNON_FILE_ATTACKS[r][occ] = file_masks[cannon]
+
+
+# --- 马/象的腿占位攻击表 ---
+# 马的走法只取决于四个马腿 (上下左右相邻的位置) 是否有棋子，象的走法只取决于四个象眼
+# (斜向相邻的位置) 是否有棋子。把这几个位置的占位压缩成一个索引，一次查表即可得到全部目标位置。
+#
+# 索引直接从占位位棋盘中取出: 把占位左移后再右移 sq 位，使相邻位置落在固定的比特上。
+# 越过棋盘边缘的位置会取到另一行的棋子 (或0)，但它们对应的目标位置都在棋盘之外，
+# 建表时不会用到这些比特，因此不影响结果。
+#
+# 马腿索引 (16项): w = (occupied << 9) >> sq
+#   bit0: 上 (sq-9)    bit1: 左 (sq-1)    bit2: 下 (sq+9)    bit3: 右 (sq+1)
+# 斜向索引 (64项，只用到其中的16项): w = (occupied << 10) >> sq
+#   bit0: 左上 (sq-10)  bit2: 右上 (sq-8)   bit3: 左下 (sq+8)   bit5: 右下 (sq+10)
+_HORSE_LEG_BITS = {-9: 0, -1: 1, 9: 2, 1: 3}
+_DIAGONAL_BITS = {-10: 0, -8: 2, 8: 3, 10: 5}
+
+# HORSE_LEG_ATTACKS[sq][leg_index]: 马在sq的全部走法位棋盘
+HORSE_LEG_ATTACKS = [[0] * 16 for _ in range(90)]
+# BISHOP_EYE_ATTACKS[sq][diagonal_index]: 象在sq的全部走法位棋盘 (未限制不能过河)
+BISHOP_EYE_ATTACKS = [[0] * 64 for _ in range(90)]
+# HORSE_LEG_ATTACKERS[sq][diagonal_index]: 能攻击到sq的马所在的位置。
+# 从sq反过来看，攻击它的马的马腿是sq斜向相邻的位置，而不是sq的上下左右。
+HORSE_LEG_ATTACKERS = [[0] * 64 for _ in range(90)]
+
+
+def _horse_leg_index(occupied: int, sq: int) -> int:
+    '''从占位位棋盘中取出马在sq的马腿索引。'''
+    w = (occupied << 9) >> sq
+    return (w & 1) | ((w >> 7) & 0b1010) | ((w >> 16) & 0b100)
+
+
+def _diagonal_index(occupied: int, sq: int) -> int:
+    '''从占位位棋盘中取出sq斜向相邻位置的索引 (象眼，或攻击sq的马的马腿)。'''
+    w = (occupied << 10) >> sq
+    return (w & 0b101) | ((w >> 15) & 0b101000)
+
+
+def _precompute_leg_attacks():
+    '''预计算马/象的腿占位攻击表，以及马的反向攻击表。'''
+    for sq in range(90):
+        for index in range(64):
+            if index < 16:
+                for to_sq, leg_sq in HORSE_LEGS[sq].items():
+                    if not index & (1 << _HORSE_LEG_BITS[leg_sq - sq]):
+                        HORSE_LEG_ATTACKS[sq][index] |= SQUARE_MASKS[to_sq]
+            for to_sq, leg_sq in BISHOP_LEGS[sq].items():
+                if not index & (1 << _DIAGONAL_BITS[leg_sq - sq]):
+                    BISHOP_EYE_ATTACKS[sq][index] |= SQUARE_MASKS[to_sq]
+
+    for from_sq in range(90):
+        for to_sq, leg_sq in HORSE_LEGS[from_sq].items():
+            leg_bit = 1 << _DIAGONAL_BITS[leg_sq - to_sq]
+            for index in range(64):
+                if not index & leg_bit:
+                    HORSE_LEG_ATTACKERS[to_sq][index] |= SQUARE_MASKS[from_sq]
+
+
+def get_horse_attacks(occupied: int, sq: int) -> int:
+    '''获取马在给定位置的走法位棋盘 (已考虑蹩马腿)。'''
+    return HORSE_LEG_ATTACKS[sq][_horse_leg_index(occupied, sq)]
+
+
+def get_bishop_attacks(occupied: int, sq: int) -> int:
+    '''获取象/相在给定位置的走法位棋盘 (已考虑塞象眼，未限制不能过河)。'''
+    return BISHOP_EYE_ATTACKS[sq][_diagonal_index(occupied, sq)]
+
+
+def get_horse_attackers(occupied: int, sq: int) -> int:
+    '''获取能攻击到给定位置的马可能所在的位置 (已考虑蹩马腿)。'''
+    return HORSE_LEG_ATTACKERS[sq][_diagonal_index(occupied, sq)]
+
+
+# 所有需要缓存的预计算表的名称
+_CACHED_TABLES = (
+    'KING_ATTACKS', 'GUARD_ATTACKS', 'BISHOP_ATTACKS', 'BISHOP_LEGS', 'HORSE_ATTACKS', 'HORSE_LEGS',
+    'PAWN_ATTACKS', 'PAWN_ATTACKERS', 'RAYS', 'BETWEEN', 'LINE',
+    'ROOK_RANK_ATTACKS', 'ROOK_FILE_ATTACKS', 'CANNON_RANK_ATTACKS', 'CANNON_FILE_ATTACKS',
+    'HORSE_LEG_ATTACKS', 'BISHOP_EYE_ATTACKS', 'HORSE_LEG_ATTACKERS',
+)
+
+
+def _compute_tables() -> dict:
+    '''执行所有预计算，返回 {表名: 表}。'''
+    _precompute_king_guard_attacks()
+    _precompute_bishop_horse_attacks()
+    _precompute_pawn_attacks()
+    _precompute_rays()
+    _precompute_between_and_line()
+    _precompute_line_attacks()
+    _precompute_leg_attacks()
+    return {name: globals()[name] for name in _CACHED_TABLES}
+
+
+# --- 模块加载时从缓存读取预计算表，缓存不可用时重新计算 ---
+globals().update(load_tables('moves', __file__, _compute_tables))
+
+
+def get_rook_attacks(bb: Bitboard, sq: int) -> int:
+    '''
+    获取车在给定位置的走法位棋盘 (使用 `bb` 的行/列占位查表)。
+
+    结果与 `get_rook_moves_bb(sq, bb.occupied_bitboard)` 相同。
+    '''
+    r = SQ_RANK[sq]
+    c = SQ_FILE[sq]
+    return (ROOK_RANK_ATTACKS[c][bb.rank_occ[r]] << (9 * r)) | (ROOK_FILE_ATTACKS[r][bb.file_occ[c]] << c)
+
+
+def get_cannon_attacks(bb: Bitboard, sq: int) -> int:
+    '''
+    获取炮在给定位置的走法位棋盘 (使用 `bb` 的行/列占位查表)。
+
+    结果与 `get_cannon_moves_bb(sq, bb.occupied_bitboard)` 相同。
+    '''
+    r = SQ_RANK[sq]
+    c = SQ_FILE[sq]
+    return (CANNON_RANK_ATTACKS[c][bb.rank_occ[r]] << (9 * r)) | (CANNON_FILE_ATTACKS[r][bb.file_occ[c]] << c)
 
 
 def get_rook_moves_bb(sq: int, occupied: int) -> int:
     '''
     获取车在给定位置的走法位棋盘 (使用射线预计算)。
+
+    适用于任意的占位位棋盘；对于实际的棋盘局面，`get_rook_attacks` 更快。
     '''
     final_attacks = 0
 
@@ -221,6 +437,8 @@ def get_rook_moves_bb(sq: int, occupied: int) -> int:
 def get_cannon_moves_bb(sq: int, occupied: int) -> int:
     '''
     获取炮在给定位置的走法位棋盘 (使用射线预计算)。
+
+    适用于任意的占位位棋盘；对于实际的棋盘局面，`get_cannon_attacks` 更快。
     '''
     attacks = 0
 
@@ -279,73 +497,77 @@ def get_cannon_moves_bb(sq: int, occupied: int) -> int:
     return attacks
 
 
-def generate_all_moves(bb: Bitboard, player: int) -> List[Move]:
+def _piece_moves_bb(bb: Bitboard, piece_type: int, from_sq: int, occupied: int, targets: int) -> int:
     '''
-    为指定方生成所有伪合法走法。
+    计算单个棋子的走法位棋盘 (已与 `targets` 做位与运算)。
 
-    伪合法走法是指不考虑走棋后是否会被将军的所有可能走法。
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+        piece_type (int): 棋子类型。
+        from_sq (int): 棋子所在位置。
+        occupied (int): 所有棋子的位棋盘。
+        targets (int): 允许的目标位置位棋盘。
+
+    Returns:
+        int: 该棋子目标位置落在 `targets` 中的走法位棋盘。
+    '''
+    moves_bb = 0
+
+    # --- 根据棋子类型生成走法位棋盘 ---
+    if piece_type in (R_KING, B_KING):
+        moves_bb = KING_ATTACKS[from_sq]
+    elif piece_type in (R_GUARD, B_GUARD):
+        moves_bb = GUARD_ATTACKS[from_sq]
+    elif piece_type in (R_BISHOP, B_BISHOP):
+        # 按象眼占位查表，并限制不能过河
+        side_mask = BLACK_SIDE_MASK if piece_type == R_BISHOP else RED_SIDE_MASK
+        w = (occupied << 10) >> from_sq
+        moves_bb = BISHOP_EYE_ATTACKS[from_sq][(w & 0b101) | ((w >> 15) & 0b101000)] & side_mask
+    elif piece_type in (R_HORSE, B_HORSE):
+        # 按马腿占位查表
+        w = (occupied << 9) >> from_sq
+        moves_bb = HORSE_LEG_ATTACKS[from_sq][(w & 1) | ((w >> 7) & 0b1010) | ((w >> 16) & 0b100)]
+    elif piece_type in (R_PAWN, B_PAWN):
+        moves_bb = PAWN_ATTACKS[0 if piece_type == R_PAWN else 1][from_sq]
+    elif piece_type in (R_ROOK, B_ROOK):
+        moves_bb = get_rook_attacks(bb, from_sq)
+    elif piece_type in (R_CANNON, B_CANNON):
+        moves_bb = get_cannon_attacks(bb, from_sq)
+
+    # 只保留目标位置在 targets 中的走法
+    return moves_bb & targets
+
+
+def _generate_pseudo_legal_moves(bb: Bitboard, player: int, targets: int) -> List[Move]:
+    '''
+    为指定方生成目标位置落在 `targets` 中的所有伪合法走法。
+
+    每个棋子的走法位棋盘在提取单个走法之前，先与 `targets` 做一次位与运算，
+    因此只有需要的走法才会被展开成列表。
 
     Args:
         bb (Bitboard): 当前棋盘局面。
         player (int): 要生成走法的一方 (PLAYER_R 或 PLAYER_B)。
+        targets (int): 允许的目标位置位棋盘。
 
     Returns:
-        List[Move]: 一个包含所有伪合法走法的列表。
+        List[Move]: 一个包含所有满足条件的伪合法走法的列表。
     '''
     moves = []
-    player_idx = 0 if player == PLAYER_R else 1
-    own_pieces_bb = bb.color_bitboards[player_idx]
     occupied = bb.occupied_bitboard
 
-    # 遍历该方的每一种棋子
-    for piece_bb_idx in range(14):
+    # 遍历该方的每一种棋子 (红方索引 0-6，黑方索引 7-13)
+    first_bb_idx = 0 if player == PLAYER_R else 7
+    for piece_bb_idx in range(first_bb_idx, first_bb_idx + 7):
         piece_type = BB_INDEX_TO_PIECE[piece_bb_idx]
-        if Bitboard.get_player(piece_type) != player:
-            continue
 
         # 遍历该类型棋子的每一个棋子
-        piece_bb = bb.piece_bitboards[piece_bb_idx]
-        temp_piece_bb = piece_bb
+        temp_piece_bb = bb.piece_bitboards[piece_bb_idx]
         while temp_piece_bb:
             from_sq = (temp_piece_bb & -temp_piece_bb).bit_length() - 1
-            moves_bb = 0
-
-            # --- 根据棋子类型生成走法位棋盘 ---
-            if piece_type in (R_KING, B_KING):
-                moves_bb = KING_ATTACKS[from_sq]
-            elif piece_type in (R_GUARD, B_GUARD):
-                moves_bb = GUARD_ATTACKS[from_sq]
-            elif piece_type in (R_BISHOP, B_BISHOP):
-                side_mask = BLACK_SIDE_MASK if piece_type == R_BISHOP else RED_SIDE_MASK
-                potential_moves = BISHOP_ATTACKS[from_sq] & side_mask
-                temp_moves = potential_moves
-                while temp_moves:
-                    to_sq = (temp_moves & -temp_moves).bit_length() - 1
-                    leg_sq = BISHOP_LEGS[from_sq][to_sq]
-                    if not (occupied & SQUARE_MASKS[leg_sq]):  # 检查象眼
-                        moves_bb |= SQUARE_MASKS[to_sq]
-                    temp_moves &= temp_moves - 1
-            elif piece_type in (R_HORSE, B_HORSE):
-                potential_moves = HORSE_ATTACKS[from_sq]
-                temp_moves = potential_moves
-                while temp_moves:
-                    to_sq = (temp_moves & -temp_moves).bit_length() - 1
-                    leg_sq = HORSE_LEGS[from_sq][to_sq]
-                    if not (occupied & SQUARE_MASKS[leg_sq]):  # 检查马腿
-                        moves_bb |= SQUARE_MASKS[to_sq]
-                    temp_moves &= temp_moves - 1
-            elif piece_type in (R_PAWN, B_PAWN):
-                moves_bb = PAWN_ATTACKS[player_idx][from_sq]
-            elif piece_type in (R_ROOK, B_ROOK):
-                moves_bb = get_rook_moves_bb(from_sq, occupied)
-            elif piece_type in (R_CANNON, B_CANNON):
-                moves_bb = get_cannon_moves_bb(from_sq, occupied)
-
-            # 排除走到己方棋子上的走法
-            valid_moves_bb = moves_bb & ~own_pieces_bb
-
-            # 从走法位棋盘中提取单个走法
-            temp_valid_moves = valid_moves_bb
+
+            # 从走法位棋盘中提取单个走法 (targets 同时排除了走到己方棋子上的走法)
+            temp_valid_moves = _piece_moves_bb(bb, piece_type, from_sq, occupied, targets)
             while temp_valid_moves:
                 to_sq = (temp_valid_moves & -temp_valid_moves).bit_length() - 1
                 moves.append((from_sq, to_sq))
@@ -356,6 +578,38 @@ def generate_all_moves(bb: Bitboard, player: int) -> List[Move]:
     return moves
 
 
+def generate_all_moves(bb: Bitboard, player: int) -> List[Move]:
+    '''
+    为指定方生成所有伪合法走法。
+
+    伪合法走法是指不考虑走棋后是否会被将军的所有可能走法。
+
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+        player (int): 要生成走法的一方 (PLAYER_R 或 PLAYER_B)。
+
+    Returns:
+        List[Move]: 一个包含所有伪合法走法的列表。
+    '''
+    player_idx = 0 if player == PLAYER_R else 1
+    return _generate_pseudo_legal_moves(bb, player, ~bb.color_bitboards[player_idx])
+
+
+def generate_all_captures(bb: Bitboard, player: int) -> List[Move]:
+    '''
+    为指定方生成所有伪合法的吃子走法。
+
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+        player (int): 要生成走法的一方 (PLAYER_R 或 PLAYER_B)。
+
+    Returns:
+        List[Move]: 一个包含所有伪合法吃子走法的列表。
+    '''
+    opponent_idx = 1 if player == PLAYER_R else 0
+    return _generate_pseudo_legal_moves(bb, player, bb.color_bitboards[opponent_idx])
+
+
 def is_square_attacked_by(bb: Bitboard, sq: int, attacker_player: int) -> bool:
     '''
     检查指定位置 `sq` 是否被 `attacker_player` 方攻击。
@@ -372,38 +626,23 @@ def is_square_attacked_by(bb: Bitboard, sq: int, attacker_player: int) -> bool:
     attacker_idx = 0 if attacker_player == PLAYER_R else 1
 
     # 检查兵/卒的攻击
-    pawn_attacks = PAWN_ATTACKS[attacker_idx][sq]
+    pawn_attacks = PAWN_ATTACKERS[attacker_idx][sq]
     pawn_piece = R_PAWN if attacker_player == PLAYER_R else B_PAWN
     if pawn_attacks & bb.piece_bitboards[PIECE_TO_BB_INDEX[pawn_piece]]:
         return True
 
-    # 检查马的攻击 (需要检查马腿)
-    horse_attacks = HORSE_ATTACKS[sq]
+    # 检查马和象/相的攻击。攻击sq的马的马腿和象/相的象眼都是sq斜向相邻的位置，共用同一个索引。
+    w = (occupied << 10) >> sq
+    diagonal_index = (w & 0b101) | ((w >> 15) & 0b101000)
     horse_piece = R_HORSE if attacker_player == PLAYER_R else B_HORSE
-    potential_horses = horse_attacks & bb.piece_bitboards[PIECE_TO_BB_INDEX[horse_piece]]
-    if potential_horses:
-        temp_horses = potential_horses
-        while temp_horses:
-            from_sq = (temp_horses & -temp_horses).bit_length() - 1
-            leg_sq = HORSE_LEGS[from_sq][sq]
-            if not (occupied & SQUARE_MASKS[leg_sq]):
-                return True
-            temp_horses &= temp_horses - 1
-
-    # 检查象/相的攻击 (需要检查象眼)
-    bishop_attacks = BISHOP_ATTACKS[sq]
+    if HORSE_LEG_ATTACKERS[sq][diagonal_index] & bb.piece_bitboards[PIECE_TO_BB_INDEX[horse_piece]]:
+        return True
+
     bishop_piece = R_BISHOP if attacker_player == PLAYER_R else B_BISHOP
-    potential_bishops = bishop_attacks & bb.piece_bitboards[PIECE_TO_BB_INDEX[bishop_piece]]
-    if potential_bishops:
-        side_mask = BLACK_SIDE_MASK if attacker_player == PLAYER_R else RED_SIDE_MASK
-        if side_mask & SQUARE_MASKS[sq]:  # 象/相不能过河
-            temp_bishops = potential_bishops
-            while temp_bishops:
-                from_sq = (temp_bishops & -temp_bishops).bit_length() - 1
-                leg_sq = BISHOP_LEGS[from_sq][sq]
-                if not (occupied & SQUARE_MASKS[leg_sq]):
-                    return True
-                temp_bishops &= temp_bishops - 1
+    side_mask = BLACK_SIDE_MASK if attacker_player == PLAYER_R else RED_SIDE_MASK
+    if side_mask & SQUARE_MASKS[sq]:  # 象/相不能过河
+        if BISHOP_EYE_ATTACKS[sq][diagonal_index] & bb.piece_bitboards[PIECE_TO_BB_INDEX[bishop_piece]]:
+            return True
 
     # 检查帅/将的攻击 (包括将帅对脸的情况)
     king_attacks = KING_ATTACKS[sq]
@@ -413,11 +652,11 @@ def is_square_attacked_by(bb: Bitboard, sq: int, attacker_player: int) -> bool:
 
     # 检查车和炮的攻击 (复用走法生成函数以提高性能)
     rook_piece = R_ROOK if attacker_player == PLAYER_R else B_ROOK
-    if get_rook_moves_bb(sq, occupied) & bb.piece_bitboards[PIECE_TO_BB_INDEX[rook_piece]]:
+    if get_rook_attacks(bb, sq) & bb.piece_bitboards[PIECE_TO_BB_INDEX[rook_piece]]:
         return True
 
     cannon_piece = R_CANNON if attacker_player == PLAYER_R else B_CANNON
-    if get_cannon_moves_bb(sq, occupied) & bb.piece_bitboards[PIECE_TO_BB_INDEX[cannon_piece]]:
+    if get_cannon_attacks(bb, sq) & bb.piece_bitboards[PIECE_TO_BB_INDEX[cannon_piece]]:
         return True
 
     return False
@@ -457,42 +696,20 @@ def is_check(bb: Bitboard, player: int) -> bool:
     if king_sq % 9 != opponent_king_sq % 9:
         return False
 
-    # b. 两者之间不能有任何棋子
-    occupied = bb.occupied_bitboard
-    min_sq, max_sq = min(king_sq, opponent_king_sq), max(king_sq, opponent_king_sq)
-
-    # 构造两者之间所有格子的掩码
-    between_mask = 0
-    # 从min_sq的下一行开始，到max_sq之前
-    for s in range(min_sq + 9, max_sq, 9):
-        between_mask |= SQUARE_MASKS[s]
-
-    if not (occupied & between_mask):
+    # b. 两者之间不能有任何棋子 (使用预计算的 BETWEEN 表)
+    if not (bb.occupied_bitboard & BETWEEN[king_sq][opponent_king_sq]):
         return True  # 将帅对脸，构成将军
 
     return False
 
 
-def generate_moves(bb: Bitboard) -> List[Move]:
+def _filter_legal_moves(bb: Bitboard, pseudo_legal_moves: List[Move]) -> List[Move]:
     '''
-    为当前走棋方生成所有合法的走法。
-
-    这个函数是最终的走法生成接口。它首先生成所有伪合法走法，
-    然后对每一个走法进行验证，确保走棋后己方将/帅不会处于被攻击状态。
-
-    Args:
-        bb (Bitboard): 当前棋盘局面。
-
-    Returns:
-        List[Move]: 一个包含所有合法走法的列表。
+    从伪合法走法中筛选出合法走法，即走棋后己方将/帅不会处于被攻击状态的走法。
     '''
     legal_moves = []
     player = bb.player_to_move
 
-    # 1. 生成所有不考虑将军的“伪合法”走法
-    pseudo_legal_moves = generate_all_moves(bb, player)
-
-    # 2. 对每个伪合法走法进行验证
     for from_sq, to_sq in pseudo_legal_moves:
         # a. 模拟走一步
         captured = bb.move_piece(from_sq, to_sq)
@@ -503,3 +720,258 @@ def generate_moves(bb: Bitboard) -> List[Move]:
         bb.unmove_piece(from_sq, to_sq, captured)
 
     return legal_moves
+
+
+def _analyze_king_safety(bb: Bitboard, player: int, king_sq: int) -> Tuple[int, int, int, int, int, Dict[int, int]]:
+    '''
+    在一个节点上一次性分析 `player` 方将/帅的安全状况。
+
+    从将/帅所在位置沿四个方向扫描最近的三个棋子，并检查所有马腿，得到：
+    - 将军的棋子 (车、炮、马、兵以及将帅对脸)；
+    - 被牵制的己方棋子：离开原位后可能使己方被将军的棋子。包括车 (或对方将/帅) 与己方将/帅之间
+      唯一的己方棋子、对方炮与己方将/帅之间的两个炮架中的己方棋子，以及别住对方马腿的己方棋子；
+    - 禁止落子的空位：将/帅与对方炮之间的空位，在这里落子会给对方的炮架上炮架；
+    - 应将时的目标位置：吃掉将军的棋子、或者在车/炮的将军线上以及马腿上垫子。
+
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+        player (int): 要分析的一方。
+        king_sq (int): 该方将/帅所在的位置。
+
+    Returns:
+        Tuple: (checkers, pinned, forbidden, evasion_targets, screens, pin_segments)
+            checkers (int): 正在将军的对方棋子的位棋盘。
+            pinned (int): 走动后必须通过试走来验证合法性的己方棋子的位棋盘。
+            forbidden (int): 己方非将/帅棋子不能走入的空位的位棋盘。
+            evasion_targets (int): 被将军时，非将/帅棋子可能解将的目标位置。
+            screens (int): 被对方炮将军时，充当唯一炮架的己方棋子 (移开即可解将)。
+            pin_segments (Dict[int, int]): 只被车 (或对方将/帅) 沿直线牵制的己方棋子，
+                映射到它可以合法走入的线段 (将/帅与牵制者之间的格子以及牵制者本身)。
+    '''
+    board = bb.board
+    occupied = bb.occupied_bitboard
+    enemy = -player
+    enemy_rook, enemy_cannon, enemy_king = R_ROOK * enemy, R_CANNON * enemy, R_KING * enemy
+
+    checkers = pinned = forbidden = evasion_targets = screens = 0
+    pin_segments = {}
+
+    # 1. 沿四个方向扫描：车、炮的将军与牵制，以及将帅对脸
+    for direction in range(4):
+        blockers = occupied & RAYS[direction][king_sq]
+        if not blockers:
+            continue
+        # 北 (0) 和西 (3) 方向索引递减，最近的棋子是最高位；东 (1) 和南 (2) 方向是最低位
+        from_msb = direction == 0 or direction == 3
+        vertical = direction == 0 or direction == 2
+
+        # 最近的第一个棋子
+        p1 = blockers.bit_length() - 1 if from_msb else (blockers & -blockers).bit_length() - 1
+        piece1 = board[p1]
+        if piece1 == enemy_rook or (vertical and piece1 == enemy_king):
+            checkers |= SQUARE_MASKS[p1]
+            evasion_targets |= BETWEEN[king_sq][p1] | SQUARE_MASKS[p1]
+            continue
+        if piece1 == enemy_cannon:
+            # 在将/帅和对方炮之间落子，会成为对方的炮架
+            forbidden |= BETWEEN[king_sq][p1]
+        own1 = piece1 * player > 0
+
+        # 第二个棋子
+        blockers ^= SQUARE_MASKS[p1]
+        if not blockers:
+            continue
+        p2 = blockers.bit_length() - 1 if from_msb else (blockers & -blockers).bit_length() - 1
+        piece2 = board[p2]
+        if piece2 == enemy_cannon:
+            checkers |= SQUARE_MASKS[p2]
+            evasion_targets |= BETWEEN[king_sq][p2] | SQUARE_MASKS[p2]
+            if own1:
+                screens |= SQUARE_MASKS[p1]
+            continue
+        if own1 and (piece2 == enemy_rook or (vertical and piece2 == enemy_king)):
+            pin_segments[p1] = BETWEEN[king_sq][p2] | SQUARE_MASKS[p2]
+        own2 = piece2 * player > 0
+
+        # 第三个棋子
+        blockers ^= SQUARE_MASKS[p2]
+        if not blockers:
+            continue
+        p3 = blockers.bit_length() - 1 if from_msb else (blockers & -blockers).bit_length() - 1
+        if board[p3] == enemy_cannon:
+            # 两个炮架中的任意一个离开，都会让对方的炮形成将军
+            if own1:
+                pinned |= SQUARE_MASKS[p1]
+            if own2:
+                pinned |= SQUARE_MASKS[p2]
+
+    # 2. 马的将军与别马腿
+    enemy_horses = bb.piece_bitboards[PIECE_TO_BB_INDEX[R_HORSE * enemy]] & HORSE_ATTACKS[king_sq]
+    while enemy_horses:
+        horse_sq = (enemy_horses & -enemy_horses).bit_length() - 1
+        leg_sq = HORSE_LEGS[horse_sq][king_sq]
+        leg_piece = board[leg_sq]
+        if leg_piece == EMPTY:
+            checkers |= SQUARE_MASKS[horse_sq]
+            evasion_targets |= SQUARE_MASKS[horse_sq] | SQUARE_MASKS[leg_sq]
+        elif leg_piece * player > 0:
+            pinned |= SQUARE_MASKS[leg_sq]
+        enemy_horses &= enemy_horses - 1
+
+    # 3. 兵/卒的将军
+    enemy_idx = 0 if enemy == PLAYER_R else 1
+    pawn_checkers = PAWN_ATTACKERS[enemy_idx][king_sq] & bb.piece_bitboards[PIECE_TO_BB_INDEX[R_PAWN * enemy]]
+    if pawn_checkers:
+        checkers |= pawn_checkers
+        evasion_targets |= pawn_checkers
+
+    # 同时受到其他牵制的棋子，只能通过试走来验证
+    for sq in list(pin_segments):
+        if pinned & SQUARE_MASKS[sq]:
+            del pin_segments[sq]
+
+    return checkers, pinned, forbidden, evasion_targets, screens, pin_segments
+
+
+def _generate_legal_moves(bb: Bitboard, targets: int) -> List[Move]:
+    '''
+    为当前走棋方生成目标位置落在 `targets` 中的所有合法走法。
+
+    每个节点只分析一次将军和牵制的情况 (见 `_analyze_king_safety`)：
+    - 没有被将军时，未被牵制的非将/帅棋子，只要不走入对方炮前的空位，走法一定合法，不需要试走；
+      只被车沿直线牵制的棋子，只要仍停留在牵制线段上，走法也一定合法。
+    - 被将军时，只保留可能解将的走法 (将/帅的走法、吃掉或阻挡将军的棋子、移开炮架)。
+    只有将/帅的走法、其余被牵制棋子的走法以及应将走法，才需要通过试走来验证。
+    '''
+    player = bb.player_to_move
+    king_bb = bb.piece_bitboards[PIECE_TO_BB_INDEX[R_KING * player]]
+    if not king_bb:
+        return []  # 棋盘上没有将/帅，视为没有合法走法 (与 is_check 的约定一致)
+    king_sq = (king_bb & -king_bb).bit_length() - 1
+
+    pseudo_legal_moves = _generate_pseudo_legal_moves(bb, player, targets)
+    checkers, pinned, forbidden, evasion_targets, screens, pin_segments = _analyze_king_safety(bb, player, king_sq)
+
+    if checkers:
+        # --- 应将 ---
+        # 车 (或将帅对脸) 将军时，将/帅沿着将军线后退仍然会被将军
+        king_line_forbidden = 0
+        temp_checkers = checkers
+        while temp_checkers:
+            checker_sq = (temp_checkers & -temp_checkers).bit_length() - 1
+            if abs(bb.board[checker_sq]) in (R_ROOK, R_KING):
+                king_line_forbidden |= LINE[king_sq][checker_sq] & ~SQUARE_MASKS[checker_sq]
+            temp_checkers &= temp_checkers - 1
+
+        candidates = []
+        for move in pseudo_legal_moves:
+            from_sq, to_sq = move
+            if from_sq == king_sq:
+                if not (king_line_forbidden & SQUARE_MASKS[to_sq]):
+                    candidates.append(move)
+            elif evasion_targets & SQUARE_MASKS[to_sq] or screens & SQUARE_MASKS[from_sq]:
+                candidates.append(move)
+        return _filter_legal_moves(bb, candidates)
+
+    # --- 没有被将军 ---
+    legal_moves = []
+    needs_trial = pinned | SQUARE_MASKS[king_sq]
+    for move in pseudo_legal_moves:
+        from_sq, to_sq = move
+        if needs_trial & SQUARE_MASKS[from_sq]:
+            if _is_legal_after_trial(bb, from_sq, to_sq, player):
+                legal_moves.append(move)
+        elif from_sq in pin_segments:
+            if pin_segments[from_sq] & SQUARE_MASKS[to_sq]:
+                legal_moves.append(move)
+        elif not (forbidden & SQUARE_MASKS[to_sq]):
+            legal_moves.append(move)
+
+    return legal_moves
+
+
+def _is_legal_after_trial(bb: Bitboard, from_sq: int, to_sq: int, player: int) -> bool:
+    '''通过试走一步来判断走法是否会让 `player` 方被将军。'''
+    captured = bb.move_piece(from_sq, to_sq)
+    legal = not is_check(bb, player)
+    bb.unmove_piece(from_sq, to_sq, captured)
+    return legal
+
+
+def generate_moves(bb: Bitboard) -> List[Move]:
+    '''
+    为当前走棋方生成所有合法的走法。
+
+    这个函数是最终的走法生成接口。它首先分析当前局面的将军和牵制情况，
+    然后只对少数可能不合法的走法进行试走验证，确保走棋后己方将/帅不会处于被攻击状态。
+
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+
+    Returns:
+        List[Move]: 一个包含所有合法走法的列表。
+    '''
+    player_idx = Bitboard.get_player_bb_idx(bb.player_to_move)
+    return _generate_legal_moves(bb, ~bb.color_bitboards[player_idx])
+
+
+def generate_captures(bb: Bitboard) -> List[Move]:
+    '''
+    为当前走棋方生成所有合法的吃子走法。
+
+    与先调用 `generate_moves` 再筛选吃子走法不同，这里在提取走法之前
+    就用对方棋子的位棋盘屏蔽掉了所有非吃子的目标位置，
+    只有剩下的吃子走法才需要进行合法性检查。主要供静默搜索使用。
+
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+
+    Returns:
+        List[Move]: 一个包含所有合法吃子走法的列表。
+    '''
+    opponent_idx = 1 - Bitboard.get_player_bb_idx(bb.player_to_move)
+    return _generate_legal_moves(bb, bb.color_bitboards[opponent_idx])
+
+
+def generate_quiets(bb: Bitboard) -> List[Move]:
+    '''
+    为当前走棋方生成所有合法的非吃子走法 (目标位置为空的走法)。
+
+    与 `generate_captures` 一起使用时，两者的结果合起来就是 `generate_moves` 的结果。
+    主要供分阶段的走法排序器使用。
+
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+
+    Returns:
+        List[Move]: 一个包含所有合法非吃子走法的列表。
+    '''
+    return _generate_legal_moves(bb, ~bb.occupied_bitboard)
+
+
+def is_legal_move(bb: Bitboard, move: Move) -> bool:
+    '''
+    判断一个走法在当前局面下是否合法，而不需要生成全部走法。
+
+    主要用于验证置换表中取出的最佳走法：由于哈希冲突或局面变化，
+    该走法在当前局面下不一定合法。
+
+    Args:
+        bb (Bitboard): 当前棋盘局面。
+        move (Move): 要验证的走法 (from_sq, to_sq)。
+
+    Returns:
+        bool: 如果走法合法，则返回True；否则返回False。
+    '''
+    from_sq, to_sq = move
+    player = bb.player_to_move
+    piece_type = bb.board[from_sq]
+    if piece_type * player <= 0:
+        return False  # 起始位置上没有己方棋子
+
+    player_idx = Bitboard.get_player_bb_idx(player)
+    targets = ~bb.color_bitboards[player_idx] & SQUARE_MASKS[to_sq]
+    if not _piece_moves_bb(bb, piece_type, from_sq, bb.occupied_bitboard, targets):
+        return False  # 不是伪合法走法
+
+    return _is_legal_after_trial(bb, from_sq, to_sq, player)
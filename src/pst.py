@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+'''
+棋子位置表 (Piece-Square Tables, PST) 模块。
+
+该模块定义了中局 (PST_MG) 与残局 (PST_EG) 两套位置表，并在加载时把它们
+展开成按棋盘位置索引 (0-89) 的有符号分值表 (红方为正，黑方为负)。
+
+`Bitboard` 在走子和撤销走子时使用这些展开后的表，增量地维护子力价值、
+阶段子力和位置分的累计值，就像它增量维护Zobrist哈希一样。
+这样评估函数就不必在每个节点上重新遍历所有棋子。
+'''
+import copy
+
+from src.constants import *
+
+# --- Midgame Piece-Square Tables (PST_MG) ---
+# fmt: off
+KING_PST_MG = [
+    [  0,   0,   0,   8,   8,   8,   0,   0,   0],
+    [  0,   0,   0,   8,   8,   8,   0,   0,   0],
+    [  0,   0,   0,   6,   6,   6,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   6,   6,   6,   0,   0,   0],
+    [  0,   0,   0,   8,   8,   8,   0,   0,   0],
+    [  0,   0,   0,   8,   8,   8,   0,   0,   0],
+]
+GUARD_PST_MG = [
+    [  0,   0,   0,  20,   0,  20,   0,   0,   0],
+    [  0,   0,   0,   0,  23,   0,   0,   0,   0],
+    [  0,   0,   0,  20,   0,  20,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,  20,   0,  20,   0,   0,   0],
+    [  0,   0,   0,   0,  23,   0,   0,   0,   0],
+    [  0,   0,   0,  20,   0,  20,   0,   0,   0],
+]
+BISHOP_PST_MG = [
+    [  0,   0,  20,   0,   0,   0,  20,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,  23,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,  20,   0,   0,   0,  20,   0,   0],
+    [  0,   0,  20,   0,   0,   0,  20,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,  23,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,  20,   0,   0,   0,  20,   0,   0],
+]
+HORSE_PST_MG = [
+    [ 90,  90,  90,  96,  90,  96,  90,  90,  90],
+    [ 90,  96, 103,  97,  94,  97, 103,  96,  90],
+    [ 92,  98,  99, 103,  99, 103,  99,  98,  92],
+    [ 93, 108, 100, 107, 100, 107, 100, 108,  93],
+    [ 90, 100,  99, 103, 104, 103,  99, 100,  90],
+    [ 90,  98, 101, 102, 103, 102, 101,  98,  90],
+    [ 92,  94,  98,  95,  98,  95,  98,  94,  92],
+    [ 93,  92,  94,  95,  92,  95,  94,  92,  93],
+    [ 85,  90,  92,  93,  78,  93,  92,  90,  85],
+    [ 88,  85,  90,  88,  90,  88,  90,  85,  88],
+]
+ROOK_PST_MG = [
+    [206, 208, 207, 213, 214, 213, 207, 208, 206],
+    [206, 212, 209, 216, 233, 216, 209, 212, 206],
+    [206, 208, 207, 214, 216, 214, 207, 208, 206],
+    [206, 213, 213, 216, 216, 216, 213, 213, 206],
+    [208, 211, 211, 214, 215, 214, 211, 211, 208],
+    [208, 212, 212, 214, 215, 214, 212, 212, 208],
+    [204, 209, 204, 212, 214, 212, 204, 209, 204],
+    [198, 208, 204, 212, 212, 212, 204, 208, 198],
+    [200, 208, 206, 212, 200, 212, 206, 208, 200],
+    [194, 206, 204, 212, 200, 212, 204, 206, 194],
+]
+CANNON_PST_MG = [
+    [100, 100,  96,  91,  90,  91,  96, 100, 100],
+    [ 98,  98,  96,  92,  89,  92,  96,  98,  98],
+    [ 97,  97,  96,  91,  92,  91,  96,  97,  97],
+    [ 96,  99,  99,  98, 100,  98,  99,  99,  96],
+    [ 96,  96,  96,  96, 100,  96,  96,  96,  96],
+    [ 95,  96,  99,  96, 100,  96,  99,  96,  95],
+    [ 96,  96,  96,  96,  96,  96,  96,  96,  96],
+    [ 97,  96, 100,  99, 101,  99, 100,  96,  97],
+    [ 96,  97,  98,  98,  98,  98,  98,  97,  96],
+    [ 96,  96,  97,  99,  99,  99,  97,  96,  96],
+]
+PAWN_PST_MG = [
+    [  9,   9,   9,  11,  13,  11,   9,   9,   9],
+    [ 19,  24,  34,  42,  44,  42,  34,  24,  19],
+    [ 19,  24,  32,  37,  37,  37,  32,  24,  19],
+    [ 19,  23,  27,  29,  30,  29,  27,  23,  19],
+    [ 14,  18,  20,  27,  29,  27,  20,  18,  14],
+    [  7,   0,  13,   0,  16,   0,  13,   0,   7],
+    [  7,   0,   7,   0,  15,   0,   7,   0,   7],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+]
+PAWN_PST_EG = [
+    [ 20,  20,  20,  25,  30,  25,  20,  20,  20],
+    [ 40,  50,  60,  70,  75,  70,  60,  50,  40],
+    [ 40,  50,  60,  65,  70,  65,  60,  50,  40],
+    [ 40,  50,  55,  60,  60,  60,  55,  50,  40],
+    [ 30,  40,  45,  50,  50,  50,  45,  40,  30],
+    [ 15,  20,  25,  30,  30,  30,  25,  20,  15],
+    [ 10,  15,  20,  20,  20,  20,  20,  15,  10],
+    [  5,   5,   5,   5,   5,   5,   5,   5,   5],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+    [  0,   0,   0,   0,   0,   0,   0,   0,   0],
+]
+# fmt: on
+
+PST_MG = {
+    B_KING: KING_PST_MG, B_GUARD: GUARD_PST_MG, B_BISHOP: BISHOP_PST_MG, B_HORSE: HORSE_PST_MG,
+    B_ROOK: ROOK_PST_MG, B_CANNON: CANNON_PST_MG, B_PAWN: PAWN_PST_MG,
+    R_KING: KING_PST_MG, R_GUARD: GUARD_PST_MG, R_BISHOP: BISHOP_PST_MG, R_HORSE: HORSE_PST_MG,
+    R_ROOK: ROOK_PST_MG, R_CANNON: CANNON_PST_MG, R_PAWN: PAWN_PST_MG,
+}
+PST_EG = copy.deepcopy(PST_MG)
+PST_EG[R_PAWN] = PAWN_PST_EG
+PST_EG[B_PAWN] = PAWN_PST_EG
+
+# --- 增量评估所需的预计算表 ---
+
+# 参与计算对局阶段的棋子 (将/帅与兵/卒不计入)
+PHASE_PIECES = {R_ROOK, R_HORSE, R_CANNON, R_GUARD, R_BISHOP}
+
+# PHASE_VALUES[piece] 是该棋子对阶段子力的贡献 (红黑双方都为正数)
+PHASE_VALUES = {piece: (abs(PIECE_VALUES[piece]) if abs(piece) in PHASE_PIECES else 0) for piece in PIECE_VALUES}
+
+# PST_MG_SQ[piece][sq] / PST_EG_SQ[piece][sq] 是棋子在某个位置上的有符号位置分 (红正黑负)
+PST_MG_SQ = {}
+PST_EG_SQ = {}
+
+
+def _precompute_square_tables():
+    '''将二维位置表展开为按棋盘位置索引、带符号的一维表。'''
+    for piece in PST_MG:
+        mg_table, eg_table = [0] * 90, [0] * 90
+        for sq in range(90):
+            r, c = sq // 9, sq % 9
+            # 始终从红方视角查表
+            if piece > 0:
+                mg_table[sq] = PST_MG[piece][9 - r][8 - c]
+                eg_table[sq] = PST_EG[piece][9 - r][8 - c]
+            else:
+                mg_table[sq] = -PST_MG[piece][r][c]
+                eg_table[sq] = -PST_EG[piece][r][c]
+        PST_MG_SQ[piece] = mg_table
+        PST_EG_SQ[piece] = eg_table
+
+
+# --- 模块加载时执行预计算 ---
+_precompute_square_tables()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+'''
+搜索统计模块。
+
+`SearchStats` 记录一次搜索中节点的去向：常规搜索和静默搜索各访问了多少节点、
+置换表的查询/命中/剪枝次数、空着裁剪和后期走法裁减的效果、走法排序的质量
+(第一个走法就产生beta剪枝的比例)，以及每一层迭代的节点数和用时 (用于计算有效分支因子)。
+
+统计默认是关闭的 (参见 `Engine` 的 `collect_stats` 参数)。关闭时，搜索的热路径上
+每个计数点只多一次 `is not None` 的判断 (包括置换表的查询和命中次数，它们在 `_negamax` 中计数，
+置换表本身不做任何统计)。
+'''
+
+from typing import Dict, List
+
+
+class SearchStats:
+    '''
+    一次搜索的统计信息。
+
+    Attributes:
+        nodes (int): 访问的节点总数 (常规搜索 + 静默搜索，不包括并行搜索的辅助进程)。
+        qnodes (int): 静默搜索访问的节点数。
+        tt_probes (int): 常规搜索中查询置换表的次数。
+        tt_hits (int): 查询命中的次数。
+        tt_cutoffs (int): 置换表条目直接决定了节点结果 (不再搜索) 的次数。
+        null_tries (int): 尝试空着裁剪的次数。
+        null_cutoffs (int): 空着裁剪成功剪枝的次数。
+        lmr_reductions (int): 以缩减的深度搜索的走法数。
+        lmr_researches (int): 缩减深度的结果超过alpha、需要以完整深度重新搜索的次数。
+        pvs_researches (int): 零窗口搜索失败高、需要以完整窗口重新搜索的次数。
+        aspiration_researches (int): 期望窗口失败 (结果落在窗口之外)、需要加宽窗口重新搜索的次数。
+        beta_cutoffs (int): 常规搜索中发生beta剪枝的节点数。
+        first_move_cutoffs (int): 其中由第一个走法产生剪枝的节点数。
+        depth_nodes (List[int]): 每完成一层迭代时的累计节点数。
+        depth_times (List[float]): 每完成一层迭代时的累计用时（秒）。
+    '''
+
+    __slots__ = ('nodes', 'qnodes', 'tt_probes', 'tt_hits', 'tt_cutoffs', 'null_tries', 'null_cutoffs',
+                 'lmr_reductions', 'lmr_researches', 'pvs_researches', 'aspiration_researches',
+                 'beta_cutoffs', 'first_move_cutoffs', 'depth_nodes', 'depth_times')
+
+    def __init__(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.null_tries = 0
+        self.null_cutoffs = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.depth_nodes: List[int] = []
+        self.depth_times: List[float] = []
+
+    def copy(self) -> 'SearchStats':
+        '''返回当前统计的快照。'''
+        snapshot = SearchStats()
+        for name in self.__slots__:
+            value = getattr(self, name)
+            setattr(snapshot, name, list(value) if isinstance(value, list) else value)
+        return snapshot
+
+    @property
+    def main_nodes(self) -> int:
+        '''常规搜索访问的节点数。'''
+        return self.nodes - self.qnodes
+
+    @property
+    def tt_hit_rate(self) -> float:
+        '''置换表的命中率。'''
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        '''发生beta剪枝的节点中，由第一个走法产生剪枝的比例。越接近1，说明走法排序越好。'''
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    @property
+    def ebf(self) -> float:
+        '''有效分支因子：最后一层迭代与前一层迭代的累计节点数之比。'''
+        if len(self.depth_nodes) < 2 or self.depth_nodes[-2] == 0:
+            return 0.0
+        return self.depth_nodes[-1] / self.depth_nodes[-2]
+
+    def as_dict(self) -> Dict:
+        '''转换为字典 (包括计算得到的比例)，便于写入JSON报告。'''
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data.update(main_nodes=self.main_nodes, tt_hit_rate=round(self.tt_hit_rate, 4),
+                    first_move_cutoff_rate=round(self.first_move_cutoff_rate, 4), ebf=round(self.ebf, 3))
+        return data
+
+    def report(self) -> str:
+        '''返回多行的可读报告。'''
+        nodes = max(self.nodes, 1)
+        lines = [
+            f'节点: {self.nodes} (常规 {self.main_nodes}, 静默 {self.qnodes} = {self.qnodes / nodes:.1%})',
+            f'置换表: 查询 {self.tt_probes}, 命中 {self.tt_hits} ({self.tt_hit_rate:.1%}), 剪枝 {self.tt_cutoffs}',
+            f'空着裁剪: 尝试 {self.null_tries}, 剪枝 {self.null_cutoffs}',
+            f'后期走法裁减: 缩减 {self.lmr_reductions}, 重新搜索 {self.lmr_researches}',
+            f'主要变例搜索: 重新搜索 {self.pvs_researches}, 期望窗口重新搜索 {self.aspiration_researches}',
+            f'beta剪枝: {self.beta_cutoffs}, 第一个走法剪枝 {self.first_move_cutoff_rate:.1%}',
+            f'有效分支因子: {self.ebf:.2f}',
+        ]
+        previous_nodes, previous_time = 0, 0.0
+        for depth, (depth_nodes, depth_time) in enumerate(zip(self.depth_nodes, self.depth_times), start=1):
+            lines.append(f'  深度 {depth:2d}: {depth_nodes - previous_nodes:>9} 节点  {depth_time - previous_time:7.3f}s')
+            previous_nodes, previous_time = depth_nodes, depth_time
+        return '\n'.join(lines)
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+'''
+预计算表的缓存模块。
+
+走法生成使用的攻击表、射线表以及Zobrist哈希键都是在模块导入时用Python循环生成的。
+本模块把生成的结果保存到 `src/__pycache__` 目录下的缓存文件中，之后的导入直接读取缓存，
+不再重复计算。缓存只是一种加速手段：缓存文件缺失、过期或损坏时会重新计算并覆盖它，
+缓存目录不可写时则只是不保存缓存。
+
+缓存文件的格式:
+    魔数 (8字节) + 数据的CRC32校验和 (4字节, 小端序) + 数据
+数据是用 `marshal` 序列化的 (缓存键, {表名: 表})。`marshal` 是解释器内置的模块，
+读取速度快且不需要额外的导入开销，但格式与Python版本相关，因此缓存键中包含了：
+- 缓存格式的版本号 `CACHE_VERSION`
+- 解释器的缓存标签 (例如 'cpython-311')
+- 生成这些表的源文件的CRC32，修改了源文件之后缓存会自动失效
+'''
+
+import marshal
+import os
+import sys
+import zlib
+from typing import Callable, Dict
+
+CACHE_VERSION = 1  # 缓存格式的版本号，修改了缓存的内容或格式时递增
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+
+_MAGIC = b'XQTABLE\0'
+_HEADER_SIZE = len(_MAGIC) + 4
+
+
+def cache_path(name: str) -> str:
+    '''返回名为 `name` 的一组预计算表的缓存文件路径。'''
+    return os.path.join(CACHE_DIR, f'{name}.{sys.implementation.cache_tag}.tables')
+
+
+def _cache_key(source_file: str) -> tuple:
+    '''根据缓存格式版本、解释器和源文件内容生成缓存键。'''
+    with open(source_file, 'rb') as f:
+        source_checksum = zlib.crc32(f.read())
+    return (CACHE_VERSION, sys.implementation.cache_tag, source_checksum)
+
+
+def _read_cache(path: str, key: tuple):
+    '''读取缓存文件，文件不存在、校验失败或缓存键不一致时返回None。'''
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if data[:len(_MAGIC)] != _MAGIC:
+        return None
+    payload = data[_HEADER_SIZE:]
+    if zlib.crc32(payload) != int.from_bytes(data[len(_MAGIC):_HEADER_SIZE], 'little'):
+        return None
+    try:
+        cached_key, tables = marshal.loads(payload)
+    except (EOFError, ValueError, TypeError):
+        return None
+    return tables if cached_key == key else None
+
+
+def _write_cache(path: str, key: tuple, tables: Dict):
+    '''写入缓存文件。先写入临时文件再替换，以免并发启动的进程读到写了一半的文件。'''
+    payload = marshal.dumps((key, tables))
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            f.write(_MAGIC + zlib.crc32(payload).to_bytes(4, 'little') + payload)
+        os.replace(temp_path, path)
+    except OSError:
+        # 缓存目录不可写 (例如只读安装)，下次导入时重新计算即可
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def load_tables(name: str, source_file: str, compute: Callable[[], Dict]) -> Dict:
+    '''
+    加载一组预计算表。
+
+    Args:
+        name (str): 这组表的名称，用作缓存文件名。
+        source_file (str): 生成这些表的源文件，其内容变化时缓存失效。
+        compute (Callable[[], Dict]): 计算这组表的函数，返回 {表名: 表}。
+            表只能包含 `marshal` 支持的类型 (整数、列表、字典等)。
+
+    Returns:
+        Dict: {表名: 表}。
+    '''
+    path = cache_path(name)
+    key = _cache_key(source_file)
+    tables = _read_cache(path, key)
+    if tables is None:
+        tables = compute()
+        _write_cache(path, key, tables)
+    return tables
@@ -11,7 +11,7 @@ from textual.screen import Screen
 from textual.message import Message
 
 from src.bitboard import Bitboard as Board
-from src.engine import Engine
+from src.engine import Engine, SearchLimits, move_to_iccs
 from src.moves import generate_moves, is_check
 from src.constants import PLAYER_B, PLAYER_R
 
@@ -121,6 +121,7 @@ class TextualUI(App):
         ("r", "reset_game", "Reset Game"),
         ("u", "undo_move", "Undo Move"),
         ("t", "load_fen", "Load FEN"),
+        ("s", "move_now", "Move Now"),
     ]
 
     def __init__(self):
@@ -134,6 +135,7 @@ class TextualUI(App):
         self.move_history = []
         self.last_move = None
         self.dark = False
+        self.analysis = None  # The engine's running search, if any
 
     def compose(self) -> ComposeResult:
         """Create child widgets for the app."""
@@ -145,9 +147,28 @@ class TextualUI(App):
         """An action to toggle dark mode."""
         self.dark = not self.dark
 
-    def action_reset_game(self) -> None:
+    async def cancel_analysis(self) -> bool:
+        """Stops the engine's running search and discards its result.
+
+        Returns True if a search was cancelled.
+        """
+        analysis, self.analysis = self.analysis, None
+        if analysis is None:
+            return False
+        analysis.stop()
+        await analysis.wait()
+        return True
+
+    def action_move_now(self) -> None:
+        """Asks the engine to stop thinking and play its best move so far."""
+        if self.analysis is not None:
+            self.analysis.stop()
+
+    async def action_reset_game(self) -> None:
         """Resets the game to the initial state."""
+        await self.cancel_analysis()
         self.board = Board()
+        self.engine.new_game()
         self.xiangqi_board.board = self.board
         self.selected_piece_pos = None
         self.game_over = False
@@ -157,15 +178,14 @@ class TextualUI(App):
         self.status_label.update("Game reset. Your turn.")
         self.xiangqi_board.update_display()
 
-    def action_undo_move(self) -> None:
+    async def action_undo_move(self) -> None:
         """Undoes the last player and engine move."""
-        if len(self.move_history) >= 2:
-            # Undo engine move
-            move, captured = self.move_history.pop()
-            self.board.unmove_piece(move[0], move[1], captured)
-            # Undo player move
-            move, captured = self.move_history.pop()
-            self.board.unmove_piece(move[0], move[1], captured)
+        # While the engine is thinking, only the player's move has to be undone
+        moves_to_undo = 1 if await self.cancel_analysis() else 2
+        if len(self.move_history) >= moves_to_undo:
+            for _ in range(moves_to_undo):
+                move, captured = self.move_history.pop()
+                self.board.unmove_piece(move[0], move[1], captured)
 
             self.game_over = False
             self.selected_piece_pos = None
@@ -179,10 +199,12 @@ class TextualUI(App):
 
     def action_load_fen(self) -> None:
         """Opens a screen to load a FEN."""
-        def _load_fen_callback(fen: str):
+        async def _load_fen_callback(fen: str):
             if fen:
+                await self.cancel_analysis()
                 try:
                     self.board = Board(fen)
+                    self.engine.new_game()
                     self.xiangqi_board.board = self.board
                     self.selected_piece_pos = None
                     self.game_over = False
@@ -197,7 +219,7 @@ class TextualUI(App):
         self.push_screen(FenInputScreen(), _load_fen_callback)
 
     def on_xiangqi_board_piece_selected(self, message: XiangqiBoard.PieceSelected) -> None:
-        if self.game_over:
+        if self.game_over or self.analysis is not None:
             return
 
         r, c = message.r, message.c
@@ -218,7 +240,7 @@ class TextualUI(App):
 
                 if not self.game_over:
                     self.status_label.update("Engine is thinking...")
-                    self.set_timer(0.1, self.engine_move)
+                    self.run_worker(self.engine_move())
             else:
                 self.selected_piece_pos = None
                 self.xiangqi_board.selected_piece_pos = None
@@ -234,8 +256,21 @@ class TextualUI(App):
 
         self.xiangqi_board.update_display()
 
-    def engine_move(self):
-        _, engine_move = self.engine.search_by_time(self.board, 1.0)
+    async def engine_move(self):
+        """Lets the engine search in the background, showing its progress, then plays its move."""
+        analysis = self.analysis = await self.engine.analyse(self.board, SearchLimits(time=1.0))
+        async for info in analysis:
+            if self.analysis is analysis:
+                pv = " ".join(move_to_iccs(move) for move in info.pv[:8])
+                self.status_label.update(
+                    f"Engine is thinking... depth {info.depth}  score {info.score:.0f}  "
+                    f"nodes {info.nodes}  nps {info.nps:.0f}\npv {pv}")
+        _, engine_move = await analysis.wait()
+        if self.analysis is not analysis:
+            # Cancelled by reset, undo or loading a FEN
+            return
+        self.analysis = None
+
         if engine_move:
             from_r, from_c = engine_move[0]
             to_r, to_c = engine_move[1]
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+'''
+固定大小的置换表 (Transposition Table) 实现模块。
+
+置换表以局面的Zobrist哈希值为索引，缓存已搜索过的局面的评估值、
+搜索深度、边界类型和最佳走法。与使用Python字典相比，这里的实现：
+- 在创建时按给定的内存大小 (MB) 一次性预分配存储空间，搜索期间内存不再增长。
+- 每个条目被打包成两个64位整数 (校验键 + 数据)，避免了为每个节点创建字典对象的开销。
+- 采用“桶” (Bucket) 结构，每个桶包含若干个条目，配合“深度优先 / 总是替换”的替换策略。
+- 每个条目记录写入时的“代” (Generation)。置换表可以在同一盘棋的多次搜索之间保留，
+  过期 (来自之前搜索) 的条目会被优先替换，从而逐渐老化淘汰。
+- 存储完整的64位哈希键用于校验，以发现不同局面映射到同一个桶时产生的索引冲突。
+
+置换表既可以放在本进程的内存中，也可以放在 `multiprocessing.shared_memory` 中，
+供多个搜索进程 (Lazy SMP) 共享。共享时不使用任何锁，而是采用“异或校验”：
+每个条目存储 (hash_key ^ data, data)，读取时只有 key ^ data 还原出的哈希值与查询的
+哈希值一致才算命中。如果两个进程同时写入同一个条目，导致校验键和数据来自不同的写入，
+还原出的哈希值几乎不可能与任何局面一致，这个被“撕裂”的条目会被自然地忽略。
+
+数据字段的打包布局 (从低位到高位):
+    best_move  14 bit  (from_sq << 7 | to_sq，0 表示没有最佳走法)
+    depth       8 bit
+    flag        2 bit
+    score      16 bit  (加上偏移量后以无符号数存储)
+    generation  8 bit
+'''
+
+from array import array
+from typing import Optional, Tuple
+
+# 置换表条目的标志 (Flags for Transposition Table entries)
+TT_EXACT = 0  # 精确值 (Exact score)
+TT_LOWER = 1  # 下界值 (Lower bound, alpha)
+TT_UPPER = 2  # 上界值 (Upper bound, beta)
+
+# 每个桶包含的条目数量。第0个条目采用“深度优先”替换，其余条目“总是替换”。
+BUCKET_SIZE = 2
+# 每个条目占用的字节数 (64位校验键 + 64位数据)
+ENTRY_BYTES = 16
+
+_MOVE_BITS = 14
+_DEPTH_SHIFT = 14
+_FLAG_SHIFT = 22
+_SCORE_SHIFT = 24
+_SCORE_OFFSET = 1 << 15
+_GENERATION_SHIFT = 40
+
+_MOVE_MASK = (1 << _MOVE_BITS) - 1
+_DEPTH_MASK = 0xFF
+_FLAG_MASK = 0x3
+_SCORE_MASK = 0xFFFF
+_GENERATION_MASK = 0xFF
+_KEY_MASK = (1 << 64) - 1
+
+# 探测结果: (depth, score, flag, best_move)，其中 best_move 为 (from_sq, to_sq) 或 None
+TTEntry = Tuple[int, int, int, Optional[Tuple[int, int]]]
+
+
+def _attach_shared_memory(name: str):
+    '''
+    连接到一块已存在的共享内存，返回 `multiprocessing.shared_memory.SharedMemory`。
+
+    共享内存由创建它的进程负责删除，连接它的进程不应让资源追踪器接管它。
+    Python 3.13 之前没有 track 参数；此时子进程与创建者共用同一个资源追踪器，
+    重复注册同一个名称不会产生影响，因此直接连接即可。
+    '''
+    from multiprocessing import shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class TranspositionTable:
+    '''
+    固定内存大小的置换表。
+
+    Attributes:
+        size_mb (int): 置换表占用的内存大小 (MB)。
+        num_buckets (int): 桶的数量，总是2的幂，以便用位与运算代替取模。
+        generation (int): 当前的代，每次开始新的搜索时递增。
+        shm_name (Optional[str]): 共享内存的名称，置换表不在共享内存中时为None。
+        table (array | memoryview): 条目存储，第i个条目占用 table[2i] (校验键) 和 table[2i+1] (数据)。
+    '''
+
+    def __init__(self, size_mb: int = 16, shared: bool = False, shm_name: Optional[str] = None):
+        '''
+        按给定的内存大小创建置换表。
+
+        Args:
+            size_mb (int): 置换表占用的内存大小 (MB)。
+            shared (bool): 是否在共享内存中创建置换表，以便其他进程连接。
+            shm_name (Optional[str]): 连接到由其他进程创建的、同样大小的共享置换表。
+        '''
+        self.size_mb = size_mb
+        max_buckets = max(1, (size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+        # 向下取整到2的幂
+        self.num_buckets = 1 << (max_buckets.bit_length() - 1)
+        self._bucket_mask = self.num_buckets - 1
+        self.generation = 0
+
+        self._shm = None
+        self._owns_shm = False
+        self.shm_name = None
+        num_bytes = self.num_buckets * BUCKET_SIZE * ENTRY_BYTES
+        if shm_name is not None:
+            self._shm = _attach_shared_memory(shm_name)
+        elif shared:
+            # 只在需要时才导入 multiprocessing，以缩短不使用并行搜索的程序的启动时间
+            from multiprocessing import shared_memory
+
+            self._shm = shared_memory.SharedMemory(create=True, size=num_bytes)
+            self._owns_shm = True
+
+        if self._shm is not None:
+            self.shm_name = self._shm.name
+            self.table = self._shm.buf[:num_bytes].cast('Q')
+            if self._owns_shm:
+                self.clear()
+        else:
+            self.table = array('Q')
+            self.clear()
+
+    def __len__(self) -> int:
+        '''返回置换表可容纳的条目总数。'''
+        return self.num_buckets * BUCKET_SIZE
+
+    @property
+    def shared(self) -> bool:
+        '''置换表是否位于共享内存中。'''
+        return self._shm is not None
+
+    def clear(self):
+        '''清空置换表中的所有条目。'''
+        num_bytes = self.num_buckets * BUCKET_SIZE * ENTRY_BYTES
+        if self._shm is not None:
+            self._shm.buf[:num_bytes] = bytes(num_bytes)
+        else:
+            self.table = array('Q', bytes(num_bytes))
+        self.generation = 0
+
+    def close(self):
+        '''释放共享内存。创建共享内存的一方同时负责将其删除。'''
+        if self._shm is None:
+            return
+        self.table.release()
+        self.table = array('Q')
+        self._shm.close()
+        if self._owns_shm:
+            self._shm.unlink()
+        self._shm = None
+        self.shm_name = None
+
+    def new_search(self):
+        '''
+        开始一次新的搜索。
+
+        递增当前的代，但保留所有已有条目。之前搜索留下的条目仍然可以被命中，
+        但在替换时会被优先淘汰。
+        '''
+        self.generation = (self.generation + 1) & _GENERATION_MASK
+
+    def probe(self, hash_key: int) -> Optional[TTEntry]:
+        '''
+        查询置换表。
+
+        Args:
+            hash_key (int): 局面的Zobrist哈希值。
+
+        Returns:
+            Optional[TTEntry]: 如果命中，返回 (depth, score, flag, best_move)；否则返回None。
+        '''
+        hash_key &= _KEY_MASK
+        index = (hash_key & self._bucket_mask) * (2 * BUCKET_SIZE)
+        table = self.table
+        for i in range(index, index + 2 * BUCKET_SIZE, 2):
+            data = table[i + 1]
+            if data and table[i] ^ data == hash_key:
+                move = data & _MOVE_MASK
+                return (
+                    (data >> _DEPTH_SHIFT) & _DEPTH_MASK,
+                    ((data >> _SCORE_SHIFT) & _SCORE_MASK) - _SCORE_OFFSET,
+                    (data >> _FLAG_SHIFT) & _FLAG_MASK,
+                    (move >> 7, move & 0x7F) if move else None,
+                )
+        return None
+
+    def store(self, hash_key: int, depth: int, score: int, flag: int, best_move: Optional[Tuple[int, int]]):
+        '''
+        将搜索结果存入置换表。
+
+        替换策略:
+        1. 如果桶中已有同一局面的条目，直接覆盖它 (若新结果没有最佳走法，则保留旧的最佳走法)。
+        2. 否则，如果第0个条目来自之前的搜索 (已过期)，或者新结果的深度不小于它的深度，
+           替换第0个条目 (深度优先)。
+        3. 否则，替换桶中的最后一个条目 (总是替换)。
+
+        Args:
+            hash_key (int): 局面的Zobrist哈希值。
+            depth (int): 搜索深度。
+            score (int): 评估分数。
+            flag (int): 分数类型 (TT_EXACT, TT_LOWER, TT_UPPER)。
+            best_move (Optional[Tuple[int, int]]): 最佳走法 (from_sq, to_sq)。
+        '''
+        hash_key &= _KEY_MASK
+        index = (hash_key & self._bucket_mask) * (2 * BUCKET_SIZE)
+        table = self.table
+
+        slot = -1
+        for i in range(index, index + 2 * BUCKET_SIZE, 2):
+            data = table[i + 1]
+            if data and table[i] ^ data == hash_key:
+                slot = i
+                break
+
+        move = 0
+        if best_move is not None:
+            move = (best_move[0] << 7) | best_move[1]
+
+        if slot >= 0:
+            if not move:
+                move = table[slot + 1] & _MOVE_MASK
+        else:
+            first = table[index + 1]
+            if ((first >> _GENERATION_SHIFT) & _GENERATION_MASK) != self.generation \
+                    or depth >= (first >> _DEPTH_SHIFT) & _DEPTH_MASK:
+                slot = index
+            else:
+                slot = index + 2 * (BUCKET_SIZE - 1)
+
+        depth = max(0, min(depth, _DEPTH_MASK))
+        score = max(-_SCORE_OFFSET, min(int(score), _SCORE_OFFSET - 1))
+        data = (
+            move
+            | (depth << _DEPTH_SHIFT)
+            | (flag << _FLAG_SHIFT)
+            | ((score + _SCORE_OFFSET) << _SCORE_SHIFT)
+            | (self.generation << _GENERATION_SHIFT)
+        )
+        table[slot] = hash_key ^ data
+        table[slot + 1] = data
+
+    def hashfull(self) -> int:
+        '''返回当前这一代条目所占的比例 (千分比)，通过采样前1000个条目估算。'''
+        sample = min(1000, len(self))
+        generation = self.generation
+        table = self.table
+        used = sum(1 for i in range(sample)
+                   if table[2 * i + 1] and ((table[2 * i + 1] >> _GENERATION_SHIFT) & _GENERATION_MASK) == generation)
+        return used * 1000 // sample
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+'''
+UCCI 协议前端。
+
+通过标准输入/输出使用中国象棋通用引擎协议 (UCCI) 驱动引擎，
+这样引擎就可以在现有的比赛管理器和分析界面中使用，并且在两步棋之间保持进程 (以及置换表) 常驻。
+同时兼容常见的 UCI 写法 (`uci`、`startpos`、`wtime/btime/movetime`、`setoption name ... value ...`)。
+
+支持的命令:
+    ucci / uci                      引擎标识和选项，以 ucciok / uciok 结束
+    isready                         readyok
+    setoption <名称> <值>           选项: hashsize (MB)、threads (进程数)、usebook (true/false)
+    setoption name <名称> value <值>
+    newgame / ucinewgame            清空置换表和历史表
+    position {fen <FEN> | startpos} [moves <走法> ...]
+    go [ponder] [depth <d> | nodes <n> | movetime <ms> | infinite
+                 | wtime <ms> btime <ms> winc <ms> binc <ms> movestogo <n>
+                 | time <ms> increment <ms> movestogo <n>]
+    stop                            结束搜索，立即输出 bestmove
+    ponderhit                       后台思考命中，搜索转为受时间限制
+    quit                            退出，输出 bye
+
+搜索过程中每完成一层迭代输出一行:
+    info depth <d> score <分数> time <ms> nodes <n> nps <n> pv <走法> ...
+搜索结束时输出 `bestmove <走法> [ponder <走法>]`，没有合法走法时输出 `nobestmove`。
+走法使用ICCS记法 (例如 h2e2)。
+
+用法:
+    python -m src.ucci
+'''
+
+import sys
+import threading
+from typing import List, Optional, TextIO
+
+from src.bitboard import Bitboard
+from src.engine import Engine, SearchInfo, iccs_to_move, move_to_iccs
+from src.constants import PLAYER_R
+from src.moves import is_legal_move
+
+ENGINE_NAME = 'Mini Xiangqi'
+ENGINE_AUTHOR = 'hezhaoyun'
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+MAX_THREADS = 64
+MAX_DEPTH = 63
+
+# 按剩余时间分配每步用时：剩余时间的 1/DEFAULT_MOVES_TO_GO，再加上每步的加时
+DEFAULT_MOVES_TO_GO = 30
+# 每步最多使用剩余时间的比例，以及预留给通信延迟的时间（秒）
+MAX_TIME_FRACTION = 0.5
+TIME_MARGIN = 0.05
+
+
+class UcciEngine:
+    '''
+    UCCI 协议的命令处理器。
+
+    主线程逐行读取命令，搜索在后台线程中进行，因此在搜索期间仍然可以响应 `stop`、`ponderhit` 和 `isready`。
+
+    Attributes:
+        engine (Engine): 进行搜索的引擎，在两步棋之间保持常驻。
+        board (Bitboard): `position` 命令设置的当前局面。
+        hash_size_mb (int): 置换表的大小 (MB)。
+        threads (int): 并行搜索的进程数。
+        use_book (bool): 是否使用开局库。
+    '''
+
+    def __init__(self, output: TextIO = sys.stdout):
+        self.output = output
+        self.hash_size_mb = DEFAULT_HASH_MB
+        self.threads = 1
+        self.use_book = True
+        self.engine = Engine(self.hash_size_mb, threads=self.threads)
+        self.board = Bitboard()
+        self._output_lock = threading.Lock()
+        self._search_thread = None
+        # 后台思考或无限搜索时，搜索结束之后要等到 stop/ponderhit 才能输出 bestmove
+        self._wait_for_release = False
+        self._release = threading.Event()
+
+    def send(self, line: str):
+        '''输出一行协议消息。'''
+        with self._output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    # --- 命令处理 ---
+
+    def handle(self, line: str) -> bool:
+        '''
+        处理一行命令。
+
+        Returns:
+            bool: 收到 quit 命令时返回False，否则返回True。
+        '''
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        if command in ('ucci', 'uci'):
+            self.send(f'id name {ENGINE_NAME}')
+            self.send(f'id author {ENGINE_AUTHOR}')
+            self.send(f'option hashsize type spin min 1 max {MAX_HASH_MB} default {DEFAULT_HASH_MB}')
+            self.send(f'option threads type spin min 1 max {MAX_THREADS} default 1')
+            self.send('option usebook type check default true')
+            self.send('ucciok' if command == 'ucci' else 'uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'setoption':
+            self.stop()
+            self.set_option(args)
+        elif command in ('newgame', 'ucinewgame'):
+            self.stop()
+            self.engine.new_game()
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            self.stop()
+            self.go(args)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'ponderhit':
+            self.ponder_hit()
+        elif command == 'quit':
+            self.stop()
+            self.engine.close()
+            self.send('bye')
+            return False
+        return True
+
+    def set_option(self, args: List[str]):
+        '''处理 `setoption`，同时支持 UCCI (`setoption hashsize 64`) 和 UCI (`setoption name Hash value 64`) 的写法。'''
+        if args[:1] == ['name'] and 'value' in args:
+            split = args.index('value')
+            name, value = ' '.join(args[1:split]), ' '.join(args[split + 1:])
+        elif len(args) >= 2:
+            name, value = args[0], ' '.join(args[1:])
+        else:
+            return
+        name = name.lower()
+
+        try:
+            if name in ('hashsize', 'hash'):
+                hash_size_mb = min(max(int(value), 1), MAX_HASH_MB)
+                if hash_size_mb != self.hash_size_mb:
+                    self.hash_size_mb = hash_size_mb
+                    self._recreate_engine()
+            elif name in ('threads', 'workers'):
+                threads = min(max(int(value), 1), MAX_THREADS)
+                if threads != self.threads:
+                    self.threads = threads
+                    self._recreate_engine()
+            elif name == 'usebook':
+                self.use_book = value.lower() in ('true', 'on', '1')
+        except ValueError:
+            pass
+
+    def _recreate_engine(self):
+        '''置换表的大小或进程数改变时，重新创建引擎。'''
+        self.engine.close()
+        self.engine = Engine(self.hash_size_mb, threads=self.threads)
+
+    def set_position(self, args: List[str]):
+        '''处理 `position {fen <FEN> | startpos} [moves ...]`。非法的局面或走法会被忽略 (之后的走法也不再执行)。'''
+        moves_index = args.index('moves') if 'moves' in args else len(args)
+        try:
+            if args[:1] == ['fen']:
+                board = Bitboard(' '.join(args[1:moves_index]))
+            else:
+                board = Bitboard()
+        except (ValueError, IndexError, KeyError):
+            return
+
+        for iccs in args[moves_index + 1:]:
+            try:
+                (from_r, from_c), (to_r, to_c) = iccs_to_move(iccs)
+            except ValueError:
+                break
+            move = (from_r * 9 + from_c, to_r * 9 + to_c)
+            if not is_legal_move(board, move):
+                break
+            board.move_piece(*move)
+        self.board = board
+
+    def go(self, args: List[str]):
+        '''处理 `go`，在后台线程中开始搜索。'''
+        params = {}
+        ponder = infinite = False
+        i = 0
+        while i < len(args):
+            token = args[i]
+            if token == 'ponder':
+                ponder = True
+            elif token == 'infinite':
+                infinite = True
+            elif i + 1 < len(args):
+                try:
+                    params[token] = int(args[i + 1])
+                    i += 1
+                except ValueError:
+                    pass
+            i += 1
+
+        max_depth = min(params.get('depth', MAX_DEPTH), MAX_DEPTH)
+        node_limit = params.get('nodes', 0)
+        time_limit = 0 if infinite else self.allocate_time(params)
+
+        board = self.board.copy()
+        book_move = None
+        if self.use_book and not (ponder or infinite):
+            book_move = self.engine.query_opening_book(board)
+        if book_move is not None:
+            self.send(f'bestmove {move_to_iccs(book_move)}')
+            return
+
+        self._wait_for_release = ponder or infinite
+        self._release.clear()
+        self.engine.stop_event.clear()
+        self.engine.pondering = ponder
+        self._search_thread = threading.Thread(target=self._search, args=(board, max_depth, time_limit, node_limit),
+                                               daemon=True)
+        self._search_thread.start()
+
+    def allocate_time(self, params: dict) -> float:
+        '''
+        根据 `go` 的参数计算这一步的时间限制（秒），0表示不限制时间。
+
+        `movetime` 直接作为这一步的用时；否则按剩余时间 (UCI的 wtime/btime 或 UCCI的 time)
+        和每步加时分配，最多使用剩余时间的 MAX_TIME_FRACTION。
+        '''
+        if 'movetime' in params:
+            return max(params['movetime'] / 1000 - TIME_MARGIN, 0.01)
+
+        red = self.board.player_to_move == PLAYER_R
+        remaining = params.get('wtime' if red else 'btime', params.get('time'))
+        if remaining is None:
+            return 0
+        increment = params.get('winc' if red else 'binc', params.get('increment', 0))
+        moves_to_go = params.get('movestogo', DEFAULT_MOVES_TO_GO) or DEFAULT_MOVES_TO_GO
+
+        remaining, increment = remaining / 1000, increment / 1000
+        budget = remaining / moves_to_go + increment
+        return max(min(budget, remaining * MAX_TIME_FRACTION) - TIME_MARGIN, 0.01)
+
+    def _search(self, board: Bitboard, max_depth: int, time_limit: float, node_limit: int):
+        '''搜索线程的主函数。搜索结束后输出 bestmove。'''
+        last_info: List[Optional[SearchInfo]] = [None]
+
+        def on_iteration(info: SearchInfo):
+            last_info[0] = info
+            pv = ' '.join(move_to_iccs(move) for move in info.pv)
+            self.send(f'info depth {info.depth} score {int(info.score)} time {int(info.time * 1000)} '
+                      f'nodes {info.nodes} nps {info.nps} pv {pv}')
+
+        _, best_move, _ = self.engine._search(board, max_depth, time_limit, node_limit, workers=self.threads,
+                                              on_iteration=on_iteration)
+
+        if self._wait_for_release:
+            # 后台思考或无限搜索提前结束 (例如找到了杀棋)，按协议要等到 stop/ponderhit 才能输出结果
+            self._release.wait()
+
+        info = last_info[0]
+        if best_move is None:
+            self.send('nobestmove')
+        elif info is not None and len(info.pv) >= 2 and info.pv[0] == best_move:
+            self.send(f'bestmove {move_to_iccs(best_move)} ponder {move_to_iccs(info.pv[1])}')
+        else:
+            self.send(f'bestmove {move_to_iccs(best_move)}')
+
+    def stop(self):
+        '''结束当前的搜索，并等待它输出 bestmove。'''
+        if self._search_thread is None:
+            return
+        self.engine.stop()
+        self.engine.pondering = False
+        self._release.set()
+        self.wait_search()
+
+    def ponder_hit(self):
+        '''后台思考命中：搜索从此开始受时间限制，已经思考的时间计算在内。'''
+        self.engine.pondering = False
+        self._wait_for_release = False
+        self._release.set()
+
+    def wait_search(self):
+        '''等待搜索线程结束。'''
+        if self._search_thread is not None:
+            self._search_thread.join()
+            self._search_thread = None
+
+    def run(self, input_stream: TextIO = sys.stdin):
+        '''逐行读取并处理命令，直到收到 quit 或输入结束。'''
+        for line in input_stream:
+            if not self.handle(line.strip()):
+                return
+        self.stop()
+        self.engine.close()
+
+
+def main():
+    # 协议消息只能通过 stdout 发送，引擎中其他的输出 (例如开局库的加载信息) 改为输出到 stderr
+    protocol_output = sys.stdout
+    sys.stdout = sys.stderr
+    UcciEngine(protocol_output).run()
+
+
+if __name__ == '__main__':
+    main()
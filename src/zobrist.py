@@ -14,36 +14,33 @@ Zobrist哈希是一种将棋盘上每个可能的局面都映射到一个唯一
 象棋引擎技术的基础。
 '''
 
-import random
+from src.tablecache import load_tables
 
-# --- Zobrist 哈希键 ---
-
-# 14种棋子 (7种红棋, 7种黑棋) 在90个位置上的随机数
-# 结构: zobrist_keys[piece_idx][row][col]
-zobrist_keys = [[[0] * 9 for _ in range(10)] for _ in range(14)]
 
-# 用于切换走棋方的随机数
-zobrist_player = 0
+def _compute_zobrist_keys() -> dict:
+    '''
+    生成Zobrist哈希所需的所有随机数。
 
+    为了保证每次运行程序时生成的哈希键都相同，使用固定种子的独立随机数生成器，
+    不会改变全局 `random` 模块的状态。生成的随机数序列与 `random.seed(0)` 之后的序列相同。
 
-def _initialize_zobrist_keys():
+    Returns:
+        dict: {'zobrist_keys': 棋子在各位置上的随机数, 'zobrist_player': 切换走棋方的随机数}
     '''
-    初始化Zobrist哈希所需的所有随机数。
+    import random
 
-    此函数在模块加载时被调用一次。为了保证每次运行程序时生成的哈希键都相同，
-    使用了固定的随机种子。
-    '''
-    global zobrist_player
-    # 使用固定种子以确保每次生成的随机数都一样
-    random.seed(0)
+    rng = random.Random(0)
+    keys = [[[rng.getrandbits(64) for _ in range(9)] for _ in range(10)] for _ in range(14)]
+    return {'zobrist_keys': keys, 'zobrist_player': rng.getrandbits(64)}
 
-    for i in range(14):
-        for r in range(10):
-            for c in range(9):
-                zobrist_keys[i][r][c] = random.getrandbits(64)
 
-    zobrist_player = random.getrandbits(64)
+# --- Zobrist 哈希键 ---
+# 模块加载时从缓存读取 (参见 `src.tablecache`)，缓存不可用时重新生成。
+_tables = load_tables('zobrist', __file__, _compute_zobrist_keys)
 
+# 14种棋子 (7种红棋, 7种黑棋) 在90个位置上的随机数
+# 结构: zobrist_keys[piece_idx][row][col]
+zobrist_keys = _tables['zobrist_keys']
 
-# --- 模块加载时执行初始化 ---
-_initialize_zobrist_keys()
+# 用于切换走棋方的随机数
+zobrist_player = _tables['zobrist_player']